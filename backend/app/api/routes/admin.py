@@ -6,10 +6,16 @@ from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
 from app.core import models, security
-from app.core.deps import get_current_user
+from app.core.auth_roles import require_role
+from app.core.principal_cache import principal_cache
+from app.core.attendance_rollup import attendance_percentages
+from app.core.attendance_query import report_filters
 
 router = APIRouter(tags=["Admin"])
 
+# Admin endpoints authorize from verified token claims, without a users lookup
+admin_only = require_role("admin", detail="Not authorized")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -38,10 +44,7 @@ class FacultyOut(BaseModel):
 
 # ✅ Dashboard overview (Admin only)
 @router.get("/dashboard")
-def get_dashboard(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
+def get_dashboard(claims: dict = Depends(admin_only), db: Session = Depends(get_db)):
     total_students = db.query(models.Student).count()
     total_faculty = db.query(models.User).filter(models.User.role == "faculty").count()
     total_attendance = db.query(models.Attendance).count()
@@ -54,20 +57,13 @@ def get_dashboard(current_user: models.User = Depends(get_current_user), db: Ses
 
 # ✅ Reports (Admin only) - Updated for frontend compatibility
 @router.get("/reports")
-def get_reports(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Fetch attendance records with student/course details; calculate attendance %
-    reports = db.query(models.Attendance).join(models.Student).limit(10).all()  # Limit for demo; expand as needed
-    return [
-        {
-            "course": r.course,  # From updated models.py
-            "attendance": "85%",  # Placeholder: Calculate real % based on status
-            "date": str(r.date)
-        }
-        for r in reports
-    ]
+def get_reports(
+    filters: dict = Depends(report_filters),
+    claims: dict = Depends(admin_only),
+    db: Session = Depends(get_db),
+):
+    # Attendance % per course and month, aggregated from the rollup table
+    return attendance_percentages(db, by="course", filters=filters)
 
 # ✅ Test Route (open)
 @router.get("/ping")
@@ -79,10 +75,7 @@ def ping_admin():
     "/add-faculty",
     status_code=status.HTTP_201_CREATED,
 )
-def add_faculty(payload: FacultyCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
+def add_faculty(payload: FacultyCreate, claims: dict = Depends(admin_only), db: Session = Depends(get_db)):
     existing = db.query(models.User).filter(models.User.username == payload.username).first()
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
@@ -106,10 +99,7 @@ def add_faculty(payload: FacultyCreate, current_user: models.User = Depends(get_
 
 # ✅ Get all faculty members (Admin only)
 @router.get("/faculty", response_model=List[FacultyOut])
-def get_faculty(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
+def get_faculty(claims: dict = Depends(admin_only), db: Session = Depends(get_db)):
     faculties = db.query(models.User).filter(models.User.role == "faculty").all()
     return [
         {
@@ -124,10 +114,7 @@ def get_faculty(current_user: models.User = Depends(get_current_user), db: Sessi
 
 # ✅ Delete a faculty by email and password (Admin only) - Updated for frontend compatibility
 @router.delete("/delete-faculty")
-def delete_faculty(payload: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
+def delete_faculty(payload: dict, claims: dict = Depends(admin_only), db: Session = Depends(get_db)):
     email = payload.get("email")
     password = payload.get("password")
     if not email or not password:
@@ -145,4 +132,5 @@ def delete_faculty(payload: dict, current_user: models.User = Depends(get_curren
     
     db.delete(faculty)
     db.commit()
+    principal_cache.invalidate(email)  # Cached sessions and issued tokens stop working
     return {"message": "Faculty deleted successfully ✅"}
\ No newline at end of file
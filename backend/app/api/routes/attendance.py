@@ -1,15 +1,28 @@
 # backend/app/api/routes/attendance.py
 
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, date
+import asyncio
 import os
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 
 from app.core.database import SessionLocal
-from app.core.attendance_engine import mark_attendance_from_image, process_attendance_file
+from app.core.attendance_engine import (
+    mark_attendance_from_image, process_attendance_file, recognize_photo, merge_recognitions, record_attendance,
+)
 from app.core.deps import get_current_user
-from app.core.models import User
+from app.core.inference_pool import run_inference
+from app.core.models import Attendance, AttendanceJob, Student, User
+from app.core.attendance_jobs import enqueue_job, job_status
+from app.core.image_upload import read_upload, retain_upload, check_upload_size
+from app.core.metrics import record_pipeline
+from app.core.attendance_query import attendance_records, report_filters
+from app.core.artifact_catalog import latest_artifact, static_url
+from app.core.annotations import annotated_image, upload_name
+from app.api.routes.reports import send_session_report
+from app.core.video_attendance import recognize_video, MAX_VIDEO_BYTES, VIDEO_EXTENSIONS
 
 router = APIRouter(tags=["Attendance"])
 BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), ".."))  # Project root (edusnapai/)
@@ -28,39 +41,63 @@ async def upload_and_mark(
     year: str = Form(...),  # Added for frontend
     course: str = Form(...),  # Added for frontend
     subject: str = Form(...),
+    async_mode: bool = Form(False),  # Queue image uploads and return a job id at once
+    background_tasks: BackgroundTasks = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Upload classroom image or CSV/XLSX → detect/process → mark attendance
+    Upload classroom image or CSV/XLSX → detect/process → mark attendance.
+    With async_mode, images are queued and can be polled at /jobs/{job_id}.
+    Photos are decoded from memory; the original is kept per EDUSNAP_UPLOAD_RETENTION.
     """
     if current_user.role != "faculty":
         raise HTTPException(status_code=403, detail="Only faculty can upload attendance")
 
-    # 📂 Upload directory
-    upload_dir = os.path.join(BASE_DIR, "backend", "app", "static", "uploads")  # Absolute path
-    os.makedirs(upload_dir, exist_ok=True)
-
-    # 📸 Save file safely
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{timestamp}_{file.filename}"
-    file_path = os.path.join(upload_dir, filename)
+    is_image = file.filename.lower().endswith(('.png', '.jpg', '.jpeg'))
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    if is_image:
+        # 📸 Bounded chunked read; the original goes to disk off the request path (if at all)
+        contents = await read_upload(file)
+        await retain_upload(contents, filename, background_tasks)
 
     # Check file type and process accordingly
-    if file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-        # 🧠 Image-based attendance (original logic) - Pass new fields
-        result = mark_attendance_from_image(
-            image_path=file_path,
+    if is_image and async_mode:
+        # 📨 Queued: a worker runs the pipeline, the client polls the job
+        job = enqueue_job(
+            db,
+            image=contents,
+            params={
+                "subject": subject,
+                "department": department,
+                "year": year,
+                "course": course,
+                "filename": filename,
+            },
+            created_by=current_user.id,
+        )
+        return JSONResponse(status_code=202, content={
+            "message": "📨 Attendance upload queued",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/attendance/jobs/{job.id}",
+        })
+    elif is_image:
+        # 🧠 Image-based attendance (original logic) - runs in the inference pool
+        result = await run_inference(
+            mark_attendance_from_image,
+            image_bytes=contents,
             subject=subject,
             department=department,  # Added
             year=year,  # Added
-            course=course  # Added
+            course=course,  # Added
+            marked_by=current_user.id
         )
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
+        record_pipeline("photo", result)
         return {
             "message": "✅ Attendance marked successfully",
             "subject": subject,
@@ -69,12 +106,13 @@ async def upload_and_mark(
             "date": result["date"],
             "present_count": result["present_count"],
             "present_students": result["present_students"],
-            "output_image": result["output_image"],
             "csv_report": result.get("csv_report", ""),  # Added
-            "pdf_report": result.get("pdf_report", "")
+            "pdf_report": result.get("pdf_report", ""),
+            "timings": result.get("timings", {})
         }
     elif file.filename.lower().endswith(('.csv', '.xlsx', '.xls')):
-        # 📄 File-based attendance (new for frontend)
+        # 📄 File-based attendance (new for frontend), streamed in chunks by the importer
+        check_upload_size(file)
         result = process_attendance_file(file, db, current_user.id)
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -82,65 +120,199 @@ async def upload_and_mark(
     else:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
+@router.post("/upload-session")
+async def upload_session(
+    files: List[UploadFile] = File(...),
+    department: str = Form(...),
+    year: str = Form(...),
+    course: str = Form(...),
+    subject: str = Form(...),
+    background_tasks: BackgroundTasks = None,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Several photos of one class session (e.g. one per row of a lecture hall).
+    Photos are recognized concurrently in the inference pool, merged keeping
+    each student's best match, and attendance is written once.
+    """
+    if current_user.role != "faculty":
+        raise HTTPException(status_code=403, detail="Only faculty can upload attendance")
+    if any(not f.filename.lower().endswith(('.png', '.jpg', '.jpeg')) for f in files):
+        raise HTTPException(status_code=400, detail="Session uploads accept only images")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    today = date.today()
+
+    photos = []
+    for f in files:
+        contents = await read_upload(f)
+        await retain_upload(contents, f"{timestamp}_{f.filename}", background_tasks)
+        photos.append(contents)
+
+    # 🧠 All photos at once: latency follows the slowest photo when the pool has enough workers
+    results = await asyncio.gather(*[
+        run_inference(recognize_photo, image_bytes=contents, output_name=upload_name(current_user.id, subject, today, i))
+        for i, contents in enumerate(photos, start=1)
+    ])
+    failed = [(f.filename, r["error"]) for f, r in zip(files, results) if "error" in r]
+    if len(failed) == len(results):
+        raise HTTPException(status_code=400, detail=failed[0][1])
+
+    recognized = [r for r in results if "error" not in r]
+    for r in recognized:
+        record_pipeline("session", r)
+    present_students = merge_recognitions(recognized)
+    result = await asyncio.to_thread(
+        record_attendance, present_students, subject, department, year, course, current_user.id,
+        images=[r["annotation_source"] for r in recognized],
+    )
+    record_pipeline("session", result)
+
+    return {
+        "message": "✅ Attendance marked successfully",
+        "subject": subject,
+        "course": course,
+        "marked_by": current_user.name,
+        "date": result["date"],
+        "photos": [
+            {"filename": f.filename, "error": r["error"]} if "error" in r else {
+                "filename": f.filename,
+                "faces_detected": r["faces_detected"],
+                "recognized": len(r["present_students"]),
+                "timings": r["timings"],
+            }
+            for f, r in zip(files, results)
+        ],
+        "present_count": result["present_count"],
+        "present_students": result["present_students"],
+        "csv_report": result["csv_report"],
+        "pdf_report": result["pdf_report"],
+    }
+
+@router.post("/upload-video")
+async def upload_video(
+    file: UploadFile = File(...),
+    department: str = Form(...),
+    year: str = Form(...),
+    course: str = Form(...),
+    subject: str = Form(...),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Short clip panned across the classroom → sampled frames, tracked faces,
+    one recognition per track → mark attendance. Clips are not kept on disk.
+    """
+    if current_user.role != "faculty":
+        raise HTTPException(status_code=403, detail="Only faculty can upload attendance")
+    suffix = os.path.splitext(file.filename.lower())[1]
+    if suffix not in VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported video type")
+
+    contents = await read_upload(file, MAX_VIDEO_BYTES)
+    recognized = await run_inference(recognize_video, contents, suffix)
+    if "error" in recognized:
+        raise HTTPException(status_code=400, detail=recognized["error"])
+
+    record_pipeline("video", recognized)
+    result = await asyncio.to_thread(
+        record_attendance, recognized["present_students"], subject, department, year, course, current_user.id
+    )
+    record_pipeline("video", result)
+    return {
+        "message": "✅ Attendance marked successfully",
+        "subject": subject,
+        "course": course,
+        "marked_by": current_user.name,
+        "date": result["date"],
+        "present_count": result["present_count"],
+        "present_students": result["present_students"],
+        "faces_tracked": recognized["faces_detected"],
+        "frames_total": recognized["frames_total"],
+        "frames_sampled": recognized["frames_sampled"],
+        "csv_report": result["csv_report"],
+        "pdf_report": result["pdf_report"],
+        "timings": {**recognized["timings"], **result["timings"]},
+    }
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Progress, stage timings and final result of a queued upload."""
+    job = db.get(AttendanceJob, job_id)
+    if not job or (job.created_by != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
 @router.get("/results")
-def get_attendance_results(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Get attendance results for faculty (with student names and image) - Updated for frontend"""
+def get_attendance_results(
+    date: date = None,
+    filters: dict = Depends(report_filters),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Students marked in one session (subject + date) or a date range, with the
+    session's annotated image. Defaults to the latest session this faculty marked.
+    One joined query selects only the columns returned.
+    """
     if current_user.role != "faculty":
         raise HTTPException(status_code=403, detail="Only faculty can view results")
-    
-    from app.core.models import Attendance
-    records = db.query(Attendance).filter(Attendance.marked_by == current_user.id).all()
-    # Placeholder for image URL (assume latest upload)
-    image_url = "/static/uploads/latest.jpg"  # Update with real logic if needed
-    students = [{"name": r.student.name, "rollNumber": r.student.roll_no} for r in records if r.student]
+
+    filters = dict(filters)
+    if date:
+        filters.update(date_from=date, date_to=date)
+    if not any(filters.values()):
+        latest = db.query(Attendance.subject, Attendance.date).filter(Attendance.marked_by == current_user.id) \
+            .order_by(Attendance.date.desc(), Attendance.id.desc()).first()
+        if latest is None:
+            return {"image": "", "subject": None, "date": None, "students": []}
+        filters.update(subject=latest.subject, date_from=latest.date, date_to=latest.date)
+
+    records = (
+        attendance_records(db, filters, marked_by=current_user.id)
+        .order_by(Attendance.date.desc(), Attendance.subject, Student.roll_no)
+        .all()
+    )
+    image = latest_artifact(db, "image", current_user.id, records[0].subject, records[0].date) if records else None
+    rendered = annotated_image(db, image) or {}
     return {
-        "image": image_url,
-        "students": students
+        "image": static_url(rendered.get("preview")),
+        "thumbnail": static_url(rendered.get("thumbnail")),
+        "subject": records[0].subject if records else filters["subject"],
+        "date": str(records[0].date) if records else None,
+        "students": [{"name": r.name, "rollNumber": r.roll_no} for r in records],
     }
 
-# 📥 Download CSV Report
+# 📥 Download reports of the latest session this user marked (built on demand)
+def latest_session(db: Session, current_user: User):
+    query = db.query(Attendance.subject, Attendance.date)
+    if current_user.role != "admin":
+        query = query.filter(Attendance.marked_by == current_user.id)
+    latest = query.order_by(Attendance.date.desc(), Attendance.id.desc()).first()
+    if latest is None:
+        raise HTTPException(status_code=404, detail="No attendance sessions found")
+    return latest
+
+def report_scope(current_user: User):
+    """Admins get whole sessions in reports, everyone else only the rows they marked."""
+    return None if current_user.role == "admin" else current_user.id
+
 @router.get("/download/latest/csv")
-def download_latest_csv(current_user=Depends(get_current_user)):
-    """Download the latest CSV file."""
-    csv_dir = os.path.join(BASE_DIR, "backend", "storage", "attendance_reports", "csv")  # Absolute path
-    if not os.path.exists(csv_dir):
-        raise HTTPException(status_code=404, detail="No CSV files found")
-    
-    files = [f for f in os.listdir(csv_dir) if f.endswith('.csv')]
-    if not files:
-        raise HTTPException(status_code=404, detail="No CSV files found")
-    
-    latest_file = max(files, key=lambda f: os.path.getmtime(os.path.join(csv_dir, f)))
-    file_path = os.path.join(csv_dir, latest_file)
-    
-    return FileResponse(path=file_path, media_type="text/csv", filename=latest_file)
+def download_latest_csv(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Download the CSV report of the latest session."""
+    subject, day = latest_session(db, current_user)
+    return send_session_report(db, subject, day, "csv", marked_by=report_scope(current_user))
 
 @router.get("/download/latest/pdf")
-def download_latest_pdf(current_user=Depends(get_current_user)):
-    """Download the latest PDF file."""
-    pdf_dir = os.path.join(BASE_DIR, "backend", "storage", "attendance_reports", "pdf")  # Absolute path
-    if not os.path.exists(pdf_dir):
-        raise HTTPException(status_code=404, detail="No PDF files found")
-    
-    files = [f for f in os.listdir(pdf_dir) if f.endswith('.pdf')]
-    if not files:
-        raise HTTPException(status_code=404, detail="No PDF files found")
-    
-    latest_file = max(files, key=lambda f: os.path.getmtime(os.path.join(pdf_dir, f)))
-    file_path = os.path.join(pdf_dir, latest_file)
-    print(f"DEBUG: Downloading: {latest_file} at {os.path.getmtime(file_path)}")  # Debug
-    return FileResponse(path=file_path, media_type="application/pdf", filename=latest_file)
+def download_latest_pdf(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Download the PDF report of the latest session."""
+    subject, day = latest_session(db, current_user)
+    return send_session_report(db, subject, day, "pdf", marked_by=report_scope(current_user))
 
 @router.get("/latest-image")
-def get_latest_image(current_user=Depends(get_current_user)):
-    """Get the latest attendance output image."""
-    image_dir = os.path.join(BASE_DIR, "backend", "app", "static", "attendance_outputs")  # Absolute path
-    if not os.path.exists(image_dir):
-        return {"image": ""}
-    
-    files = [f for f in os.listdir(image_dir) if f.endswith('.jpg')]
-    if not files:
-        return {"image": ""}
-    
-    latest_file = max(files, key=lambda f: os.path.getmtime(os.path.join(image_dir, f)))
-    return {"image": latest_file}
\ No newline at end of file
+def get_latest_image(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get the latest annotated image this user produced (any user's, for admins), rendered on first view."""
+    owner_id = None if current_user.role == "admin" else current_user.id
+    rendered = annotated_image(db, latest_artifact(db, "image", owner_id=owner_id))
+    if rendered is None:
+        return {"image": "", "thumbnail": ""}
+    return {"image": os.path.basename(rendered["preview"]), "thumbnail": os.path.basename(rendered["thumbnail"])}
@@ -1,13 +1,20 @@
 # backend/app/api/routes/faculty.py
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from datetime import date
 import os
 
 from app.core.database import SessionLocal
-from app.core.models import Attendance, Student, User
-from app.core.face_recognition_engine import recognize_faces_from_image
+from app.core.models import Student, User
+from app.core.face_recognition_engine import recognize_faces_from_image, detected_name
 from app.core.deps import get_current_user  # JWT-based auth
+from app.core.inference_pool import run_inference
+from app.core.attendance_writer import insert_attendance, student_ids_by_roll
+from app.core.attendance_rollup import attendance_percentages
+from app.core.attendance_query import report_filters
+from app.core.image_upload import read_upload, retain_upload, upload_path
+from app.core.artifact_catalog import record_artifact
+from app.core.annotations import source_path
 
 router = APIRouter(tags=["Faculty"])
 
@@ -32,6 +39,7 @@ async def upload_attendance(
     year: str = Form(...),
     course: str = Form(...),
     subject: str = Form(...),
+    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -42,17 +50,17 @@ async def upload_attendance(
     if current_user.role != "faculty":
         raise HTTPException(status_code=403, detail="Access denied. Faculty only.")
 
-    # ✅ Save image locally
-    upload_dir = "backend/app/static/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
+    # ✅ Read image into memory (size-limited); keep the original per retention setting
+    contents = await read_upload(file)
+    file_path = upload_path(file.filename)
+    output_name = detected_name(file_path, current_user.id)  # Unique per upload, so sessions never share a photo
+    saved = await retain_upload(contents, file.filename, background_tasks)
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    # ✅ Face recognition logic (stub/demo)
+    # ✅ Face recognition logic (stub/demo), off the event loop
     try:
-        recognized = recognize_faces_from_image(file_path)
+        recognized = await run_inference(recognize_faces_from_image, file_path, contents, output_name)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recognition error: {e}")
 
@@ -65,19 +73,25 @@ async def upload_attendance(
 
     # ✅ Store in DB - Updated to include new fields
     today = date.today()
-    for entry in recognized:
-        student = db.query(Student).filter(Student.roll_no == entry["roll_no"]).first()
-        attendance = Attendance(
-            student_id=student.id if student else None,
-            subject=subject,
-            course=course,  # Added
-            department=department,  # Added
-            year=year,  # Added
-            date=today,
-            status=entry["status"],
-            marked_by=current_user.id,  # Fixed: Use ID instead of username
-        )
-        db.add(attendance)
+    roll_to_id = student_ids_by_roll(db, [entry["roll_no"] for entry in recognized])
+    rows = [
+        {
+            "student_id": roll_to_id[entry["roll_no"]],
+            "subject": subject,
+            "course": course,  # Added
+            "department": department,  # Added
+            "year": year,  # Added
+            "date": today,
+            "status": entry["status"],
+            "marked_by": current_user.id,  # Fixed: Use ID instead of username
+        }
+        for entry in recognized
+        if entry["roll_no"] in roll_to_id  # Unknown faces have no student row
+    ]
+    insert_attendance(db, rows)
+    detected = source_path(output_name)
+    if os.path.exists(detected):  # Photo and boxes kept by the recognizer for the preview
+        record_artifact(db, "image", detected, owner_id=current_user.id, subject=subject, session_date=today)
     db.commit()
 
     return {
@@ -86,32 +100,21 @@ async def upload_attendance(
         "course": course,
         "recognized_count": len(recognized),
         "records": recognized,
-        "file_saved": file_path,
+        "file_saved": file_path if saved else "",
     }
 
 # ✅ Get attendance reports (for that faculty) - Updated for frontend compatibility
 @router.get("/reports")
 def get_faculty_reports(
+    filters: dict = Depends(report_filters),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
-    Fetch all attendance reports uploaded by the current faculty.
+    Attendance percentages for the sessions marked by the current faculty.
     """
     if current_user.role != "faculty":
         raise HTTPException(status_code=403, detail="Access denied. Faculty only.")
     
-    reports = (
-        db.query(Attendance)
-        .filter(Attendance.marked_by == current_user.id)  # Fixed: Use ID
-        .all()
-    )
-
-    return [
-        {
-            "subject": r.subject,  # Updated for frontend
-            "attendance": "88%",  # Placeholder: Calculate real % based on status
-            "date": str(r.date)
-        }
-        for r in reports
-    ]
\ No newline at end of file
+    # Attendance % per subject and month, aggregated from the rollup table
+    return attendance_percentages(db, by="subject", marked_by=current_user.id, filters=filters)
\ No newline at end of file
@@ -1,10 +1,16 @@
 # backend/app/api/routes/reports.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-import os
+from datetime import date
 from app.core.deps import get_current_user
+from app.core.auth_roles import require_role
 from app.core.database import SessionLocal
-from app.core.models import Attendance
+from app.core.attendance_report import session_report
+from app.core.attendance_rollup import attendance_percentages
+from app.core.attendance_query import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, attendance_page, attendance_records, report_filters, stream_export,
+)
 
 router = APIRouter(tags=["Reports"])
 
@@ -16,63 +22,100 @@ def get_db():
         db.close()
 
 @router.get("/admin")
-def get_admin_reports(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+def get_admin_reports(
+    filters: dict = Depends(report_filters),
+    claims: dict = Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
     """
-    ✅ Admin reports: All attendance records with summary.
+    ✅ Admin reports: attendance % per course and month, from the attendance rollup.
+    Authorized from the token's role claim alone.
     """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    reports = db.query(Attendance).all()
-    return [
-        {
-            "course": r.course,  # From updated models
-            "attendance": "85%",  # Placeholder: Calculate real % (e.g., based on status counts)
-            "date": str(r.date)
-        }
-        for r in reports
-    ]
+    return attendance_percentages(db, by="course", filters=filters)
 
 @router.get("/faculty")
-def get_faculty_reports(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+def get_faculty_reports(
+    filters: dict = Depends(report_filters),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """
-    ✅ Faculty reports: Only their uploaded attendance.
+    ✅ Faculty reports: attendance % per subject and month for sessions they marked.
     """
     if current_user.role != "faculty":
         raise HTTPException(status_code=403, detail="Access denied")
-    
-    reports = db.query(Attendance).filter(Attendance.marked_by == current_user.id).all()
-    print(f"Debug: Faculty {current_user.id} has {len(reports)} attendance records")  # Debug print
-    
-    return [
-        {
-            "subject": r.subject,
-            "attendance": "88%",  # Placeholder: Calculate real % if needed
-            "date": str(r.date)
-        }
-        for r in reports
-    ]
 
-@router.get("/download/{filename}")
-def download_report(filename: str):
+    return attendance_percentages(db, by="subject", marked_by=current_user.id, filters=filters)
+
+def _records_scope(current_user):
+    """Admins see every record, faculty only the sessions they marked."""
+    if current_user.role == "admin":
+        return None
+    if current_user.role == "faculty":
+        return current_user.id
+    raise HTTPException(status_code=403, detail="Access denied")
+
+@router.get("/records")
+def get_attendance_records(
+    cursor: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: dict = Depends(report_filters),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """
-    ✅ Returns a direct file download from attendance_reports folder.
+    ✅ Attendance records, newest first, one page at a time.
+    Pass the returned next_cursor to fetch the following page.
     """
+    query = attendance_records(db, filters, marked_by=_records_scope(current_user))
+    try:
+        return attendance_page(query, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Decide folder based on file type
-    if filename.endswith(".pdf"):
-        file_path = os.path.join("backend", "storage", "attendance_reports", "pdf", filename)
-    elif filename.endswith(".csv"):
-        file_path = os.path.join("backend", "storage", "attendance_reports", "csv", filename)
-    else:
-        raise HTTPException(status_code=400, detail="Invalid file type")
+@router.get("/records/export")
+def export_attendance_records(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    filters: dict = Depends(report_filters),
+    current_user=Depends(get_current_user),
+):
+    """
+    ✅ Streams every matching record as CSV or NDJSON, fetched in keyset batches.
+    """
+    marked_by = _records_scope(current_user)
 
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+    def body():
+        db = SessionLocal()  # Owned by the stream, which outlives the request handler
+        try:
+            yield from stream_export(attendance_records(db, filters, marked_by=marked_by), format)
+        finally:
+            db.close()
 
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        file_path,
-        media_type="application/octet-stream",
-        filename=filename
-    )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="attendance_{date.today()}.{format}"'}
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+REPORT_MEDIA_TYPES = {"csv": "text/csv", "pdf": "application/pdf"}
+
+def send_session_report(db: Session, subject: str, day: date, fmt: str, marked_by: int = None):
+    """Serve a session report (only ``marked_by``'s rows when given), building it on first request."""
+    path = session_report(db, subject, day, fmt, marked_by)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No attendance recorded for this session")
+    return FileResponse(path=path, media_type=REPORT_MEDIA_TYPES[fmt], filename=f"{subject}_{day}.{fmt}")
+
+@router.get("/session")
+def download_session_report(
+    subject: str,
+    date: date,
+    format: str = Query("csv", pattern="^(csv|pdf)$"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    ✅ CSV/PDF report for one class session (subject + date), built on demand
+    and cached until that session's attendance changes. Non-admins get only
+    the rows they marked.
+    """
+    marked_by = None if current_user.role == "admin" else current_user.id
+    return send_session_report(db, subject, date, format, marked_by=marked_by)
@@ -1,20 +1,16 @@
 # backend/app/api/routes/students.py
 import os
-import pickle
-import cv2
-import numpy as np
-import insightface
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.core.models import Student
+from app.core.embedding_codec import embedding_columns
+from app.core.face_recognition_engine import encode_student_face
+from app.core.inference_pool import run_inference
+from app.core.image_upload import read_upload
 
 router = APIRouter(tags=["Students"])
 
-# Load face model once
-face_app = insightface.app.FaceAnalysis(providers=['CPUExecutionProvider'])
-face_app.prepare(ctx_id=0, det_size=(640, 640))
-
 def get_db():
     db = SessionLocal()
     try:
@@ -39,24 +35,22 @@ async def add_student(
     # 1️⃣ Save uploaded image locally (optional)
     os.makedirs("backend/app/static/student_images", exist_ok=True)
     image_path = f"backend/app/static/student_images/{roll_no}.jpg"
-    contents = await image.read()
+    contents = await read_upload(image)
     with open(image_path, "wb") as f:
         f.write(contents)
 
-    # 2️⃣ Read and detect face with error handling
+    # 2️⃣ Read and detect face with error handling (in the inference pool)
     try:
-        img = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
-        if img is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-        faces = face_app.get(img)
-        if not faces:
-            raise HTTPException(status_code=400, detail="No face detected in image")
+        result = await run_inference(encode_student_face, contents)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Image processing error: {e}")
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
 
     # 3️⃣ Get face embedding
-    emb = faces[0].embedding.astype("float32")
-    emb_bytes = pickle.dumps(emb)  # Pickle storage
+    emb_columns = embedding_columns(result["embedding"])  # Raw float32 storage
 
     # 4️⃣ Save student in DB
     student = Student(
@@ -64,9 +58,11 @@ async def add_student(
         roll_no=roll_no,
         department=department,
         semester=semester,
-        embedding=emb_bytes
+        **emb_columns
     )
     db.add(student)
     db.commit()
     db.refresh(student)
+
+    # The face is matchable from the next recognition: each one refreshes the gallery it searches
     return {"message": f"✅ Added {name}", "student_id": student.id}
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""
+Deferred rendering of annotated attendance photos.
+
+Recognition does not draw on the full-resolution photo or encode a JPEG
+before responding. It keeps a preview-size copy of the decoded photo (never
+the uploaded original, which EDUSNAP_UPLOAD_RETENTION governs) with the face
+boxes and labels in one uncompressed .npz (no encode), catalogued as the
+session's "image" artifact. The first time the image is asked for, the
+preview and a thumbnail are rendered from the stored boxes, cached in
+app/static/attendance_outputs and catalogued as well. Each upload gets its
+own name (see upload_name), so sessions and faculty never share a source.
+
+    EDUSNAP_ANNOTATIONS        deferred | off - keep photos for annotation, or skip it
+    EDUSNAP_PREVIEW_SIDE       long side of the preview in pixels
+    EDUSNAP_THUMBNAIL_SIDE     long side of the thumbnail in pixels
+    EDUSNAP_PREVIEW_FORMAT     webp | jpg
+    EDUSNAP_PREVIEW_QUALITY    encoder quality (1-100)
+"""
+
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from app.core.artifact_catalog import record_artifact
+from app.core.image_upload import decode_image
+
+ANNOTATION_MODE = os.getenv("EDUSNAP_ANNOTATIONS", "deferred").lower()
+PREVIEW_SIDE = int(os.getenv("EDUSNAP_PREVIEW_SIDE", "1280"))
+THUMBNAIL_SIDE = int(os.getenv("EDUSNAP_THUMBNAIL_SIDE", "320"))
+PREVIEW_FORMAT = os.getenv("EDUSNAP_PREVIEW_FORMAT", "webp").lower()
+PREVIEW_QUALITY = int(os.getenv("EDUSNAP_PREVIEW_QUALITY", "80"))
+
+# Absolute paths from project root (edusnapai/)
+BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), ".."))
+SOURCE_DIR = os.path.join(BASE_DIR, "backend", "storage", "annotation_sources")
+RENDER_DIR = os.path.join(BASE_DIR, "backend", "app", "static", "attendance_outputs")
+os.makedirs(SOURCE_DIR, exist_ok=True)
+os.makedirs(RENDER_DIR, exist_ok=True)
+
+_flight_lock = threading.Lock()
+_in_flight = {}  # Source path -> Future, so concurrent requests render an image once
+
+
+def draw_annotations(img, annotations):
+    """Draw (bbox, name-or-None) boxes in place: green first names, red "Unknown"."""
+    for bbox, name in annotations:
+        label, color = (name.split()[0], (0, 255, 0)) if name and name.strip() else ("Unknown", (0, 0, 255))
+        x1, y1, x2, y2 = [int(v) for v in bbox[:4]]
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    return img
+
+
+def upload_name(owner_id, *parts) -> str:
+    """A source name unique to one upload: ``parts``, the uploader and a random token."""
+    parts = [re.sub(r"[^A-Za-z0-9-]+", "-", str(part)) for part in parts]
+    return "_".join([*parts, f"u{owner_id or 0}", uuid.uuid4().hex[:12]])
+
+
+def source_path(name: str) -> str:
+    """Where the photo and boxes of annotated image ``name`` are kept."""
+    return os.path.join(SOURCE_DIR, f"{name}.npz")
+
+
+def save_source(name: str, img, annotations):
+    """
+    Keep a decoded photo for deferred annotation: its pixels shrunk to the
+    preview size, the (width, height) of ``img`` that the boxes refer to and
+    the (bbox, name-or-None) pairs. Returns the path, or None when
+    annotations are off.
+    """
+    if ANNOTATION_MODE == "off":
+        return None
+    path = source_path(name)
+    for stale in rendered_paths(path):  # Renders of a photo previously stored under this name
+        if os.path.exists(stale):
+            os.remove(stale)
+    boxes = np.array([[float(v) for v in bbox[:4]] for bbox, _ in annotations], dtype=np.float32).reshape(-1, 4)
+    labels = np.array([label or "" for _, label in annotations], dtype=str)
+    size = np.array([img.shape[1], img.shape[0]])
+    np.savez(path, pixels=_fit(img, PREVIEW_SIDE), size=size, boxes=boxes, labels=labels)
+    return path
+
+
+def _fit(img, side: int):
+    height, width = img.shape[:2]
+    if max(height, width) <= side:
+        return img
+    while max(height, width) >= 2 * side:  # OpenCV's area averaging has a fast path for exact halves
+        img = cv2.resize(img, (max(1, width // 2), max(1, height // 2)), interpolation=cv2.INTER_AREA)
+        height, width = img.shape[:2]
+    if max(height, width) <= side:
+        return img
+    scale = side / max(height, width)  # Under 2x from here, where bilinear does not alias
+    return cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_LINEAR)
+
+
+def _encode_params():
+    if PREVIEW_FORMAT == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, PREVIEW_QUALITY]
+    return [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1, cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+
+
+def _write(path: str, img):
+    ok, encoded = cv2.imencode(f".{PREVIEW_FORMAT}", img, _encode_params())
+    if not ok:
+        raise ValueError(f"Could not encode {PREVIEW_FORMAT} image")
+    partial = f"{path}.part"
+    with open(partial, "wb") as out:
+        out.write(encoded.tobytes())
+    os.replace(partial, path)  # Readers never see a half-written file
+
+
+def rendered_paths(source: str):
+    """(preview, thumbnail) paths of a stored source."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return (os.path.join(RENDER_DIR, f"{stem}.{PREVIEW_FORMAT}"),
+            os.path.join(RENDER_DIR, f"{stem}_thumb.{PREVIEW_FORMAT}"))
+
+
+def render(source: str):
+    """
+    Render the preview and thumbnail of a stored source. Returns (preview,
+    thumbnail) paths, or None if the source is missing or not an image.
+    """
+    preview, thumbnail = rendered_paths(source)
+    if os.path.exists(preview) and os.path.exists(thumbnail):
+        return preview, thumbnail
+    if not os.path.exists(source):
+        return None
+
+    with np.load(source) as data:
+        size, boxes, labels = data["size"], data["boxes"], data["labels"]
+        if "pixels" in data:
+            img = data["pixels"]
+        else:  # Sources saved before pixels were kept hold the encoded upload
+            img = decode_image(data["photo"].tobytes(), max_side=PREVIEW_SIDE)
+    if img is None:
+        return None
+    img = _fit(img, PREVIEW_SIDE)
+    scale = img.shape[1] / float(size[0])
+    draw_annotations(img, [(box * scale, str(label) or None) for box, label in zip(boxes, labels)])
+
+    _write(preview, img)
+    _write(thumbnail, _fit(img, THUMBNAIL_SIDE))
+    return preview, thumbnail
+
+
+def _render_once(source: str):
+    """render(source), joining an in-progress render of the same source."""
+    with _flight_lock:
+        future = _in_flight.get(source)
+        owner = future is None
+        if owner:
+            future = Future()  # Rendered below, outside the lock; others wait on it
+            _in_flight[source] = future
+    if owner:
+        try:
+            future.set_result(render(source))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _flight_lock:
+                del _in_flight[source]
+    return future.result()
+
+
+def annotated_image(db, artifact):
+    """
+    {"preview": path, "thumbnail": path} for a catalogued "image" artifact,
+    rendered and catalogued on first use; None when there is nothing to show.
+    Images catalogued before rendering was deferred are returned as they are.
+    """
+    if artifact is None:
+        return None
+    if not artifact.path.endswith(".npz"):
+        return {"preview": artifact.path, "thumbnail": artifact.path} if os.path.exists(artifact.path) else None
+
+    cached = all(os.path.exists(p) for p in rendered_paths(artifact.path))
+    paths = _render_once(artifact.path)
+    if paths is None:
+        return None
+
+    if not cached:
+        for kind, path in zip(("preview", "thumbnail"), paths):
+            record_artifact(db, kind, path, owner_id=artifact.owner_id, subject=artifact.subject,
+                            session_date=artifact.session_date)
+        try:
+            db.commit()
+        except IntegrityError:  # Another process catalogued the same render first
+            db.rollback()
+    return {"preview": paths[0], "thumbnail": paths[1]}
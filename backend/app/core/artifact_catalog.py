@@ -0,0 +1,111 @@
+"""
+Catalog of generated files (session CSV/PDF reports, stored photos for
+annotation and their rendered previews and thumbnails).
+
+Every file the app generates is recorded with its owner, session (subject,
+date), size and time, so "latest for me" is one indexed row lookup and
+retention deletes by age from the table instead of walking directories.
+
+    EDUSNAP_ARTIFACT_RETENTION_DAYS   files older than this are deleted at startup
+"""
+
+import os
+from datetime import datetime, timedelta
+from app.core.models import Artifact
+
+ARTIFACT_KINDS = ("csv", "pdf", "image", "preview", "thumbnail")
+ARTIFACT_RETENTION_DAYS = int(os.getenv("EDUSNAP_ARTIFACT_RETENTION_DAYS", "10"))
+PURGE_BATCH_SIZE = 500
+
+STATIC_ROOT = os.path.abspath(os.path.join(os.getcwd(), "..", "backend", "app", "static"))
+
+
+def record_artifact(db, kind: str, path: str, owner_id: int = None, subject: str = None, session_date=None):
+    """
+    Add (or refresh, when the path is already catalogued) one generated
+    file. Does not commit; the caller owns the transaction.
+    """
+    if kind not in ARTIFACT_KINDS:
+        raise ValueError(f"Unknown artifact kind '{kind}', expected one of {ARTIFACT_KINDS}")
+    path = os.path.abspath(path)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    artifact = db.query(Artifact).filter(Artifact.path == path).first()
+    if artifact is None:
+        artifact = Artifact(path=path)
+        db.add(artifact)
+    artifact.kind = kind
+    artifact.owner_id = owner_id
+    artifact.subject = subject
+    artifact.session_date = session_date
+    artifact.size_bytes = size
+    artifact.created_at = datetime.utcnow()
+    return artifact
+
+
+def latest_artifact(db, kind: str, owner_id: int = None, subject: str = None, session_date=None):
+    """Newest artifact of ``kind``, optionally for one owner and/or session."""
+    query = db.query(Artifact).filter(Artifact.kind == kind)
+    if owner_id is not None:
+        query = query.filter(Artifact.owner_id == owner_id)
+    if subject is not None:
+        query = query.filter(Artifact.subject == subject)
+    if session_date is not None:
+        query = query.filter(Artifact.session_date == session_date)
+    return query.order_by(Artifact.created_at.desc(), Artifact.id.desc()).first()
+
+
+def replace_session_artifacts(db, kind: str, subject: str, session_date, keep_path: str, owner_id: int = None):
+    """Delete the files and rows of a session's older ``kind`` artifacts of ``owner_id`` (e.g. stale reports)."""
+    keep_path = os.path.abspath(keep_path)
+    owner = Artifact.owner_id.is_(None) if owner_id is None else Artifact.owner_id == owner_id
+    stale = (
+        db.query(Artifact)
+        .filter(Artifact.kind == kind, Artifact.subject == subject, Artifact.session_date == session_date,
+                owner, Artifact.path != keep_path)
+        .all()
+    )
+    for artifact in stale:
+        _remove_file(artifact.path)
+        db.delete(artifact)
+    return len(stale)
+
+
+def static_url(path: str) -> str:
+    """URL of a file served from app/static ("" for files outside it)."""
+    if not path:
+        return ""
+    from urllib.parse import quote
+
+    relative = os.path.relpath(path, STATIC_ROOT)
+    if relative.startswith(".."):
+        return ""
+    return "/static/" + quote(relative.replace(os.sep, "/"))
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def purge_artifacts(db, days: int = ARTIFACT_RETENTION_DAYS) -> int:
+    """Delete artifacts (files and rows) older than ``days``, in batches. Commits."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    purged = 0
+    while True:
+        batch = (
+            db.query(Artifact.id, Artifact.path)
+            .filter(Artifact.created_at < cutoff)
+            .order_by(Artifact.created_at)
+            .limit(PURGE_BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            return purged
+        for _, path in batch:
+            _remove_file(path)
+        db.query(Artifact).filter(Artifact.id.in_([a.id for a in batch])).delete(synchronize_session=False)
+        db.commit()
+        purged += len(batch)
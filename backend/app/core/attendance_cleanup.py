@@ -1,11 +1,14 @@
 from datetime import date, timedelta
 from app.core.database import SessionLocal
 from app.core.models import Attendance
+from app.core.attendance_rollup import ensure_rollup
+from app.core.artifact_catalog import ARTIFACT_RETENTION_DAYS, purge_artifacts
 
 
 def delete_old_attendance(days: int = 10):
     db = SessionLocal()
     try:
+        ensure_rollup(db)  # Purged rows must already be counted in the rollup
         cutoff_date = date.today() - timedelta(days=days)
 
         deleted = (
@@ -18,3 +21,11 @@ def delete_old_attendance(days: int = 10):
         return deleted
     finally:
         db.close()
+
+
+def delete_old_artifacts(days: int = ARTIFACT_RETENTION_DAYS):
+    db = SessionLocal()
+    try:
+        return purge_artifacts(db, days)
+    finally:
+        db.close()
@@ -1,173 +1,267 @@
 import os
 import cv2
-import pickle
 import numpy as np
 import pandas as pd  # Added for CSV/XLSX processing
 from datetime import date
 from app.core.database import SessionLocal
 from app.core.models import Student, Attendance, User
-from app.core.face_recognition_engine import FaceEncoder
-from app.core.attendance_report import generate_csv, generate_pdf
-
-encoder = FaceEncoder()
+from app.core.face_recognition_engine import encoder
+from app.core.embedding_gallery import get_gallery
+from app.core.face_matching import match_faces
+from app.core.attendance_writer import insert_attendance, mark_absent_rest, mark_present, student_ids_by_roll
+from app.core.attendance_report import report_url
+from app.core.artifact_catalog import record_artifact
+from app.core.annotations import save_source, upload_name
+from app.core.stage_timer import StageTimer
+from app.core.image_upload import decode_image
 
 # Absolute paths from project root (edusnapai/)
 BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), ".."))
 OUTPUT_DIR = os.path.join(BASE_DIR, "backend", "storage", "attendance_outputs")
-STATIC_DIR = os.path.join(BASE_DIR, "backend", "app", "static", "attendance_outputs")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(STATIC_DIR, exist_ok=True)
 
-def process_attendance_file(file, db, faculty_id):
-    """Process uploaded CSV/XLSX file for attendance marking (for frontend upload)."""
+IMPORT_CHUNK_SIZE = int(os.getenv("EDUSNAP_IMPORT_CHUNK_SIZE", "5000"))
+VALID_STATUSES = ("Present", "Absent")
+PIPELINE_STAGES = ("decode", "detect", "match", "annotate", "write")
+
+
+def _read_xlsx_chunks(fileobj, chunk_size):
+    """Stream an .xlsx sheet in read-only mode as DataFrame chunks."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
     try:
-        # Read file based on extension
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file.file)
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file.file)
-        else:
-            return {"error": "Unsupported file type. Use CSV or XLSX."}
-
-        # Assume columns: roll_no, status (Present/Absent), subject (optional)
-        required_cols = ['roll_no', 'status']
-        if not all(col in df.columns for col in required_cols):
-            return {"error": "File must have 'roll_no' and 'status' columns."}
-
-        today = date.today()
-        subject = df.get('subject', ['General'])[0]  # Default subject if not provided
-        processed_count = 0
-
-        for _, row in df.iterrows():
-            roll_no = row['roll_no']
-            status = row['status'].capitalize()  # Ensure 'Present' or 'Absent'
-
-            # Find student by roll_no
-            student = db.query(Student).filter(Student.roll_no == roll_no).first()
-            if not student:
-                continue  # Skip unknown students
-
-            # Check if already marked
-            existing = db.query(Attendance).filter(
-                Attendance.student_id == student.id,
-                Attendance.subject == subject,
-                Attendance.date == today
-            ).first()
-            if existing:
-                continue  # Skip duplicates
-
-            # Add attendance record (note: course/department/year not used in file processing, so defaults)
-            db.add(Attendance(
-                student_id=student.id,
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def _read_chunks(file, chunk_size):
+    """Yield DataFrame chunks of an uploaded CSV/XLSX/XLS file."""
+    name = file.filename.lower()
+    if name.endswith('.csv'):
+        return pd.read_csv(file.file, chunksize=chunk_size, dtype=str)
+    if name.endswith('.xlsx'):
+        return _read_xlsx_chunks(file.file, chunk_size)
+    if name.endswith('.xls'):
+        return iter([pd.read_excel(file.file, dtype=str)])  # Legacy format has no streaming reader
+    return None
+
+
+def process_attendance_file(file, db, faculty_id, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Process uploaded CSV/XLSX file for attendance marking (for frontend upload).
+    The sheet is streamed in chunks; each chunk is resolved with one roll_no
+    lookup, validated column-wise and written with one bulk insert.
+    """
+    chunks = _read_chunks(file, chunk_size)
+    if chunks is None:
+        return {"error": "Unsupported file type. Use CSV or XLSX."}
+
+    today = date.today()
+    subject = None
+    totals = {"processed": 0, "skipped": 0, "invalid": 0}
+    chunk_reports = []
+
+    try:
+        for number, df in enumerate(chunks, start=1):
+            # Assume columns: roll_no, status (Present/Absent), subject (optional)
+            if subject is None:
+                if not all(col in df.columns for col in ('roll_no', 'status')):
+                    return {"error": "File must have 'roll_no' and 'status' columns."}
+                subjects = df['subject'].dropna() if 'subject' in df.columns else []
+                subject = str(subjects.iloc[0]) if len(subjects) else 'General'  # Default subject if not provided
+
+            rolls = df['roll_no'].astype(str).str.strip()
+            statuses = df['status'].astype(str).str.strip().str.capitalize()
+            valid = df['roll_no'].notna() & (rolls != "") & statuses.isin(VALID_STATUSES)
+            chunk = pd.DataFrame({"roll_no": rolls[valid], "status": statuses[valid]})
+
+            # One roll_no -> id lookup per chunk, joined column-wise
+            roll_map = pd.DataFrame(
+                list(student_ids_by_roll(db, chunk['roll_no'].unique()).items()),
+                columns=["roll_no", "student_id"],
+            )
+            known = chunk.merge(roll_map, on="roll_no", how="inner")
+
+            rows = known[["student_id", "status"]].assign(
                 subject=subject,
                 course="General",  # Default for file uploads
                 department="General",  # Default for file uploads
                 year=str(today.year),  # Default to current year
                 date=today,
-                status=status,
-                marked_by=faculty_id
-            ))
-            processed_count += 1
+                marked_by=faculty_id,
+            ).to_dict("records")
+            for row in rows:
+                row["student_id"] = int(row["student_id"])
+
+            # Duplicates (already marked today) are dropped by ON CONFLICT DO NOTHING
+            processed = len(insert_attendance(db, rows))
+            db.commit()
+
+            report = {
+                "chunk": number,
+                "rows": len(df),
+                "processed": processed,
+                "skipped": int(valid.sum()) - processed,  # Unknown roll numbers and duplicates
+                "invalid": int((~valid).sum()),
+            }
+            chunk_reports.append(report)
+            for key in totals:
+                totals[key] += report[key]
 
-        db.commit()
-        return {"message": f"Attendance processed for {processed_count} students.", "processed": processed_count}
+        return {
+            "message": f"Attendance processed for {totals['processed']} students.",
+            "subject": subject,
+            **totals,
+            "chunks": chunk_reports,
+        }
 
     except Exception as e:
         db.rollback()
-        return {"error": f"Failed to process file: {str(e)}"}
+        return {"error": f"Failed to process file: {str(e)}", **totals, "chunks": chunk_reports}
 
-def mark_attendance_from_image(image_path: str, subject: str, department: str = "", year: str = "", course: str = ""):
-    """Original image-based attendance marking (preserved for face recognition). Updated to accept new params and fixed similarity."""
-    db = SessionLocal()
-    today = date.today()
+def recognize_photo(image_path: str = None, image_bytes: bytes = None, output_name: str = "", on_stage=None):
+    """
+    Detection + recognition for one photo, without touching attendance.
+    Keeps the photo and its boxes as ``output_name`` for deferred annotation
+    and returns the recognized students (with similarity and margin), or
+    {"error": ...}. Module-level so it can run in the inference pool.
+    """
+    timer = StageTimer(on_stage)
 
-    img = cv2.imread(image_path)
+    with timer.stage("decode"):
+        if image_bytes is not None:
+            img = decode_image(image_bytes)
+        else:
+            img = cv2.imread(image_path)
     if img is None:
         return {"error": "Invalid image"}
 
-    students = db.query(Student).filter(Student.embedding.isnot(None)).all()
-    if not students:
-        return {"error": "No registered faces found"}
+    db = SessionLocal()
+    try:
+        with timer.stage("detect"):
+            gallery = get_gallery(db)
+            if not len(gallery):
+                return {"error": "No registered faces found"}
+            faces = encoder.detect(img)
+    finally:
+        db.close()
 
-    known_embeddings = []
-    student_map = {}
+    with timer.stage("match"):
+        matches = match_faces(gallery, [face.embedding for face in faces])
 
-    for idx, s in enumerate(students):
-        try:
-            emb = pickle.loads(s.embedding)  # Pickle loading
-            known_embeddings.append(emb)
-            student_map[idx] = s
-        except Exception as e:
-            print(f"Skipping invalid embedding for {s.name}: {e}")
-            continue
+    present_students = []
+    annotations = []
 
-    known_embeddings = np.array(known_embeddings)
+    with timer.stage("annotate"):
+        for face, match in zip(faces, matches):
+            label = None
+            if match["row"] is not None:
+                student = gallery.student(match["row"])
+                student.update(similarity=match["score"], margin=match["margin"])
 
-    faces = encoder.app.get(img)
-    threshold = 0.45
+                present_students.append(student)
+                label = student["name"]
+            annotations.append((face.bbox, label))
 
-    present_students = []
+        # Only the boxes (and a preview-size copy) are kept here; the preview is drawn when first viewed
+        source = save_source(output_name or upload_name(None, "photo"), img, annotations)
+
+    return {
+        "faces_detected": len(faces),
+        "gallery_size": len(gallery),
+        "present_students": present_students,
+        "annotation_source": source,
+        "timings": timer.timings,
+    }
 
-    for face in faces:
-        emb = encoder.l2_normalize(face.embedding)  # Normalize query embedding
-        # Fixed: Proper cosine similarity (0-1 range)
-        similarities = np.dot(known_embeddings, emb) / (np.linalg.norm(known_embeddings, axis=1) * np.linalg.norm(emb))
-        idx = np.argmax(similarities)
-        max_sim = similarities[idx]
-
-        if max_sim > threshold:
-            student = student_map[idx]
-
-            already_marked = db.query(Attendance).filter(
-                Attendance.student_id == student.id,
-                Attendance.subject == subject,
-                Attendance.date == today
-            ).first()
-
-            if not already_marked:
-                db.add(Attendance(
-                    student_id=student.id,
-                    subject=subject,
-                    course=course,  # Added
-                    department=department,  # Added
-                    year=year,  # Added
-                    date=today,
-                    status="Present"
-                ))
-
-            present_students.append({
-                "id": student.id,
-                "roll_no": student.roll_no,
-                "name": student.name,
-                "department": student.department
-            })
-
-            label = student.name.split()[0]
-            color = (0, 255, 0)
-        else:
-            label = "Unknown"
-            color = (0, 0, 255)
 
-        bbox = face.bbox.astype(int)
-        cv2.rectangle(img, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-        cv2.putText(img, label, (bbox[0], bbox[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+def merge_recognitions(results):
+    """Combine per-photo recognitions of one session, keeping each student's best score."""
+    best = {}
+    for result in results:
+        for student in result["present_students"]:
+            current = best.get(student["id"])
+            if current is None or student["similarity"] > current["similarity"]:
+                best[student["id"]] = student
+    return sorted(best.values(), key=lambda s: -s["similarity"])
 
-    output_image = os.path.join(STATIC_DIR, f"{subject}_{today}.jpg")
-    cv2.imwrite(output_image, img)
 
-    db.commit()
-    db.close()
+def record_attendance(present_students, subject: str, department: str = "", year: str = "", course: str = "",
+                      marked_by: int = None, on_stage=None, images=()):
+    """
+    Write one session's attendance in a single bulk insert, the department's
+    unmatched students as Absent, cataloguing its stored photos (``images``,
+    annotation source paths) in the same transaction.
+    Reports are not built here; the returned URLs build them from the
+    database on first download.
+    """
+    timer = StageTimer(on_stage)
+    today = date.today()
 
-    csv_path = generate_csv(subject, present_students)
-    pdf_path = generate_pdf(subject, present_students)
+    db = SessionLocal()
+    try:
+        with timer.stage("write"):
+            # One bulk insert for the whole session; students already marked today are skipped
+            present_ids = [s["id"] for s in present_students]
+            newly_marked = mark_present(
+                db, present_ids, subject, today,
+                course=course, department=department, year=year, marked_by=marked_by,
+            )
+            # The rest of the department missed this session
+            absent = mark_absent_rest(
+                db, present_ids, subject, today,
+                course=course, department=department, year=year, marked_by=marked_by,
+            )
+            for image in images:
+                if image:  # None when annotations are off
+                    record_artifact(db, "image", image, owner_id=marked_by, subject=subject, session_date=today)
+            db.commit()
+    finally:
+        db.close()
 
     return {
         "date": str(today),
         "subject": subject,
         "present_count": len(present_students),
+        "newly_marked": len(newly_marked),
+        "absent_count": len(absent),
         "present_students": present_students,
-        "output_image": os.path.basename(output_image),
-        "csv_report": os.path.basename(csv_path),
-        "pdf_report": os.path.basename(pdf_path)
-    }
\ No newline at end of file
+        "csv_report": report_url(subject, today, "csv") if present_students else "",
+        "pdf_report": report_url(subject, today, "pdf") if present_students else "",
+        "timings": timer.timings,
+    }
+
+
+def mark_attendance_from_image(image_path: str = None, subject: str = "", department: str = "", year: str = "",
+                               course: str = "", marked_by: int = None, image_bytes: bytes = None, on_stage=None):
+    """
+    Image-based attendance marking: detect faces, match them against the
+    gallery, write attendance and link the (lazily built) reports. The image comes from
+    ``image_path`` or, for queued jobs, from ``image_bytes``. Per-stage
+    timings are returned under "timings"; ``on_stage`` is called as each
+    stage starts.
+    """
+    recognized = recognize_photo(image_path, image_bytes, upload_name(marked_by, subject, date.today()), on_stage)
+    if "error" in recognized:
+        return recognized
+
+    result = record_attendance(recognized["present_students"], subject, department, year, course,
+                               marked_by, on_stage, images=[recognized["annotation_source"]])
+    result.update(
+        faces_detected=recognized["faces_detected"],
+        gallery_size=recognized["gallery_size"],
+        unknown_count=recognized["faces_detected"] - result["present_count"],
+        timings={**recognized["timings"], **result["timings"]},
+    )
+    return result
@@ -0,0 +1,175 @@
+"""
+Persistent queue for image attendance uploads.
+
+The API stores the upload in the attendance_jobs table and returns a job id
+right away; workers (scaled independently of the API) claim queued jobs,
+run the attendance pipeline and record stage progress, timings and the
+final result. Start a worker with:
+
+    python -m app.core.attendance_jobs
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.core.database import SessionLocal
+from app.core.models import AttendanceJob
+from app.core.attendance_engine import PIPELINE_STAGES, mark_attendance_from_image
+from app.core.metrics import record_pipeline
+
+POLL_INTERVAL = float(os.getenv("EDUSNAP_JOB_POLL_SECONDS", "1.0"))
+JOB_TIMEOUT = timedelta(seconds=int(os.getenv("EDUSNAP_JOB_TIMEOUT_SECONDS", "600")))
+MAX_ATTEMPTS = 3
+
+
+def enqueue_job(db, image: bytes, params: dict, created_by: int = None) -> AttendanceJob:
+    """Store an upload as a queued job and return it."""
+    job = AttendanceJob(
+        id=uuid.uuid4().hex,
+        status="queued",
+        params=params,
+        image=image,
+        created_by=created_by,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def job_status(job: AttendanceJob) -> dict:
+    """Public view of a job for the polling endpoint."""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress or 0,
+        "timings": job.timings or {},
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def _requeue_stale_jobs(db):
+    """Give jobs whose worker died another try (or fail them after MAX_ATTEMPTS)."""
+    cutoff = datetime.utcnow() - JOB_TIMEOUT
+    stale = AttendanceJob.status == "running", AttendanceJob.updated_at < cutoff
+    db.execute(
+        update(AttendanceJob)
+        .where(*stale, AttendanceJob.attempts < MAX_ATTEMPTS)
+        .values(status="queued", stage=None)
+    )
+    db.execute(
+        update(AttendanceJob)
+        .where(*stale, AttendanceJob.attempts >= MAX_ATTEMPTS)
+        .values(status="failed", error="Worker timed out", image=None)
+    )
+    db.commit()
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to 'running'; returns its id or None."""
+    db = SessionLocal()
+    try:
+        _requeue_stale_jobs(db)
+        while True:
+            candidate = (
+                db.query(AttendanceJob.id)
+                .filter(AttendanceJob.status == "queued")
+                .order_by(AttendanceJob.created_at)
+                .with_for_update(skip_locked=True)  # Postgres: workers never wait on each other
+                .first()
+            )
+            if candidate is None:
+                db.rollback()
+                return None
+            # Conditional update keeps the claim safe on databases without SKIP LOCKED
+            claimed = db.execute(
+                update(AttendanceJob)
+                .where(AttendanceJob.id == candidate.id, AttendanceJob.status == "queued")
+                .values(
+                    status="running",
+                    attempts=AttendanceJob.attempts + 1,
+                    updated_at=datetime.utcnow(),
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                return candidate.id
+    finally:
+        db.close()
+
+
+def process_job(job_id: str):
+    """Run the attendance pipeline for one claimed job and store the outcome."""
+    db = SessionLocal()
+    try:
+        job = db.get(AttendanceJob, job_id)
+        if job is None:
+            return
+        params = dict(job.params)
+        image = job.image
+
+        def on_stage(stage):
+            job.stage = stage
+            job.progress = int(100 * PIPELINE_STAGES.index(stage) / len(PIPELINE_STAGES))
+            db.commit()
+
+        try:
+            result = mark_attendance_from_image(
+                image_bytes=image,
+                subject=params.get("subject", ""),
+                department=params.get("department", ""),
+                year=params.get("year", ""),
+                course=params.get("course", ""),
+                marked_by=job.created_by,
+                on_stage=on_stage,
+            )
+        except Exception as e:
+            result = {"error": f"Attendance processing failed: {e}"}
+
+        record_pipeline("job", result)  # Visible at /metrics when the worker is embedded in the API
+        job.timings = result.pop("timings", None)
+        job.stage = None
+        job.image = None  # The bytes are no longer needed once processed
+        if "error" in result:
+            job.status, job.error = "failed", result["error"]
+        else:
+            job.status, job.result, job.progress = "done", result, 100
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_worker(poll_interval: float = POLL_INTERVAL, load_model: bool = True):
+    """Claim and process jobs forever."""
+    if load_model:
+        from app.core.model_registry import warm_up
+
+        warm_up()
+    print(f"👷 Attendance job worker started (pid {os.getpid()})")
+    while True:
+        job_id = claim_next_job()
+        if job_id is None:
+            time.sleep(poll_interval)
+            continue
+        print(f"⚙️ Processing attendance job {job_id}")
+        process_job(job_id)
+
+
+def start_embedded_worker():
+    """Run a worker thread inside the API process (EDUSNAP_EMBEDDED_JOB_WORKER=1, for local setups)."""
+    if os.getenv("EDUSNAP_EMBEDDED_JOB_WORKER", "0").lower() not in ("1", "true", "yes"):
+        return None
+    thread = threading.Thread(target=run_worker, kwargs={"load_model": False}, daemon=True, name="attendance-jobs")
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    run_worker()
@@ -0,0 +1,146 @@
+"""
+Filtered, projected and keyset-paginated reads of raw attendance rows.
+
+Pages are ordered newest first by (date, id) and continue from an opaque
+cursor holding the last row's (date, id), so every page is one indexed
+range scan regardless of how deep the client has paged. Exports walk the
+same keyset in batches and stream CSV or NDJSON, keeping memory flat.
+"""
+
+import base64
+import csv
+import io
+import json
+from datetime import date
+from typing import Optional
+from sqlalchemy import and_, or_
+from app.core.models import Attendance, Student
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 2000
+
+# Only these columns are loaded; Student carries the face embedding, which is never needed here
+RECORD_COLUMNS = (
+    Attendance.id,
+    Attendance.date,
+    Attendance.subject,
+    Attendance.course,
+    Attendance.department,
+    Attendance.year,
+    Attendance.status,
+    Student.roll_no,
+    Student.name,
+)
+EXPORT_FIELDS = ["id", "date", "subject", "course", "department", "year", "status", "roll_no", "name"]
+FILTER_FIELDS = ("subject", "course", "department", "year")
+
+
+def report_filters(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    subject: Optional[str] = None,
+    course: Optional[str] = None,
+    department: Optional[str] = None,
+    year: Optional[str] = None,
+) -> dict:
+    """Query-string filters shared by the report endpoints (a FastAPI dependency)."""
+    return {
+        "date_from": date_from, "date_to": date_to,
+        "subject": subject, "course": course, "department": department, "year": year,
+    }
+
+
+def attendance_records(db, filters: dict = None, marked_by: int = None):
+    """Projected attendance rows joined with student roll number and name."""
+    filters = filters or {}
+    query = db.query(*RECORD_COLUMNS).join(Student, Student.id == Attendance.student_id)
+    if marked_by is not None:
+        query = query.filter(Attendance.marked_by == marked_by)
+    if filters.get("date_from"):
+        query = query.filter(Attendance.date >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.filter(Attendance.date <= filters["date_to"])
+    for field in FILTER_FIELDS:
+        if filters.get(field):
+            query = query.filter(getattr(Attendance, field) == filters[field])
+    return query
+
+
+def encode_cursor(day, record_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{day}|{record_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(date, id) from a cursor; ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, record_id = raw.split("|")
+        return date.fromisoformat(day), int(record_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _after(query, day, record_id):
+    """Rows strictly after (day, record_id) in newest-first order."""
+    return query.filter(or_(
+        Attendance.date < day,
+        and_(Attendance.date == day, Attendance.id < record_id),
+    ))
+
+
+def _batch(query, position, size):
+    if position is not None:
+        query = _after(query, *position)
+    return query.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(size).all()
+
+
+def record_dict(row) -> dict:
+    record = row._asdict()
+    record["date"] = str(record["date"])
+    return record
+
+
+def attendance_page(query, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    One page of ``query`` (from attendance_records) after ``cursor``:
+    {"items": [...], "next_cursor": str or None}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = _batch(query, decode_cursor(cursor) if cursor else None, limit + 1)  # One extra row tells if more follow
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1].date, items[-1].id) if len(rows) > limit else None
+    return {"items": [record_dict(r) for r in items], "next_cursor": next_cursor}
+
+
+def iter_records(query, batch_size: int = EXPORT_BATCH_SIZE):
+    """Every row of ``query``, newest first, fetched in keyset batches."""
+    position = None
+    while True:
+        rows = _batch(query, position, batch_size)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        position = (rows[-1].date, rows[-1].id)
+
+
+def stream_export(query, fmt: str = "csv"):
+    """Encode rows of ``query`` as CSV or NDJSON chunks (one chunk per batch)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for row in iter_records(query):
+        record = record_dict(row)
+        if fmt == "csv":
+            writer.writerow([record[field] for field in EXPORT_FIELDS])
+        else:
+            buffer.write(json.dumps(record) + "\n")
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,79 +1,196 @@
+import csv
+import hashlib
+import json
+import multiprocessing
 import os
-import pandas as pd
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from datetime import date
 
 # Absolute paths from project root (edusnapai/)
 BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), ".."))
-CSV_DIR = os.path.join(BASE_DIR, "backend", "storage", "attendance_reports", "csv")
-PDF_DIR = os.path.join(BASE_DIR, "backend", "storage", "attendance_reports", "pdf")
-os.makedirs(CSV_DIR, exist_ok=True)
-os.makedirs(PDF_DIR, exist_ok=True)
-
-def generate_csv(subject: str, present_students: list):
-    """Generate CSV report for attendance."""
-    if not present_students:
-        print("⚠️ No students to include in CSV.")
-        return None
-    
-    today = date.today()
-    filename = f"{subject}_{today}.csv"
-    filepath = os.path.join(CSV_DIR, filename)
-    
-    # Create DataFrame with department
-    data = {
-        "Roll No": [s["roll_no"] for s in present_students],
-        "Name": [s["name"] for s in present_students],
-        "Department": [s.get("department", "N/A") for s in present_students],  # Added department
-        "Status": ["Present"] * len(present_students)
-    }
-    df = pd.DataFrame(data)
-    
-    # Save to CSV
-    df.to_csv(filepath, index=False)
-    print(f"✅ CSV report saved: {filepath}")
-    return filepath
-
-def generate_pdf(subject: str, present_students: list):
-    """Generate PDF report for attendance."""
-    if not present_students:
-        print("⚠️ No students to include in PDF.")
-        return None
-    
-    today = date.today()
-    filename = f"{subject}_{today}.pdf"
-    filepath = os.path.join(PDF_DIR, filename)
-    
-    # Create PDF
-    c = canvas.Canvas(filepath, pagesize=letter)
+CACHE_DIR = os.path.join(BASE_DIR, "backend", "storage", "attendance_reports", "cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+REPORT_FORMATS = ("csv", "pdf")
+REPORT_WORKERS = int(os.getenv("EDUSNAP_REPORT_WORKERS", "1"))  # PDF render processes (0 = render inline)
+
+_pool = None
+_pool_lock = threading.Lock()
+_flight_lock = threading.Lock()
+_in_flight = {}  # Report path -> Future, so concurrent requests render once
+
+
+def _replace_atomically(tmp_path: str, path: str):
+    os.replace(tmp_path, path)  # Readers never see a half-written report
+
+
+def write_csv(path: str, subject: str, day, rows: list):
+    """Write session rows (roll_no, name, department, status) as a CSV report."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Roll No", "Name", "Department", "Status"])
+        for row in rows:
+            writer.writerow([row["roll_no"], row["name"], row.get("department") or "N/A", row.get("status", "Present")])
+    _replace_atomically(tmp_path, path)
+    return path
+
+
+def write_pdf(path: str, subject: str, day, rows: list):
+    """Render session rows as a PDF report. Module-level so it can run in the render pool."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    c = canvas.Canvas(tmp_path, pagesize=letter)
     width, height = letter
-    
+
     # Title
     c.setFont("Helvetica-Bold", 16)
     c.drawString(100, height - 50, f"Attendance Report - {subject}")
-    c.drawString(100, height - 70, f"Date: {today}")
-    
+    c.drawString(100, height - 70, f"Date: {day}")
+
     # Table Header with department
     c.setFont("Helvetica-Bold", 12)
     c.drawString(50, height - 100, "Roll No")
     c.drawString(120, height - 100, "Name")
     c.drawString(350, height - 100, "Department")  # Added department header
     c.drawString(480, height - 100, "Status")
-    
+
     # Table Data with department
     y = height - 120
     c.setFont("Helvetica", 10)
-    for student in present_students:
-        c.drawString(50, y, student["roll_no"])
-        c.drawString(120, y, student["name"])
-        c.drawString(350, y, student.get("department", "N/A"))  # Added department data
-        c.drawString(480, y, "Present")
+    for row in rows:
+        c.drawString(50, y, str(row["roll_no"]))
+        c.drawString(120, y, str(row["name"]))
+        c.drawString(350, y, row.get("department") or "N/A")  # Added department data
+        c.drawString(480, y, row.get("status", "Present"))
         y -= 20
         if y < 50:  # New page if needed
             c.showPage()
             y = height - 50
-    
+
     c.save()
-    print(f"✅ PDF report saved: {filepath}")
-    return filepath
\ No newline at end of file
+    _replace_atomically(tmp_path, path)
+    return path
+
+
+# --- On-demand session reports -------------------------------------------
+# Uploads no longer write reports. A report is built from the database the
+# first time it is requested and cached under a name that includes a hash of
+# its rows, so any attendance change for the session yields a new file. Built
+# reports are recorded in the artifact catalog, which removes older versions.
+
+def session_rows(db, subject: str, day, marked_by: int = None) -> list:
+    """
+    Attendance of one class session (subject, date), joined with student
+    details; only the rows ``marked_by`` marked when given.
+    """
+    from app.core.models import Attendance, Student
+
+    query = (
+        db.query(Student.roll_no, Student.name, Student.department, Attendance.status)
+        .join(Student, Student.id == Attendance.student_id)
+        .filter(Attendance.subject == subject, Attendance.date == day)
+    )
+    if marked_by is not None:
+        query = query.filter(Attendance.marked_by == marked_by)
+    rows = query.order_by(Student.roll_no).all()
+    return [
+        {"roll_no": r.roll_no, "name": r.name, "department": r.department or "N/A", "status": r.status or "Present"}
+        for r in rows
+    ]
+
+
+def content_hash(rows: list) -> str:
+    return hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _session_prefix(subject: str, day, marked_by: int = None) -> str:
+    safe_subject = re.sub(r"[^A-Za-z0-9_-]+", "_", subject).strip("_") or "session"
+    scope = "" if marked_by is None else f"by{marked_by}_"  # One faculty's rows vs the whole session
+    return os.path.join(CACHE_DIR, f"{safe_subject}_{day}_{scope}")
+
+
+def _get_pool():
+    global _pool
+    if _pool is None and REPORT_WORKERS > 0:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_report_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _render(path: str, fmt: str, subject: str, day, rows: list):
+    """Render (or join an in-progress render of) one cached report and wait for it."""
+    render_inline = False
+    with _flight_lock:
+        future = _in_flight.get(path)
+        if future is None:
+            pool = _get_pool() if fmt == "pdf" else None
+            if pool is not None:
+                future = pool.submit(write_pdf, path, subject, str(day), rows)
+            else:
+                future = Future()  # Rendered below, outside the lock; others wait on it
+                render_inline = True
+            _in_flight[path] = future
+
+    if render_inline:
+        try:
+            future.set_result((write_pdf if fmt == "pdf" else write_csv)(path, subject, day, rows))
+        except Exception as e:
+            future.set_exception(e)
+    try:
+        return future.result()
+    finally:
+        with _flight_lock:
+            if _in_flight.get(path) is future:
+                del _in_flight[path]
+
+
+def session_report(db, subject: str, day, fmt: str = "csv", marked_by: int = None):
+    """
+    Path of the up-to-date report for a session (only the rows ``marked_by``
+    marked when given), building it on first request. Returns None when there
+    is no such attendance.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format '{fmt}', expected one of {REPORT_FORMATS}")
+    rows = session_rows(db, subject, day, marked_by)
+    if not rows:
+        return None
+
+    path = f"{_session_prefix(subject, day, marked_by)}{content_hash(rows)}.{fmt}"
+    if not os.path.exists(path):
+        _render(path, fmt, subject, day, rows)
+        _catalog_report(db, fmt, path, subject, day, marked_by)
+    return path
+
+
+def _catalog_report(db, fmt: str, path: str, subject: str, day, marked_by: int = None):
+    """Record a freshly built report and drop older versions of the same report."""
+    from sqlalchemy.exc import IntegrityError
+    from app.core.artifact_catalog import record_artifact, replace_session_artifacts
+
+    # The owner is the faculty scope (None for the whole-session report), so scopes never replace each other
+    record_artifact(db, fmt, path, owner_id=marked_by, subject=subject, session_date=day)
+    replace_session_artifacts(db, fmt, subject, day, keep_path=path, owner_id=marked_by)
+    try:
+        db.commit()
+    except IntegrityError:  # A concurrent first download catalogued the same report first
+        db.rollback()
+
+
+def report_url(subject: str, day, fmt: str) -> str:
+    """Download URL of a session report (built when first fetched)."""
+    from urllib.parse import urlencode
+
+    return f"/api/reports/session?{urlencode({'subject': subject, 'date': str(day), 'format': fmt})}"
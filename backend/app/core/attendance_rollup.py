@@ -0,0 +1,203 @@
+"""
+Present/total attendance counts per (student, subject, course, department,
+year, marking faculty, month), maintained incrementally.
+
+insert_attendance adds the rows it actually inserted to the rollup in the
+same transaction (mark_present likewise counts the Absent rows it turns
+Present), so report endpoints aggregate a table whose size grows with
+students x classes x months instead of scanning `attendance`. The
+rollup keeps its counts when attendance_cleanup purges old raw rows.
+
+Backfill or repair from the raw table (only buckets still fully covered by
+raw rows should be rebuilt):
+    python -m app.core.attendance_rollup --since 2026-01-01
+    python -m app.core.attendance_rollup --all
+"""
+
+import argparse
+from datetime import date
+from sqlalchemy import func
+from app.core.models import Attendance, AttendanceRollup
+
+KEY_COLUMNS = ["student_id", "subject", "course", "department", "year", "marked_by", "bucket"]
+
+_table = AttendanceRollup.__table__
+
+
+def bucket_of(day) -> date:
+    """Rollup bucket (first day of the month) containing ``day``."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.replace(day=1)
+
+
+def rollup_counts(rows) -> dict:
+    """Aggregate attendance dicts into {rollup key: [present, total]}."""
+    counts = {}
+    for row in rows:
+        key = (
+            row["student_id"], row["subject"], row.get("course") or "", row.get("department") or "",
+            row.get("year") or "", row.get("marked_by") or 0, bucket_of(row["date"]),
+        )
+        entry = counts.setdefault(key, [0, 0])
+        entry[0] += (row.get("status") or "Present") == "Present"
+        entry[1] += 1
+    return counts
+
+
+def _upsert(db, values):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return False
+    stmt = dialect_insert(_table).values(values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={
+            "present": _table.c.present + stmt.excluded.present,
+            "total": _table.c.total + stmt.excluded.total,
+        },
+    ))
+    return True
+
+
+def add_to_rollup(db, rows):
+    """
+    Count newly inserted attendance dicts into the rollup. Does not commit;
+    call it in the transaction that inserted the rows.
+    """
+    _add_counts(db, rollup_counts(rows))
+
+
+def promote_in_rollup(db, rows):
+    """
+    Count attendance dicts changed from Absent to Present: one more present,
+    same total. Does not commit; call it in the transaction that updated them.
+    """
+    counts = rollup_counts(dict(row, status="Present") for row in rows)
+    _add_counts(db, {key: [present, 0] for key, (present, _) in counts.items()})
+
+
+def _add_counts(db, counts):
+    if not counts:
+        return
+    values = [
+        dict(zip(KEY_COLUMNS, key), present=present, total=total)
+        for key, (present, total) in counts.items()
+    ]
+    if _upsert(db, values):
+        return
+
+    # Other databases: update existing keys, insert the rest
+    for value in values:
+        match = [getattr(AttendanceRollup, c) == value[c] for c in KEY_COLUMNS]
+        updated = db.query(AttendanceRollup).filter(*match).update(
+            {
+                AttendanceRollup.present: AttendanceRollup.present + value["present"],
+                AttendanceRollup.total: AttendanceRollup.total + value["total"],
+            },
+            synchronize_session=False,
+        )
+        if not updated:
+            db.add(AttendanceRollup(**value))
+
+
+def rebuild_rollup(db, since=None) -> int:
+    """
+    Recompute the buckets from ``since``'s month onward (all buckets when
+    None) from the raw attendance table. Returns the number of rollup rows
+    written. Does not commit.
+    """
+    start = bucket_of(since) if since else None
+    stale = db.query(AttendanceRollup)
+    raw = db.query(
+        Attendance.student_id, Attendance.subject, Attendance.course, Attendance.department,
+        Attendance.year, Attendance.marked_by, Attendance.date, Attendance.status,
+    )
+    if start:
+        stale = stale.filter(AttendanceRollup.bucket >= start)
+        raw = raw.filter(Attendance.date >= start)
+    stale.delete(synchronize_session=False)
+
+    counts = rollup_counts(r._asdict() for r in raw.yield_per(5000))
+    values = [
+        dict(zip(KEY_COLUMNS, key), present=present, total=total)
+        for key, (present, total) in counts.items()
+    ]
+    if values:
+        db.execute(_table.insert(), values)
+    return len(values)
+
+
+def ensure_rollup(db):
+    """Backfill an empty rollup from existing attendance (first start after upgrading)."""
+    if db.query(AttendanceRollup.id).first() is not None:
+        return 0
+    if db.query(Attendance.id).first() is None:
+        return 0
+    written = rebuild_rollup(db)
+    db.commit()
+    print(f"✅ Attendance rollup backfilled: {written} rows")
+    return written
+
+
+def format_percentage(present: int, total: int) -> str:
+    return f"{100 * present / total:.1f}%" if total else "0.0%"
+
+
+def attendance_percentages(db, by: str = "course", marked_by: int = None, filters: dict = None):
+    """
+    Attendance percentage per ``by`` ("course" or "subject") and month,
+    newest month first: [{by, "attendance", "date", "present", "total"}].
+    ``filters`` (see attendance_query.report_filters) narrow the rollup;
+    dates select whole months.
+    """
+    filters = filters or {}
+    column = getattr(AttendanceRollup, by)
+    query = db.query(
+        column.label(by),
+        AttendanceRollup.bucket,
+        func.sum(AttendanceRollup.present).label("present"),
+        func.sum(AttendanceRollup.total).label("total"),
+    )
+    if marked_by is not None:
+        query = query.filter(AttendanceRollup.marked_by == marked_by)
+    if filters.get("date_from"):
+        query = query.filter(AttendanceRollup.bucket >= bucket_of(filters["date_from"]))
+    if filters.get("date_to"):
+        query = query.filter(AttendanceRollup.bucket <= filters["date_to"])
+    for field in ("subject", "course", "department", "year"):
+        if filters.get(field):
+            query = query.filter(getattr(AttendanceRollup, field) == filters[field])
+    rows = query.group_by(column, AttendanceRollup.bucket).order_by(AttendanceRollup.bucket.desc(), column).all()
+    return [
+        {
+            by: getattr(r, by),
+            "attendance": format_percentage(r.present, r.total),
+            "date": str(r.bucket),
+            "present": int(r.present),
+            "total": int(r.total),
+        }
+        for r in rows
+    ]
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the attendance rollup from raw attendance rows")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--since", type=date.fromisoformat, help="Rebuild buckets from this date's month on")
+    group.add_argument("--all", action="store_true", help="Rebuild every bucket (drops purged history)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = rebuild_rollup(db, None if args.all else args.since)
+        db.commit()
+        print(f"✅ Attendance rollup rebuilt: {written} rows")
+    finally:
+        db.close()
@@ -0,0 +1,156 @@
+from sqlalchemy import insert
+from app.core.attendance_rollup import add_to_rollup, promote_in_rollup
+from app.core.models import Attendance, Student
+
+# Rows per INSERT statement; keeps SQLite under its bound-parameter limit
+INSERT_BATCH_SIZE = 1000
+
+_CONFLICT_COLUMNS = ["student_id", "subject", "date"]
+# Everything the rollup needs, so it counts exactly the rows that were inserted
+_RETURNED_COLUMNS = ["student_id", "subject", "course", "department", "year", "date", "status", "marked_by"]
+
+
+def _insert_ignoring_duplicates(db, rows):
+    """Build an INSERT ... ON CONFLICT DO NOTHING for the session's dialect."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return (
+        dialect_insert(Attendance)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=_CONFLICT_COLUMNS)
+        .returning(*[getattr(Attendance, c) for c in _RETURNED_COLUMNS])
+    )
+
+
+def student_ids_by_roll(db, roll_numbers) -> dict:
+    """Resolve roll numbers to student ids with a single IN query."""
+    roll_numbers = list({str(r) for r in roll_numbers})
+    if not roll_numbers:
+        return {}
+    rows = db.query(Student.roll_no, Student.id).filter(Student.roll_no.in_(roll_numbers)).all()
+    return dict(rows)
+
+
+def already_marked(db, student_ids, subject: str, day) -> set:
+    """Student ids that already have attendance for (subject, day), in one IN query."""
+    student_ids = list(set(student_ids))
+    if not student_ids:
+        return set()
+    rows = (
+        db.query(Attendance.student_id)
+        .filter(
+            Attendance.student_id.in_(student_ids),
+            Attendance.subject == subject,
+            Attendance.date == day,
+        )
+        .all()
+    )
+    return {r.student_id for r in rows}
+
+
+def insert_attendance(db, rows) -> set:
+    """
+    Bulk-insert attendance dicts, silently skipping any (student_id, subject,
+    date) that already exists, and count the inserted rows into the
+    attendance rollup. Returns the student ids that were inserted.
+    Does not commit; the caller owns the transaction.
+    """
+    inserted = set()
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        stmt = _insert_ignoring_duplicates(db, batch)
+        if stmt is not None:
+            # A key repeated within the batch is inserted once, and only that row comes back
+            fresh = [dict(r._mapping) for r in db.execute(stmt)]
+            add_to_rollup(db, fresh)
+            inserted.update(r["student_id"] for r in fresh)
+            continue
+
+        # Other databases: filter against existing rows, then plain bulk insert
+        by_key = {}
+        for row in batch:
+            by_key.setdefault((row["subject"], row["date"]), []).append(row)
+        for (subject, day), group in by_key.items():
+            seen = already_marked(db, [r["student_id"] for r in group], subject, day)
+            fresh = []
+            for row in group:  # The first row of a key repeated within the batch wins
+                if row["student_id"] not in seen:
+                    seen.add(row["student_id"])
+                    fresh.append(row)
+            if fresh:
+                db.execute(insert(Attendance), fresh)
+                add_to_rollup(db, fresh)
+                inserted.update(r["student_id"] for r in fresh)
+    return inserted
+
+
+def _promote_absent(db, student_ids, subject: str, day) -> set:
+    """Turn the session's Absent rows of ``student_ids`` Present (e.g. found in a later photo)."""
+    student_ids = list(set(student_ids))
+    if not student_ids:
+        return set()
+    columns = [getattr(Attendance, c) for c in _RETURNED_COLUMNS]
+    absent = (
+        db.query(Attendance.id, *columns)
+        .filter(
+            Attendance.student_id.in_(student_ids),
+            Attendance.subject == subject,
+            Attendance.date == day,
+            Attendance.status == "Absent",
+        )
+        .all()
+    )
+    if not absent:
+        return set()
+    db.query(Attendance).filter(Attendance.id.in_([r.id for r in absent])).update(
+        {Attendance.status: "Present"}, synchronize_session=False
+    )
+    promote_in_rollup(db, [dict(zip(_RETURNED_COLUMNS, r[1:])) for r in absent])
+    return {r.student_id for r in absent}
+
+
+def mark_present(db, student_ids, subject: str, day, course: str = "", department: str = "",
+                 year: str = "", marked_by: int = None, status: str = "Present") -> set:
+    """
+    Mark a set of students for one class session in one round trip. Students
+    already recorded Absent for the session are turned Present.
+    """
+    rows = [
+        {
+            "student_id": sid,
+            "subject": subject,
+            "course": course,
+            "department": department,
+            "year": year,
+            "date": day,
+            "status": status,
+            "marked_by": marked_by,
+        }
+        for sid in dict.fromkeys(student_ids)
+    ]
+    inserted = insert_attendance(db, rows)
+    if status == "Present":
+        inserted |= _promote_absent(db, set(student_ids) - inserted, subject, day)
+    return inserted
+
+
+def mark_absent_rest(db, present_ids, subject: str, day, course: str = "", department: str = "",
+                     year: str = "", marked_by: int = None) -> set:
+    """
+    Mark every student of ``department`` that is not in ``present_ids`` and
+    has no attendance for the session yet Absent, so attendance percentages
+    count the sessions a student missed. Returns the ids marked Absent.
+    """
+    if not department:
+        return set()  # No roster to compare against
+    present_ids = set(present_ids)
+    roster = [sid for (sid,) in db.query(Student.id).filter(Student.department == department)]
+    return mark_present(
+        db, [sid for sid in roster if sid not in present_ids], subject, day,
+        course=course, department=department, year=year, marked_by=marked_by, status="Absent",
+    )
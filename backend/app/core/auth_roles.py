@@ -1,28 +1,52 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from app.core.security import SECRET_KEY, ALGORITHM
+from app.core import security
+from app.core.principal_cache import principal_cache
 
 # OAuth2 scheme to extract Bearer token from Authorization header
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
-def get_current_user_role(token: str = Depends(oauth2_scheme)):
-    """Extract user role from JWT token."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        if role is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token: missing role"
-            )
-        return role
-    except JWTError:
+def get_token_claims(token: str = Depends(oauth2_scheme)):
+    """
+    Verified JWT claims (sub, role, user_id, iat, exp) without a database
+    lookup. Tokens of users deleted in this process since they were issued
+    are rejected.
+    """
+    payload = security.decode_access_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
+    if payload.get("sub") is None or payload.get("role") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token: missing role"
+        )
+    if principal_cache.is_revoked(payload["sub"], payload.get("iat")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return payload
+
+
+def get_current_user_role(claims: dict = Depends(get_token_claims)):
+    """Extract user role from JWT token."""
+    return claims["role"]
+
+
+def require_role(*roles: str, detail: str = "Access denied"):
+    """Dependency factory: authorize from token claims alone, returning them."""
+    def check(claims: dict = Depends(get_token_claims)):
+        if claims["role"] not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=detail
+            )
+        return claims
+    return check
 
 
 def admin_required(role: str = Depends(get_current_user_role)):
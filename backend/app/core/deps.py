@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.core import security
 from app.core.database import SessionLocal
 from app.core.models import User
+from app.core.principal_cache import Principal, principal_cache
 
 # Define OAuth2 scheme for authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")  # Updated to match prefixed endpoint
@@ -19,8 +20,11 @@ def get_db():
         db.close()
 
 # Extract current user from JWT token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Decode JWT token and return the current user"""
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Decode JWT token and return the current user as a cached Principal
+    (see principal_cache.py). The database is only queried on a cache miss.
+    """
     payload = security.decode_access_token(token)  # Use centralized decode function from security.py
     if payload is None:
         raise HTTPException(
@@ -34,11 +38,22 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token",
         )
-    
-    user = db.query(User).filter(User.email == email).first()  # Query by email, not username
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
-    return user
\ No newline at end of file
+
+    iat = payload.get("iat")
+    principal = principal_cache.get(email, iat)
+    if principal is not None:
+        return principal
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()  # Query by email, not username
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        principal = Principal.from_user(user)
+    finally:
+        db.close()
+    principal_cache.put(email, iat, principal)
+    return principal
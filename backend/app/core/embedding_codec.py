@@ -0,0 +1,57 @@
+"""
+Binary format for Student.embedding.
+
+Format 1 is the raw little-endian float32 bytes of an L2-normalized,
+EMBEDDING_DIM-long vector. The format number and the recognition model that
+produced the vector are kept in their own columns, so every row has the same
+length and a whole gallery can be decoded with one np.frombuffer call.
+"""
+
+import os
+import numpy as np
+
+EMBEDDING_FORMAT = 1
+EMBEDDING_DIM = 512
+EMBEDDING_DTYPE = np.dtype("<f4")
+EMBEDDING_NBYTES = EMBEDDING_DIM * EMBEDDING_DTYPE.itemsize
+
+# Tag of the recognition model whose embeddings the gallery accepts
+EMBEDDING_MODEL = os.getenv("EDUSNAP_EMBEDDING_MODEL", "buffalo_l")
+
+
+def encode_embedding(embedding) -> bytes:
+    """Normalize an embedding and serialize it as raw float32 bytes."""
+    vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if vec.shape[0] != EMBEDDING_DIM:
+        raise ValueError(f"Expected a {EMBEDDING_DIM}-d embedding, got {vec.shape[0]}")
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec = vec / norm
+    return vec.astype(EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Read a single stored embedding (read-only view over ``data``)."""
+    if len(data) != EMBEDDING_NBYTES:
+        raise ValueError(f"Embedding must be {EMBEDDING_NBYTES} bytes, got {len(data)}")
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+def decode_matrix(blobs) -> np.ndarray:
+    """Decode many stored embeddings into one (n, EMBEDDING_DIM) float32 matrix."""
+    blobs = list(blobs)
+    if not blobs:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    buffer = b"".join(blobs)
+    if len(buffer) != len(blobs) * EMBEDDING_NBYTES:
+        raise ValueError("Embedding rows have inconsistent lengths")
+    return np.frombuffer(buffer, dtype=EMBEDDING_DTYPE).reshape(len(blobs), EMBEDDING_DIM)
+
+
+def embedding_columns(embedding) -> dict:
+    """Column values for storing ``embedding`` on a Student row."""
+    return {
+        "embedding": encode_embedding(embedding),
+        "embedding_format": EMBEDDING_FORMAT,
+        "embedding_model": EMBEDDING_MODEL,
+    }
@@ -0,0 +1,227 @@
+import copy
+import os
+import threading
+import numpy as np
+from sqlalchemy import func
+from app.core.database import SessionLocal
+from app.core.models import Student
+from app.core.embedding_codec import EMBEDDING_DIM, EMBEDDING_FORMAT, EMBEDDING_MODEL, decode_matrix
+from app.core.search_index import SearchIndex, create_index
+
+# Optional on-disk copy of the search index, so graph/IVF indexes are not rebuilt per process
+INDEX_PATH = os.getenv("EDUSNAP_INDEX_PATH", "")
+# Enrollments kept in a small exact index before being merged into the main index (one copy + save per merge)
+DELTA_ROWS = int(os.getenv("EDUSNAP_GALLERY_DELTA_ROWS", "1000"))
+LOAD_BATCH_SIZE = 500
+
+_MATCHABLE = (
+    Student.embedding.isnot(None),
+    Student.embedding_format == EMBEDDING_FORMAT,
+    Student.embedding_model == EMBEDDING_MODEL,
+)
+_MISSING = object()
+
+
+class GallerySnapshot:
+    """
+    One immutable view of the gallery. Rows returned by search() always index
+    this snapshot's own id/name arrays, however the gallery changes meanwhile.
+    Rows past the main index live in ``delta``, a small exact index of recent
+    enrollments, and are numbered after the main index's rows.
+    """
+
+    def __init__(self, index, delta, ids, rolls, names, departments):
+        self.index = index
+        self.delta = delta
+        self.ids = ids
+        self.rolls = rolls
+        self.names = names
+        self.departments = departments
+
+    @classmethod
+    def empty(cls):
+        no_rows = np.empty(0, dtype=object)
+        return cls(create_index(EMBEDDING_DIM), create_index(EMBEDDING_DIM, "exact"),
+                   np.empty(0, dtype=np.int64), no_rows, no_rows, no_rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self):
+        if not len(self.delta):
+            return self.index.vectors
+        return np.vstack([self.index.vectors, self.delta.vectors])
+
+    def search(self, queries, k: int = 1):
+        """Top-k (scores, rows) for each normalized query embedding."""
+        scores, rows = self.index.search(queries, k)
+        if not len(self.delta):
+            return scores, rows
+        delta_scores, delta_rows = self.delta.search(queries, k)
+        delta_rows = np.where(delta_rows >= 0, delta_rows + len(self.index), -1)
+        scores = np.concatenate([scores, delta_scores], axis=1)
+        rows = np.concatenate([rows, delta_rows], axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def student(self, idx: int) -> dict:
+        """Return the public fields of the student stored at row ``idx``."""
+        return {
+            "id": int(self.ids[idx]),
+            "roll_no": self.rolls[idx],
+            "name": self.names[idx],
+            "department": self.departments[idx],
+        }
+
+
+class EmbeddingGallery:
+    """
+    Process-wide, in-memory copy of every enrolled student embedding.
+    Rows are stored as contiguous, L2-normalized float32 matrices so a whole
+    classroom can be scored with a single matrix multiply. Lookups go through
+    a pluggable SearchIndex (see search_index.py), which owns the matrix.
+
+    Each refresh compares (count, max(updated_at)) of the matchable students
+    with what is loaded: new students are appended, and any edited, converted
+    or removed embedding triggers a full reload. Readers use the snapshot
+    they were handed, so they never need the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = GallerySnapshot.empty()
+        self._versions = {}  # Student id -> updated_at of the loaded embedding
+        self._signature = None
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def snapshot(self) -> GallerySnapshot:
+        return self._snapshot
+
+    def _restore_index(self, ids, matrix):
+        """Reuse the saved index when it holds a prefix of these rows; returns (index, rows covered)."""
+        fresh = create_index(EMBEDDING_DIM)
+        if not INDEX_PATH or not os.path.exists(INDEX_PATH):
+            return fresh, 0
+        try:
+            index, extra = SearchIndex.load(INDEX_PATH)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable search index {INDEX_PATH}: {e}")
+            return fresh, 0
+        stored = extra.get("ids", np.empty(0, dtype=np.int64))
+        if index.kind != fresh.kind or len(stored) > len(ids) or not np.array_equal(stored, ids[:len(stored)]):
+            return fresh, 0
+        if not np.array_equal(index.vectors, matrix[:len(stored)]):  # An embedding was edited since the save
+            return fresh, 0
+        return index, len(stored)
+
+    @staticmethod
+    def _save(index, ids):
+        if INDEX_PATH and index.kind != "exact":
+            index.save(INDEX_PATH, ids=ids)
+
+    def _build(self, ids, rolls, names, departments, matrix):
+        """A snapshot of exactly these rows; keeps ``matrix`` as-is (no copy)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        index, covered = self._restore_index(ids, matrix)
+        if covered < len(ids):
+            index.add(matrix[covered:])
+            self._save(index, ids)
+        return GallerySnapshot(index, create_index(EMBEDDING_DIM, "exact"), ids,
+                               np.asarray(rolls, dtype=object), np.asarray(names, dtype=object),
+                               np.asarray(departments, dtype=object))
+
+    def _extend(self, snapshot, ids, rolls, names, departments, matrix):
+        """
+        A new snapshot with rows appended to the delta. Once the delta reaches
+        DELTA_ROWS it is merged into a copy of the main index, so the O(n)
+        copy and save happen once per DELTA_ROWS enrollments.
+        """
+        ids = np.concatenate([snapshot.ids, np.asarray(ids, dtype=np.int64)])
+        delta = create_index(EMBEDDING_DIM, "exact")
+        delta.add(np.vstack([snapshot.delta.vectors, matrix]))
+        index = snapshot.index
+        if len(delta) >= DELTA_ROWS:
+            index = copy.deepcopy(index)  # Searches keep using the current index meanwhile
+            index.add(delta.vectors)
+            delta = create_index(EMBEDDING_DIM, "exact")
+            self._save(index, ids)
+        return GallerySnapshot(
+            index, delta, ids,
+            np.concatenate([snapshot.rolls, np.asarray(rolls, dtype=object)]),
+            np.concatenate([snapshot.names, np.asarray(names, dtype=object)]),
+            np.concatenate([snapshot.departments, np.asarray(departments, dtype=object)]),
+        )
+
+    @staticmethod
+    def _load_rows(db, ids=None):
+        """(ids, rolls, names, departments, matrix) of matchable students, all or only ``ids``."""
+        columns = (Student.id, Student.roll_no, Student.name, Student.department, Student.embedding)
+        if ids is None:
+            rows = db.query(*columns).filter(*_MATCHABLE).order_by(Student.id).all()
+        else:
+            rows = []
+            for start in range(0, len(ids), LOAD_BATCH_SIZE):
+                rows += (
+                    db.query(*columns)
+                    .filter(*_MATCHABLE, Student.id.in_(ids[start:start + LOAD_BATCH_SIZE]))
+                    .order_by(Student.id)
+                    .all()
+                )
+        if not rows:
+            return None
+        ids, rolls, names, departments, blobs = zip(*rows)
+        return ids, rolls, names, departments, decode_matrix(blobs)
+
+    def _sync(self, db):
+        versions = dict(db.query(Student.id, Student.updated_at).filter(*_MATCHABLE).all())
+        changed = any(versions.get(sid, _MISSING) != at for sid, at in self._versions.items())
+        if changed or not self._versions:
+            loaded = self._load_rows(db)
+            self._snapshot = self._build(*loaded) if loaded else GallerySnapshot.empty()
+        else:
+            new_ids = sorted(set(versions) - set(self._versions))
+            loaded = self._load_rows(db, new_ids) if new_ids else None
+            if loaded:
+                self._snapshot = self._extend(self._snapshot, *loaded)
+        self._versions = versions
+
+    def refresh(self, db=None) -> GallerySnapshot:
+        """Pick up students enrolled or changed since the last refresh; returns the current snapshot."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            with self._lock:
+                first_load = not self._loaded
+                self._loaded = True
+                signature = tuple(
+                    db.query(func.count(Student.id), func.max(Student.updated_at)).filter(*_MATCHABLE).one()
+                )
+                if signature != self._signature:
+                    self._sync(db)
+                    self._signature = signature
+
+                if first_load:
+                    legacy = (
+                        db.query(Student.id)
+                        .filter(Student.embedding.isnot(None), Student.embedding_format.is_(None))
+                        .count()
+                    )
+                    if legacy:
+                        print(f"⚠️ {legacy} student embeddings use the legacy pickle format; "
+                              "run `python -m app.core.migrate_embeddings` to load them.")
+        finally:
+            if own_session:
+                db.close()
+        return self._snapshot
+
+
+_gallery = EmbeddingGallery()
+
+
+def get_gallery(db=None) -> GallerySnapshot:
+    """Return a consistent snapshot of the shared gallery, picking up any changes since last use."""
+    return _gallery.refresh(db)
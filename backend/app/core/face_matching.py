@@ -0,0 +1,94 @@
+import os
+import numpy as np
+
+MATCH_THRESHOLD = 0.45  # Minimum cosine similarity to accept an identity
+CANDIDATES_PER_FACE = 5  # Gallery candidates kept per face for the assignment step
+MATCH_METHOD = os.getenv("EDUSNAP_MATCH_METHOD", "greedy")  # "greedy" or "hungarian"
+
+
+def _normalize_rows(embeddings):
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign_greedy(scores, rows, threshold):
+    """Take (face, student) pairs best-first, skipping faces or students already used."""
+    assigned = np.full(len(scores), -1, dtype=np.int64)
+    assigned_scores = np.zeros(len(scores), dtype=np.float32)
+    faces, ranks = np.nonzero((scores > threshold) & (rows >= 0))
+    order = np.argsort(-scores[faces, ranks], kind="stable")
+    used = set()
+    for i in order:
+        face, rank = faces[i], ranks[i]
+        row = int(rows[face, rank])
+        if assigned[face] >= 0 or row in used:
+            continue
+        assigned[face] = row
+        assigned_scores[face] = scores[face, rank]
+        used.add(row)
+    return assigned, assigned_scores
+
+
+def _assign_hungarian(scores, rows, threshold):
+    """Optimal one-to-one assignment (maximum total similarity) over the candidate sets."""
+    from scipy.optimize import linear_sum_assignment
+
+    assigned = np.full(len(scores), -1, dtype=np.int64)
+    assigned_scores = np.zeros(len(scores), dtype=np.float32)
+    valid = (scores > threshold) & (rows >= 0)
+    if not valid.any():
+        return assigned, assigned_scores
+
+    columns, inverse = np.unique(rows[valid], return_inverse=True)
+    weights = np.zeros((len(scores), len(columns)), dtype=np.float32)
+    faces, _ = np.nonzero(valid)
+    weights[faces, inverse] = scores[valid]
+    face_idx, col_idx = linear_sum_assignment(weights, maximize=True)
+    for face, col in zip(face_idx, col_idx):
+        if weights[face, col] > threshold:
+            assigned[face] = columns[col]
+            assigned_scores[face] = weights[face, col]
+    return assigned, assigned_scores
+
+
+def match_faces(gallery, embeddings, threshold: float = MATCH_THRESHOLD,
+                method: str = None, candidates: int = CANDIDATES_PER_FACE):
+    """
+    Match every face of one photo against the gallery in a single batched
+    search, then assign identities one-to-one so two faces can never be
+    marked as the same student.
+
+    Returns one dict per face, in input order:
+        row     gallery row of the assigned student, or None if unknown
+        score   similarity to the assigned student (best candidate if unknown)
+        margin  best minus runner-up candidate similarity
+    """
+    if not len(embeddings) or not len(gallery):
+        return [{"row": None, "score": 0.0, "margin": 0.0} for _ in embeddings]
+
+    queries = _normalize_rows(embeddings)
+    k = max(2, min(candidates, len(gallery)))
+    scores, rows = gallery.search(queries, k=k)
+
+    best = scores[:, 0]
+    runner_up = np.where(rows[:, 1] >= 0, scores[:, 1], 0.0)
+    margins = best - runner_up
+
+    method = method or MATCH_METHOD
+    if method == "hungarian":
+        assigned, assigned_scores = _assign_hungarian(scores, rows, threshold)
+    elif method == "greedy":
+        assigned, assigned_scores = _assign_greedy(scores, rows, threshold)
+    else:
+        raise ValueError(f"Unknown assignment method '{method}', expected 'greedy' or 'hungarian'")
+
+    return [
+        {
+            "row": int(assigned[i]) if assigned[i] >= 0 else None,
+            "score": round(float(assigned_scores[i] if assigned[i] >= 0 else best[i]), 4),
+            "margin": round(float(margins[i]), 4),
+        }
+        for i in range(len(queries))
+    ]
@@ -1,10 +1,14 @@
 
+import os
 import numpy as np
 import cv2
-import insightface
-import pickle
+from app.core.model_registry import get_face_app, DEFAULT_PROVIDERS, DEFAULT_DET_SIZE
 from app.core.database import SessionLocal
-from app.core.models import Student
+from app.core.embedding_gallery import get_gallery
+from app.core.face_matching import match_faces
+from app.core.tiled_detection import detect_faces, embed_faces
+from app.core.image_upload import decode_image
+from app.core.annotations import save_source, upload_name
 from sqlalchemy.orm import Session
 
 
@@ -17,12 +21,28 @@ def get_first_name(full_name: str) -> str:
 
 
 class FaceEncoder:
-    def __init__(self):
-        # Initialize InsightFace (RetinaFace + ArcFace)
-        self.app = insightface.app.FaceAnalysis(
-            providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
-        )
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
+    def __init__(self, providers=DEFAULT_PROVIDERS, det_size=DEFAULT_DET_SIZE, profile=None):
+        # InsightFace (RetinaFace + ArcFace) is loaded lazily from the shared registry;
+        # profile None = EDUSNAP_INFERENCE_PROFILE ("attendance": no landmark/gender-age models)
+        self.providers = providers
+        self.det_size = det_size
+        self.profile = profile
+
+    @property
+    def app(self):
+        return get_face_app(self.providers, self.det_size, self.profile)
+
+    def detect(self, img):
+        """Faces with embeddings; large photos are tiled so small faces survive"""
+        return detect_faces(self.app, img)
+
+    def detect_boxes(self, img):
+        """Single-pass detection only: (N x 5 boxes with scores, N x 5 x 2 landmarks)"""
+        return self.app.det_model.detect(img, max_num=0, metric="default")
+
+    def embed(self, img, bboxes, kpss):
+        """Embeddings for already-detected faces, computed in one batch"""
+        return [face.embedding for face in embed_faces(self.app, img, bboxes, kpss)]
 
     def l2_normalize(self, x):
         return x / np.sqrt(np.sum(np.square(x)))
@@ -44,78 +64,72 @@ class FaceEncoder:
 encoder = FaceEncoder()
 
 
-def recognize_faces_from_image(image_path: str):
+def encode_student_face(image_bytes):
+    """
+    Embedding of the first face in an enrollment photo.
+    Returns {"embedding": ndarray} or {"error": message}; safe to run in the inference pool.
+    """
+    img = decode_image(image_bytes)
+    if img is None:
+        return {"error": "Invalid image file"}
+    faces = encoder.app.get(img)
+    if not faces:
+        return {"error": "No face detected in image"}
+    return {"embedding": faces[0].embedding}
+
+
+def detected_name(image_path: str, owner_id: int = None) -> str:
+    """A unique name under which recognize_faces_from_image can keep ``image_path``'s photo and boxes."""
+    return upload_name(owner_id, os.path.splitext(os.path.basename(image_path))[0], "detected")
+
+
+def recognize_faces_from_image(image_path: str, image_bytes: bytes = None, output_name: str = None):
     """
     Detect & recognize student faces in a classroom image.
     Compare with stored embeddings in DB and return attendance list.
+    With ``image_bytes`` the photo is decoded from memory. The photo and boxes
+    are kept as ``output_name`` (default: detected_name(image_path)) for the
+    annotated preview, which is rendered when first viewed (see annotations.py).
     """
 
-    db: Session = SessionLocal()
-    img = cv2.imread(image_path)
+    img = decode_image(image_bytes) if image_bytes is not None else cv2.imread(image_path)
     if img is None:
         return []
 
-    # Load all known student embeddings from DB
-    students = db.query(Student).filter(Student.embedding.isnot(None)).all()
-    if not students:
+    db: Session = SessionLocal()
+
+    # Known student embeddings come from the shared in-memory gallery
+    try:
+        gallery = get_gallery(db)
+    finally:
         db.close()
+    if not len(gallery):
         return []
 
-    known_embeddings = []
-    known_names = []
-    known_rolls = []
-
-    for s in students:
-        emb = pickle.loads(s.embedding)  # Pickle loading
-        known_embeddings.append(emb)
-        known_names.append(s.name)
-        known_rolls.append(s.roll_no)
-
-    known_embeddings = np.array(known_embeddings)
-    db.close()
-
     # Detect faces from uploaded classroom image
-    faces = encoder.app.get(img)
-    threshold = 0.45  # tweak sensitivity
+    faces = encoder.detect(img)
+    matches = match_faces(gallery, [face.embedding for face in faces])
 
     recognized = []
+    annotations = []
 
-    for face in faces:
-        emb = encoder.l2_normalize(face.embedding)  # Normalize query embedding
-        # Fixed: Proper cosine similarity (0-1 range)
-        similarities = np.dot(known_embeddings, emb) / (np.linalg.norm(known_embeddings, axis=1) * np.linalg.norm(emb))
-        idx = np.argmax(similarities)
-        max_sim = similarities[idx]
-
+    for face, match in zip(faces, matches):
         name, roll, status = "Unknown", "N/A", "Absent"
-        if max_sim > threshold:
-            name = known_names[idx]
-            roll = known_rolls[idx]
+        if match["row"] is not None:
+            name = gallery.names[match["row"]]
+            roll = gallery.rolls[match["row"]]
             status = "Present"
 
-            # ✅ Show only first name on bounding box
-            first_name = get_first_name(name)
-
-            bbox = face.bbox.astype(int)
-            cv2.rectangle(img, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
-            cv2.putText(
-                img, first_name, (bbox[0], bbox[1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2
-            )
-        else:
-            # Unknown face
-            bbox = face.bbox.astype(int)
-            cv2.rectangle(img, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 0, 255), 2)
-            cv2.putText(
-                img, "Unknown", (bbox[0], bbox[1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2
-            )
-
-        recognized.append({"roll_no": roll, "name": name, "status": status})
-
-    # ✅ Save preview with first-name labels (optional)
-    output_path = image_path.replace(".jpg", "_detected.jpg")
-    cv2.imwrite(output_path, img)
-    print(f"✅ Detected faces saved to: {output_path}")
+        # ✅ Boxes are labelled with the first name (red "Unknown" otherwise) when the preview is drawn
+        annotations.append((face.bbox, name if status == "Present" else None))
+        recognized.append({
+            "roll_no": roll, "name": name, "status": status,
+            "similarity": match["score"], "margin": match["margin"],
+        })
+
+    # ✅ Keep the photo and boxes for the preview (optional)
+    source = save_source(output_name or detected_name(image_path), img, annotations)
+    if source:
+        print(f"✅ Detected faces kept for preview: {source}")
 
     return recognized
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Upload intake for photos: bounded streaming reads, in-memory decoding and
+optional persistence of the original.
+
+    EDUSNAP_MAX_UPLOAD_MB      largest accepted file; bigger files get 413
+    EDUSNAP_MAX_REQUEST_MB     largest request body (all files of a session upload)
+    EDUSNAP_UPLOAD_RETENTION   none | async | sync - whether (and when) originals
+                               are written to static/uploads
+    EDUSNAP_MAX_DECODE_SIDE    photos whose long side is 2x+ this are decoded at
+                               reduced resolution (1/2, 1/4 or 1/8)
+"""
+
+import asyncio
+import io
+import os
+import cv2
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("EDUSNAP_MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+MAX_REQUEST_BYTES = int(float(os.getenv("EDUSNAP_MAX_REQUEST_MB", "100")) * 1024 * 1024)
+UPLOAD_RETENTION = os.getenv("EDUSNAP_UPLOAD_RETENTION", "async").lower()
+MAX_DECODE_SIDE = int(os.getenv("EDUSNAP_MAX_DECODE_SIDE", "4096"))
+READ_CHUNK_SIZE = 1024 * 1024
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "uploads")
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+
+
+async def limit_request_size(request, call_next):
+    """HTTP middleware: refuse oversized bodies from Content-Length before they are spooled."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_REQUEST_BYTES:
+        return JSONResponse(status_code=413, content={"detail": _too_large(MAX_REQUEST_BYTES).detail})
+    return await call_next(request)
+
+
+def check_upload_size(file, max_bytes: int = MAX_UPLOAD_BYTES):
+    """Reject an UploadFile whose known size is over the limit."""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+async def read_upload(file, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an UploadFile chunk by chunk, rejecting it with 413 once it exceeds ``max_bytes``."""
+    check_upload_size(file, max_bytes)
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise _too_large(max_bytes)
+    return bytes(buffer)
+
+
+def _reduction_flag(image_bytes: bytes, max_side: int):
+    """Pick a reduced-decode flag from the header alone (no pixels are decoded)."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as header:
+            long_side = max(header.size)
+    except Exception:
+        return cv2.IMREAD_COLOR  # Let OpenCV decide whether the bytes are an image
+    for factor, flag in _REDUCED_FLAGS:
+        if long_side >= factor * max_side:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(image_bytes: bytes, max_side: int = MAX_DECODE_SIDE):
+    """
+    BGR image decoded straight from memory, or None if the bytes are not an image.
+    Very large photos are decoded at 1/2, 1/4 or 1/8 scale so their long side
+    stays at or above ``max_side``; JPEGs skip the discarded pixels entirely.
+    """
+    flag = _reduction_flag(image_bytes, max_side) if max_side else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+
+
+def upload_path(filename: str) -> str:
+    """Where an original upload named ``filename`` is (or would be) kept."""
+    return os.path.join(UPLOAD_DIR, os.path.basename(filename))
+
+
+def save_upload(contents: bytes, filename: str) -> str:
+    """Write an original upload to static/uploads and return its path."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = upload_path(filename)
+    with open(path, "wb") as f:
+        f.write(contents)
+    return path
+
+
+async def retain_upload(contents: bytes, filename: str, background_tasks=None, retention: str = None) -> bool:
+    """
+    Keep the original according to EDUSNAP_UPLOAD_RETENTION: ``sync`` writes it
+    before returning, ``async`` after the response is sent (or in a thread when
+    no BackgroundTasks is given), ``none`` drops it. Returns True if it will be kept.
+    """
+    retention = retention or UPLOAD_RETENTION
+    if retention == "none":
+        return False
+    if retention == "async" and background_tasks is not None:
+        background_tasks.add_task(save_upload, contents, filename)
+        return True
+    await asyncio.to_thread(save_upload, contents, filename)
+    return True
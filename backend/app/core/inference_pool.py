@@ -0,0 +1,91 @@
+"""
+Bounded process pool for CPU-bound face inference.
+
+Detection and recognition hold the CPU for hundreds of milliseconds per
+photo; running them inside an ``async def`` handler blocks uvicorn's event
+loop for every other request. Handlers await ``run_inference`` instead,
+which ships the call to a worker process that has the model preloaded.
+
+    EDUSNAP_INFERENCE_WORKERS  worker processes (0 = run in a thread instead)
+    EDUSNAP_INFERENCE_QUEUE    max jobs running or waiting before returning 503
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+
+INFERENCE_WORKERS = int(os.getenv("EDUSNAP_INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE_DEPTH = int(os.getenv("EDUSNAP_INFERENCE_QUEUE", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+
+
+def _init_worker():
+    """Runs once in each worker process: load the model before the first job."""
+    from app.core.model_registry import warm_up
+
+    warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+def get_executor():
+    global _executor
+    if _executor is None and INFERENCE_WORKERS > 0:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: ONNX Runtime thread pools and DB connections do not survive fork
+                _executor = ProcessPoolExecutor(
+                    max_workers=INFERENCE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _executor
+
+
+def start_pool():
+    """Start every worker now so models load at boot rather than on the first upload."""
+    executor = get_executor()
+    if executor is None:
+        _init_worker()  # Pool disabled: inference runs in this process
+        return
+    for _ in range(INFERENCE_WORKERS):
+        executor.submit(_ping)
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def queue_depth() -> int:
+    """Inference jobs currently running or waiting for a worker."""
+    return _in_flight
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` off the event loop; ``fn`` must be a module-level function."""
+    global _in_flight
+    if _in_flight >= INFERENCE_QUEUE_DEPTH:
+        raise HTTPException(status_code=503, detail="Attendance service is busy, please retry shortly")
+
+    _in_flight += 1
+    try:
+        call = functools.partial(fn, *args, **kwargs)
+        executor = get_executor()
+        if executor is None:
+            return await asyncio.to_thread(call)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    finally:
+        _in_flight -= 1
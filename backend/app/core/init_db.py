@@ -1,15 +1,25 @@
 """
 Initialize EduSnap AI Database
-Creates all tables for PostgreSQL using SQLAlchemy models
+Applies the Alembic migrations in backend/migrations (creating every table
+on an empty database). Run as a deploy step before starting the API:
+    python -m app.core.init_db        (same as: alembic upgrade head)
 """
 
-from app.core.database import engine, Base
-from app.core import models
+import os
+from alembic import command
+from alembic.config import Config
 
-def init_db():
-    print("🛠️ Creating all database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database setup complete! Tables created successfully.")
+ALEMBIC_INI = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini"))
+
+def alembic_config():
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    return config
+
+def init_db(revision: str = "head"):
+    print("🛠️ Applying database migrations...")
+    command.upgrade(alembic_config(), revision)
+    print("✅ Database setup complete! Schema is at the latest revision.")
 
 if __name__ == "__main__":
     init_db()
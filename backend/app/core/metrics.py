@@ -0,0 +1,184 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Small on purpose: counters, gauges and fixed-bucket histograms guarded by
+one lock each, so recording costs a dict lookup and a bisect. Inference
+runs in pool workers, so engines return their stage timings and the API
+process records them with ``record_pipeline`` when the result comes back.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from app.core.inference_pool import queue_depth
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FACE_BUCKETS = (0, 1, 2, 5, 10, 20, 40, 80, 150, 300)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from ``callback`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def _samples(self):
+        if self._callback is not None:
+            return [f"{self.name} {float(self._callback())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+http_requests = Counter(
+    "edusnap_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram(
+    "edusnap_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+stage_latency = Histogram(
+    "edusnap_pipeline_stage_seconds", "Attendance pipeline stage latency.", ("pipeline", "stage"))
+faces_per_image = Histogram(
+    "edusnap_faces_per_image", "Faces detected per photo (or tracked per video).", ("pipeline",), FACE_BUCKETS)
+faces_matched = Counter(
+    "edusnap_faces_matched_total", "Detected faces matched to a student.", ("pipeline",))
+faces_unknown = Counter(
+    "edusnap_faces_unknown_total", "Detected faces left unknown.", ("pipeline",))
+gallery_size = Gauge(
+    "edusnap_gallery_size", "Embeddings in the recognition gallery at the last inference.")
+inference_queue = Gauge(
+    "edusnap_inference_queue_depth", "Inference jobs running or waiting for a pool worker.", callback=queue_depth)
+
+
+def record_pipeline(pipeline: str, result: dict):
+    """Record stage timings and face counts from an engine result (a dict with ``timings``)."""
+    if not result or "error" in result:
+        return
+    for stage, seconds in (result.get("timings") or {}).items():
+        stage_latency.observe(seconds, pipeline=pipeline, stage=stage)
+    if "faces_detected" in result:
+        faces = result["faces_detected"]
+        matched = len(result.get("present_students", []))
+        faces_per_image.observe(faces, pipeline=pipeline)
+        faces_matched.inc(matched, pipeline=pipeline)
+        faces_unknown.inc(max(0, faces - matched), pipeline=pipeline)
+    if "gallery_size" in result:
+        gallery_size.set(result["gallery_size"])
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"  # Templates keep label cardinality bounded
+            method = scope.get("method", "")
+            http_latency.observe(time.perf_counter() - start, method=method, route=path)
+            http_requests.inc(method=method, route=path, status=status["code"])
@@ -0,0 +1,54 @@
+"""
+Add the (student_id, subject, date) uniqueness rule and the (date, id)
+report index to an existing attendance table.
+
+Duplicate marks left behind by earlier racing uploads are removed first
+(the oldest row is kept). Run once after upgrading:
+    python -m app.core.migrate_attendance
+
+Superseded by the Alembic migrations (alembic upgrade head), which apply
+the same changes; kept for databases not yet under Alembic.
+"""
+
+from sqlalchemy import inspect, text
+from app.core.database import engine
+
+CONSTRAINT_NAME = "uq_attendance_student_subject_date"
+DATE_INDEX_NAME = "ix_attendance_date_id"
+
+
+def add_attendance_unique_constraint():
+    inspector = inspect(engine)
+    existing = {c["name"] for c in inspector.get_unique_constraints("attendance")}
+    existing |= {i["name"] for i in inspector.get_indexes("attendance") if i.get("unique")}
+    if CONSTRAINT_NAME in existing:
+        print("✅ Attendance uniqueness constraint already present")
+        return 0
+
+    with engine.begin() as conn:
+        removed = conn.execute(text(
+            "DELETE FROM attendance WHERE id NOT IN ("
+            " SELECT MIN(id) FROM attendance GROUP BY student_id, subject, date)"
+        )).rowcount
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {CONSTRAINT_NAME} ON attendance (student_id, subject, date)"
+        ))
+
+    print(f"✅ Removed {removed} duplicate attendance rows and added {CONSTRAINT_NAME}")
+    return removed
+
+
+def add_attendance_date_index():
+    """Index used by keyset pagination of report records (attendance_query.py)."""
+    indexes = {i["name"] for i in inspect(engine).get_indexes("attendance")}
+    if DATE_INDEX_NAME in indexes:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX {DATE_INDEX_NAME} ON attendance (date, id)"))
+    print(f"✅ Added {DATE_INDEX_NAME}")
+    return True
+
+
+if __name__ == "__main__":
+    add_attendance_unique_constraint()
+    add_attendance_date_index()
@@ -0,0 +1,68 @@
+"""
+Convert legacy pickled Student.embedding values to the raw float32 format.
+
+Run once after upgrading:  python -m app.core.migrate_embeddings
+"""
+
+import pickle
+import numpy as np
+from sqlalchemy import inspect, text
+from app.core.database import SessionLocal, engine
+from app.core.models import Student
+from app.core.embedding_codec import embedding_columns
+
+BATCH_SIZE = 500
+
+
+def add_embedding_columns():
+    """Add the format/model columns to databases created before they existed."""
+    existing = {c["name"] for c in inspect(engine).get_columns("students")}
+    with engine.begin() as conn:
+        if "embedding_format" not in existing:
+            conn.execute(text("ALTER TABLE students ADD COLUMN embedding_format INTEGER"))
+        if "embedding_model" not in existing:
+            conn.execute(text("ALTER TABLE students ADD COLUMN embedding_model VARCHAR(50)"))
+
+
+def migrate_embeddings():
+    add_embedding_columns()
+    db = SessionLocal()
+    converted, failed = 0, 0
+    last_id = 0
+    try:
+        while True:
+            students = (
+                db.query(Student)
+                .filter(
+                    Student.embedding.isnot(None),
+                    Student.embedding_format.is_(None),
+                    Student.id > last_id,
+                )
+                .order_by(Student.id)
+                .limit(BATCH_SIZE)
+                .all()
+            )
+            if not students:
+                break
+
+            for s in students:
+                last_id = s.id
+                try:
+                    # Trusted, one-off read of our own legacy rows
+                    emb = np.asarray(pickle.loads(s.embedding), dtype=np.float32)
+                    for column, value in embedding_columns(emb).items():
+                        setattr(s, column, value)
+                    converted += 1
+                except Exception as e:
+                    print(f"⚠️ Could not convert embedding for {s.roll_no}: {e}")
+                    failed += 1
+            db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ Converted {converted} embeddings ({failed} failed)")
+    return converted, failed
+
+
+if __name__ == "__main__":
+    migrate_embeddings()
@@ -0,0 +1,144 @@
+import os
+import threading
+
+# Providers tried in order; the ones this ONNX Runtime build lacks are dropped
+DEFAULT_PROVIDERS = ("CUDAExecutionProvider", "CPUExecutionProvider")
+DEFAULT_DET_SIZE = (640, 640)
+
+# Named inference profiles: which models of the pack load, and how ONNX Runtime runs them
+PROFILES = {
+    # Detection + ArcFace only; attendance never reads landmarks or gender/age
+    "attendance": {"allowed_modules": ("detection", "recognition"), "graph_optimization": "all"},
+    # Every model in the pack (2D/3D landmarks, gender/age)
+    "full": {"allowed_modules": None, "graph_optimization": "all"},
+}
+DEFAULT_PROFILE = os.getenv("EDUSNAP_INFERENCE_PROFILE", "attendance")
+
+# Thread pools per session; 0 lets ONNX Runtime use one thread per visible core,
+# which oversubscribes containers whose CPU limit is below the node's core count
+INTRA_OP_THREADS = int(os.getenv("EDUSNAP_ORT_INTRA_THREADS", "0"))
+INTER_OP_THREADS = int(os.getenv("EDUSNAP_ORT_INTER_THREADS", "1"))
+
+# Model packs per precision; the int8 pack is produced by app.core.quantize_models.
+# Both share the stored embedding tag, so compare them (benchmarks.quantization_report)
+# before switching an enrolled deployment to int8.
+MODEL_PACKS = {"fp32": "buffalo_l", "int8": "buffalo_l_int8"}
+MODEL_PRECISION = os.getenv("EDUSNAP_MODEL_PRECISION", "fp32")
+MODEL_ROOT = os.path.expanduser(os.getenv("EDUSNAP_MODEL_ROOT", "~/.insightface"))
+
+_models = {}
+_lock = threading.Lock()
+
+
+def session_options(profile: str = DEFAULT_PROFILE):
+    """ONNX Runtime SessionOptions for a profile."""
+    import onnxruntime as ort
+
+    settings = PROFILES[profile]
+    levels = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    options = ort.SessionOptions()
+    options.graph_optimization_level = levels[settings["graph_optimization"]]
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = settings.get("intra_op_threads", INTRA_OP_THREADS)
+    options.inter_op_num_threads = settings.get("inter_op_threads", INTER_OP_THREADS)
+    return options
+
+
+def available_providers(providers=DEFAULT_PROVIDERS):
+    """The requested providers this ONNX Runtime build actually has, CPU as the fallback."""
+    import onnxruntime as ort
+
+    available = set(ort.get_available_providers())
+    return [p for p in providers if p in available] or ["CPUExecutionProvider"]
+
+
+def _face_analysis(name: str, providers, allowed_modules, options):
+    """
+    A FaceAnalysis for pack ``name`` whose models each get one ONNX Runtime
+    session built with ``options``. insightface 0.7.3's FaceAnalysis and
+    model_zoo.get_model do not forward ``sess_options``, so the pack is routed
+    here with the same rules FaceAnalysis.__init__ applies.
+    """
+    import glob
+    import onnxruntime as ort
+    from insightface.app import FaceAnalysis  # Heavy import, deferred until the first inference
+    from insightface.model_zoo.model_zoo import ModelRouter
+    from insightface.utils import ensure_available
+
+    ort.set_default_logger_severity(3)
+    face_app = FaceAnalysis.__new__(FaceAnalysis)
+    face_app.models = {}
+    face_app.model_dir = ensure_available("models", name, root=MODEL_ROOT)
+    for onnx_file in sorted(glob.glob(os.path.join(face_app.model_dir, "*.onnx"))):
+        # ModelRouter passes its keyword arguments straight to the InferenceSession it creates
+        model = ModelRouter(onnx_file).get_model(sess_options=options, providers=providers)
+        if model is None or model.taskname in face_app.models:
+            continue
+        if allowed_modules is not None and model.taskname not in allowed_modules:
+            continue
+        face_app.models[model.taskname] = model
+    if "detection" not in face_app.models:
+        raise RuntimeError(f"No detection model found in {face_app.model_dir}")
+    face_app.det_model = face_app.models["detection"]
+    return face_app
+
+
+def pack_dir(precision: str = None) -> str:
+    """Directory holding the model pack for a precision."""
+    return os.path.join(MODEL_ROOT, "models", MODEL_PACKS[precision or MODEL_PRECISION])
+
+
+def get_face_app(providers=DEFAULT_PROVIDERS, det_size=DEFAULT_DET_SIZE, profile: str = None,
+                 precision: str = None):
+    """
+    Return the shared InsightFace model for (providers, det_size, profile, precision).
+    The model is built on first use, so importing the API costs nothing.
+    """
+    profile = profile or DEFAULT_PROFILE
+    precision = precision or MODEL_PRECISION
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown inference profile '{profile}', expected one of {sorted(PROFILES)}")
+    if precision not in MODEL_PACKS:
+        raise ValueError(f"Unknown model precision '{precision}', expected one of {sorted(MODEL_PACKS)}")
+    if precision != "fp32" and not os.path.isdir(pack_dir(precision)):
+        raise RuntimeError(
+            f"Model pack '{MODEL_PACKS[precision]}' not found in {MODEL_ROOT}; "
+            f"build it with: python -m app.core.quantize_models"
+        )
+    key = (tuple(providers), tuple(det_size), profile, precision)
+    face_app = _models.get(key)
+    if face_app is not None:
+        return face_app
+
+    with _lock:
+        face_app = _models.get(key)
+        if face_app is None:
+            usable = available_providers(providers)
+            allowed = PROFILES[profile]["allowed_modules"]
+            print(f"🚀 Loading face model (profile={profile}, precision={precision}, "
+                  f"providers={usable}, det_size={det_size}) ...")
+            face_app = _face_analysis(
+                MODEL_PACKS[precision], usable, list(allowed) if allowed else None, session_options(profile)
+            )
+            face_app.prepare(ctx_id=0, det_size=tuple(det_size))
+            _models[key] = face_app
+    return face_app
+
+
+def warm_up(providers=DEFAULT_PROVIDERS, det_size=DEFAULT_DET_SIZE, profile: str = None):
+    """Load the model and run one dummy inference so the first request is not slow."""
+    import numpy as np
+
+    face_app = get_face_app(providers, det_size, profile)
+    face_app.get(np.zeros((det_size[1], det_size[0], 3), dtype=np.uint8))
+    return face_app
+
+
+def warm_up_enabled() -> bool:
+    """Whether the API should load models at startup (EDUSNAP_WARMUP_MODELS=1)."""
+    return os.getenv("EDUSNAP_WARMUP_MODELS", "0").lower() in ("1", "true", "yes")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, LargeBinary, Date, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, LargeBinary, Date, DateTime, ForeignKey, UniqueConstraint, Index, JSON, Text
 from sqlalchemy.orm import relationship
 from app.core.base import Base
 
@@ -25,14 +26,26 @@ class Student(Base):
     department = Column(String(50), nullable=True)
     semester = Column(String(10), nullable=True)
 
-    # 🧠 Face embedding stored as binary data (512D vector)
+    # 🧠 Face embedding stored as raw float32 bytes (see embedding_codec.py)
     embedding = Column(LargeBinary, nullable=True)
+    embedding_format = Column(Integer, nullable=True)  # NULL = legacy pickled array
+    embedding_model = Column(String(50), nullable=True)  # Recognition model that produced it
+    # Bumped on every change, so the in-memory gallery notices edits and re-enrollments
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True, index=True)
 
     # Relationships
     attendance_records = relationship("Attendance", back_populates="student")
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One mark per student, subject and day; writes use ON CONFLICT DO NOTHING
+        UniqueConstraint("student_id", "subject", "date", name="uq_attendance_student_subject_date"),
+        # Hot-path indexes (migrations/versions/0002_hot_path_indexes.py)
+        Index("ix_attendance_date_id", "date", "id"),  # Retention cleanup, keyset pages
+        Index("ix_attendance_marked_by_date", "marked_by", "date", "id"),  # Faculty-scoped queries
+        Index("ix_attendance_subject_date", "subject", "date"),  # Session reports
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
@@ -48,4 +61,72 @@ class Attendance(Base):
 
     # Relationships
     student = relationship("Student", back_populates="attendance_records")
-    marked_by_user = relationship("User", back_populates="attendances_marked")
\ No newline at end of file
+    marked_by_user = relationship("User", back_populates="attendances_marked")
+
+class AttendanceJob(Base):
+    """Queued image upload, processed by `python -m app.core.attendance_jobs` workers."""
+    __tablename__ = "attendance_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued, running, done, failed
+    stage = Column(String(30), nullable=True)  # Current pipeline stage while running
+    progress = Column(Integer, default=0)  # Percent of stages completed
+    attempts = Column(Integer, default=0)
+
+    params = Column(JSON, nullable=False)  # subject, department, year, course, filename
+    image = Column(LargeBinary, nullable=True)  # Uploaded bytes; cleared once processed
+    timings = Column(JSON, nullable=True)  # Seconds per stage
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class AttendanceRollup(Base):
+    """
+    Present/total counts per student and class per month, kept in step with
+    every attendance write (see attendance_rollup.py). Report endpoints read
+    percentages from here, and the counts outlive the raw rows that
+    attendance_cleanup purges.
+    """
+    __tablename__ = "attendance_rollup"
+    __table_args__ = (
+        UniqueConstraint(
+            "student_id", "subject", "course", "department", "year", "marked_by", "bucket",
+            name="uq_attendance_rollup_key",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, nullable=False)  # No FK: counts survive student/faculty deletion
+    subject = Column(String(100), nullable=False)
+    course = Column(String(100), nullable=False)
+    department = Column(String(50), nullable=False)
+    year = Column(String(10), nullable=False)
+    marked_by = Column(Integer, nullable=False, default=0, index=True)  # 0 = unknown, so the key has no NULLs
+    bucket = Column(Date, nullable=False, index=True)  # First day of the month
+    present = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+class Artifact(Base):
+    """
+    Catalog of generated files: session reports (csv/pdf), photos kept for
+    annotation and their renders, so "latest" lookups and retention never
+    list directories.
+    """
+    __tablename__ = "artifacts"
+    __table_args__ = (
+        Index("ix_artifacts_owner_kind_created", "owner_id", "kind", "created_at"),  # Latest for a user
+        Index("ix_artifacts_kind_created", "kind", "created_at"),  # Latest overall
+        Index("ix_artifacts_session", "kind", "subject", "session_date"),  # A session's files
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(10), nullable=False)  # csv, pdf, image (photo + boxes), preview, thumbnail
+    path = Column(String(500), unique=True, nullable=False)  # Absolute path on the storage volume
+    owner_id = Column(Integer, nullable=True)  # User who produced it; no FK so files outlive the account
+    subject = Column(String(100), nullable=True)
+    session_date = Column(Date, nullable=True)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # Retention
@@ -0,0 +1,105 @@
+"""
+Authenticated-user (principal) cache for get_current_user.
+
+Principals are immutable snapshots of the user row, cached per token as
+(sub, iat) with a TTL and LRU eviction, so a request with a known token
+skips the users lookup and never checks out a DB connection. Deleting a
+user invalidates its entries and revokes tokens issued before the
+deletion, which claims-only role checks (auth_roles.py) honour as well.
+
+The cache is per process; in another API process a deleted user's cached
+entry lives at most EDUSNAP_PRINCIPAL_TTL seconds.
+
+    EDUSNAP_PRINCIPAL_TTL          seconds an entry is trusted (0 disables the cache)
+    EDUSNAP_PRINCIPAL_CACHE_SIZE   entries kept (least recently used are evicted)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from app.core.metrics import Counter, Gauge
+from app.core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+
+PRINCIPAL_TTL = float(os.getenv("EDUSNAP_PRINCIPAL_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("EDUSNAP_PRINCIPAL_CACHE_SIZE", "1024"))
+
+
+class Principal(NamedTuple):
+    """The user fields routes read from ``current_user``, detached from any session."""
+    id: int
+    email: str
+    username: str
+    name: Optional[str]
+    role: str
+    department: Optional[str]
+    year: Optional[str]
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.username, user.name, user.role, user.department, user.year)
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = PRINCIPAL_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (sub, iat) -> (expires_at, Principal)
+        self._revoked = {}  # sub -> time of revocation
+        self._lock = threading.Lock()
+
+    def get(self, sub: str, iat):
+        if self.ttl <= 0:
+            return None
+        key = (sub, iat)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                principal_lookups.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+        principal_lookups.inc(result="hit")
+        return entry[1]
+
+    def put(self, sub: str, iat, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(sub, iat)] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end((sub, iat))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                principal_evictions.inc()
+
+    def invalidate(self, sub: str):
+        """Drop ``sub``'s entries and revoke its tokens issued until now."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == sub]:
+                del self._entries[key]
+            self._revoked[sub] = time.time()
+            cutoff = time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60  # Older tokens have expired anyway
+            for revoked_sub in [s for s, at in self._revoked.items() if at < cutoff]:
+                del self._revoked[revoked_sub]
+
+    def is_revoked(self, sub: str, iat) -> bool:
+        """True for tokens of ``sub`` issued before it was invalidated."""
+        revoked_at = self._revoked.get(sub)
+        return revoked_at is not None and (iat is None or float(iat) <= revoked_at)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_lookups = Counter(
+    "edusnap_principal_cache_lookups_total", "Authenticated-user cache lookups by result.", ("result",))
+principal_evictions = Counter(
+    "edusnap_principal_cache_evictions_total", "Principals evicted from the full cache.")
+
+principal_cache = PrincipalCache()
+
+principal_cache_size = Gauge(
+    "edusnap_principal_cache_size", "Principals currently cached.", callback=lambda: len(principal_cache))
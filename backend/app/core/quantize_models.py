@@ -0,0 +1,158 @@
+"""
+Build an INT8 copy of the InsightFace model pack for CPU-only nodes.
+
+Usage (from backend/):
+    python -m app.core.quantize_models --mode static --calibration-dir app/static/student_images
+    python -m app.core.quantize_models --mode dynamic --models recognition detection
+
+The FP32 pack is copied to MODEL_PACKS["int8"] with the selected models
+replaced by quantized versions. Static mode calibrates activation ranges on
+real inputs: letterboxed detector blobs and aligned face crops from the
+calibration images. Dynamic mode needs no data but is usually slower for
+convolutional models. Check the result with benchmarks.quantization_report,
+then select it with EDUSNAP_MODEL_PRECISION=int8.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from app.core.model_registry import MODEL_PACKS, get_face_app, pack_dir
+
+QUANTIZABLE = ("recognition", "detection")
+CALIBRATION_LIMIT = 200  # Images read for static calibration
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def list_images(directory: str, limit: int = None):
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(directory, pattern)))
+    return paths[:limit] if limit else paths
+
+
+def detection_blob(img, det_model):
+    """Letterboxed input blob, built exactly as the detector's own detect() does."""
+    width, height = det_model.input_size
+    if img.shape[0] / img.shape[1] > height / width:
+        new_h, new_w = height, int(height * img.shape[1] / img.shape[0])
+    else:
+        new_w, new_h = width, int(width * img.shape[0] / img.shape[1])
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    canvas[:new_h, :new_w] = cv2.resize(img, (new_w, new_h))
+    mean = det_model.input_mean
+    return cv2.dnn.blobFromImage(canvas, 1.0 / det_model.input_std, (width, height), (mean, mean, mean), swapRB=True)
+
+
+def recognition_blobs(img, faces, rec_model):
+    """One input blob per aligned face crop, as ArcFace's get_feat() builds them."""
+    from insightface.utils import face_align
+
+    mean = rec_model.input_mean
+    return [
+        cv2.dnn.blobFromImages(
+            [face_align.norm_crop(img, landmark=face.kps, image_size=rec_model.input_size[0])],
+            1.0 / rec_model.input_std, rec_model.input_size, (mean, mean, mean), swapRB=True,
+        )
+        for face in faces
+    ]
+
+
+def calibration_data(face_app, images):
+    """Detector and recognizer calibration blobs from a list of image paths."""
+    blobs = {"detection": [], "recognition": []}
+    for path in images:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        blobs["detection"].append(detection_blob(img, face_app.det_model))
+        blobs["recognition"] += recognition_blobs(img, face_app.get(img), face_app.models["recognition"])
+    return blobs
+
+
+def _reader(input_name, blobs):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class BlobReader(CalibrationDataReader):
+        def __init__(self):
+            self._feeds = iter([{input_name: blob} for blob in blobs])
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    return BlobReader()
+
+
+def quantize_model(source: str, target: str, mode: str, reader=None, calibrate_method: str = "minmax"):
+    """Write an INT8 version of one ONNX model."""
+    from onnxruntime.quantization import (
+        CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if mode == "dynamic":
+        # uint8 weights: the CPU provider has no ConvInteger kernel for int8 weights
+        quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+        return
+
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(source, prepared)  # Shape inference + graph cleanup before calibration
+        quantize_static(
+            prepared, target, reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=methods[calibrate_method],
+        )
+
+
+def build_int8_pack(mode: str = "static", models=("recognition",), calibration_dir: str = None,
+                    limit: int = CALIBRATION_LIMIT, calibrate_method: str = "minmax"):
+    """Copy the FP32 pack and replace ``models`` with quantized versions."""
+    face_app = get_face_app(profile="attendance", precision="fp32")  # Also downloads the pack if missing
+    source, target = pack_dir("fp32"), pack_dir("int8")
+
+    blobs = {}
+    if mode == "static":
+        images = list_images(calibration_dir, limit) if calibration_dir else []
+        if not images:
+            raise SystemExit("❌ Static quantization needs --calibration-dir with face images")
+        print(f"📷 Collecting calibration data from {len(images)} images ...")
+        blobs = calibration_data(face_app, images)
+        if "recognition" in models and not blobs["recognition"]:
+            raise SystemExit("❌ No faces found in the calibration images")
+
+    os.makedirs(target, exist_ok=True)
+    for path in glob.glob(os.path.join(source, "*")):
+        shutil.copy2(path, target)
+
+    for task in models:
+        model = face_app.models[task]
+        output = os.path.join(target, os.path.basename(model.model_file))
+        reader = _reader(model.input_name, blobs[task]) if mode == "static" else None
+        print(f"⚙️ Quantizing {task} ({os.path.basename(model.model_file)}, {mode}) ...")
+        quantize_model(model.model_file, output, mode, reader, calibrate_method)
+        before, after = os.path.getsize(model.model_file), os.path.getsize(output)
+        print(f"   {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+    print(f"✅ INT8 pack written to {target}; enable with EDUSNAP_MODEL_PRECISION=int8")
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Build the {MODEL_PACKS['int8']} model pack")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--models", nargs="+", choices=QUANTIZABLE, default=["recognition"])
+    parser.add_argument("--calibration-dir", help="Folder of face photos (static mode)")
+    parser.add_argument("--limit", type=int, default=CALIBRATION_LIMIT, help="Max calibration images")
+    parser.add_argument("--calibrate-method", choices=["minmax", "entropy", "percentile"], default="minmax")
+    args = parser.parse_args()
+    build_int8_pack(args.mode, args.models, args.calibration_dir, args.limit, args.calibrate_method)
@@ -1,19 +1,18 @@
 import os
-import pickle
 import numpy as np
 import cv2
-import insightface
 from sqlalchemy.orm import Session
 from tkinter import Tk, filedialog
 from app.core.database import SessionLocal
 from app.core.models import Student
+from app.core.model_registry import get_face_app
+from app.core.embedding_codec import embedding_columns
 
 # Hide the Tkinter root window
 Tk().withdraw()
 
 # Initialize InsightFace
-app = insightface.app.FaceAnalysis(providers=['CPUExecutionProvider'])
-app.prepare(ctx_id=0, det_size=(640, 640))
+app = get_face_app()
 
 
 def encode_face(image_path):
@@ -63,7 +62,7 @@ def register_student():
         roll_no=roll_no,
         department=department,
         semester=semester,
-        embedding=pickle.dumps(embedding)
+        **embedding_columns(embedding)
     )
 
     db.add(student)
@@ -86,21 +85,20 @@ if __name__ == "__main__":
 
 # backend/app/core/register_students.py
 
-import pickle
 import numpy as np
 import cv2
-import insightface
 from sqlalchemy.orm import Session
 from tkinter import Tk, filedialog
 from backend.app.core.database import SessionLocal
 from backend.app.core.models import Student
+from backend.app.core.model_registry import get_face_app
+from backend.app.core.embedding_codec import embedding_columns
 
 # 🟢 Hide the Tkinter window
 Tk().withdraw()
 
 # 🧠 Load InsightFace model
-app = insightface.app.FaceAnalysis(providers=["CPUExecutionProvider"])
-app.prepare(ctx_id=0, det_size=(640, 640))
+app = get_face_app()
 
 
 def encode_face(image_path):
@@ -144,15 +142,15 @@ def register_student():
         db.close()
         return
 
-    # 🔒 Store as binary data
-    embedding_bytes = pickle.dumps(embedding)
+    # 🔒 Store as raw float32 bytes
+    embedding_fields = embedding_columns(embedding)
 
     student = Student(
         name=name,
         roll_no=roll_no,
         department=department,
         semester=semester,
-        embedding=embedding_bytes
+        **embedding_fields
     )
 
     try:
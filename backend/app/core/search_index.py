@@ -0,0 +1,369 @@
+"""
+Nearest-neighbour search over L2-normalized embeddings (cosine similarity).
+
+Every index stores its vectors in insertion order and answers queries with
+row positions into that order, so callers can keep their own id/name arrays
+alongside it. Pick an implementation with EDUSNAP_SEARCH_INDEX:
+
+    exact  brute-force matrix multiply (default, best for small galleries)
+    ivf    k-means partitioned lists, probes the closest ``nprobe`` lists
+    hnsw   hierarchical navigable small-world graph
+"""
+
+import heapq
+import math
+import os
+import numpy as np
+
+
+class SearchIndex:
+    """Common interface: add vectors, search top-k, persist to disk."""
+
+    kind = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _append_vectors(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        start = len(self.vectors)
+        # The first batch is kept without copying (e.g. a frombuffer gallery load)
+        self.vectors = vectors if start == 0 else np.vstack([self.vectors, vectors])
+        return start
+
+    def add(self, vectors):
+        """Append vectors; their rows continue from the current size."""
+        raise NotImplementedError
+
+    def search(self, queries, k: int = 1):
+        """Return (scores, rows), both (n_queries, k); missing hits have row -1."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _top_k(scores, rows, k):
+        """Pick the k best of ``scores`` (1-d) and pad to length k."""
+        out_scores = np.full(k, -np.inf, dtype=np.float32)
+        out_rows = np.full(k, -1, dtype=np.int64)
+        if len(scores):
+            take = min(k, len(scores))
+            best = np.argpartition(-scores, take - 1)[:take]
+            best = best[np.argsort(-scores[best])]
+            out_scores[:take] = scores[best]
+            out_rows[:take] = rows[best]
+        return out_scores, out_rows
+
+    def _state(self) -> dict:
+        return {}
+
+    def _restore(self, state: dict):
+        pass
+
+    def save(self, path: str, **extra):
+        """Write the index (and any ``extra`` arrays) to an .npz file."""
+        arrays = {f"extra_{k}": np.asarray(v) for k, v in extra.items()}
+        arrays.update({f"state_{k}": np.asarray(v) for k, v in self._state().items()})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, kind=np.array(self.kind), vectors=self.vectors, **arrays)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str):
+        """Read an index written by save(); returns (index, extra dict)."""
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data["kind"])
+            vectors = data["vectors"]
+            state = {k[len("state_"):]: data[k] for k in data.files if k.startswith("state_")}
+            extra = {k[len("extra_"):]: data[k] for k in data.files if k.startswith("extra_")}
+        index = INDEX_TYPES[kind](vectors.shape[1])
+        index.vectors = vectors
+        index._restore(state)
+        return index, extra
+
+
+class ExactIndex(SearchIndex):
+    """Brute-force search: one matrix multiply over every stored vector."""
+
+    kind = "exact"
+
+    def add(self, vectors):
+        self._append_vectors(vectors)
+
+    def search(self, queries, k: int = 1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        n = len(queries)
+        if not len(self.vectors):
+            return np.full((n, k), -np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+        scores = queries @ self.vectors.T
+        take = min(k, scores.shape[1])
+        rows = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        top = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        if take < k:
+            top = np.pad(top, ((0, 0), (0, k - take)), constant_values=-np.inf)
+            rows = np.pad(rows, ((0, 0), (0, k - take)), constant_values=-1)
+        return top.astype(np.float32), rows.astype(np.int64)
+
+
+class IVFIndex(SearchIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means
+    centroid and a query only scores the ``nprobe`` closest buckets.
+    Until there is enough data to train, it behaves like ExactIndex.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int, nlist: int = 0, nprobe: int = 8, seed: int = 0):
+        super().__init__(dim)
+        self.nlist = nlist  # 0 = pick sqrt(n) when training
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._lists = []
+        self._trained_size = 0
+
+    def _train(self):
+        n = len(self.vectors)
+        nlist = self.nlist or max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = self._assign(self.vectors)
+        self._rebuild_lists()
+        self._trained_size = n
+
+    def _assign(self, vectors):
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            chunk = vectors[start:start + 8192]
+            assignments[start:start + 8192] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self):
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+    def add(self, vectors):
+        start = self._append_vectors(vectors)
+        n = len(self.vectors)
+        if n < 256:
+            return  # Too small to partition; search falls back to brute force
+        if not self._trained_size or n >= 2 * self._trained_size:
+            self._train()  # (Re)train as the gallery grows so lists stay balanced
+            return
+        new = self._assign(self.vectors[start:])
+        self.assignments = np.concatenate([self.assignments, new])
+        for offset, c in enumerate(new):
+            self._lists[c] = np.append(self._lists[c], start + offset)
+
+    def search(self, queries, k: int = 1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self._trained_size:
+            exact = ExactIndex(self.dim)
+            exact.vectors = self.vectors
+            return exact.search(queries, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        out_scores = np.empty((len(queries), k), dtype=np.float32)
+        out_rows = np.empty((len(queries), k), dtype=np.int64)
+        for i, q in enumerate(queries):
+            rows = np.concatenate([self._lists[c] for c in probes[i]])
+            out_scores[i], out_rows[i] = self._top_k(self.vectors[rows] @ q, rows, k)
+        return out_scores, out_rows
+
+    def _state(self):
+        return {
+            "params": np.array([self.nlist, self.nprobe, self.seed, self._trained_size]),
+            "centroids": self.centroids,
+            "assignments": self.assignments,
+        }
+
+    def _restore(self, state):
+        self.nlist, self.nprobe, self.seed, self._trained_size = (int(v) for v in state["params"])
+        self.centroids = state["centroids"].astype(np.float32)
+        self.assignments = state["assignments"].astype(np.int32)
+        if self._trained_size:
+            self._rebuild_lists()
+
+
+class HNSWIndex(SearchIndex):
+    """
+    Hierarchical navigable small-world graph (Malkov & Yashunin).
+    Inserts are incremental; search visits O(log n) nodes per query.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0):
+        super().__init__(dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1 / math.log(m)
+        self._rng = np.random.default_rng(seed)
+        self.levels = np.empty(0, dtype=np.int32)
+        self._graph = []  # _graph[level][node] -> list of neighbour rows
+        self.entry_point = -1
+
+    def _max_links(self, level):
+        return self.m * 2 if level == 0 else self.m
+
+    def _search_layer(self, query, entry_points, ef, level):
+        graph = self._graph[level]
+        visited = set(entry_points)
+        sims = self.vectors[entry_points] @ query
+        candidates = [(-s, p) for s, p in zip(sims, entry_points)]  # max-heap on similarity
+        results = [(s, p) for s, p in zip(sims, entry_points)]      # min-heap, keeps best ef
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in graph.get(node, ()) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for sim, n in zip(self.vectors[fresh] @ query, fresh):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    heapq.heappush(results, (sim, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select(self, candidates, limit):
+        """
+        The paper's neighbour-selection heuristic over (similarity, node) pairs,
+        best first: a candidate closer to an already chosen neighbour than to
+        the base node is skipped, so links towards other clusters survive.
+        """
+        nodes = [n for _, n in candidates]
+        pairwise = self.vectors[nodes] @ self.vectors[nodes].T
+        chosen = []
+        for i, (sim, _) in enumerate(candidates):
+            if len(chosen) >= limit:
+                break
+            if chosen and pairwise[i, chosen].max() > sim:
+                continue
+            chosen.append(i)
+        return [nodes[i] for i in chosen]
+
+    def _connect(self, node, neighbours, level):
+        graph = self._graph[level]
+        graph[node] = self._select(neighbours, self.m)
+        limit = self._max_links(level)
+        for n in graph[node]:
+            links = graph.setdefault(n, [])
+            links.append(node)
+            if len(links) > limit:
+                # Re-select the overfull node's links with the same heuristic
+                sims = self.vectors[links] @ self.vectors[n]
+                order = np.argsort(-sims)
+                graph[n] = self._select([(float(sims[i]), links[i]) for i in order], limit)
+
+    def _insert(self, node):
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self.levels[node] = level
+        while len(self._graph) <= level:
+            self._graph.append({})
+        if self.entry_point < 0:
+            for l in range(level + 1):
+                self._graph[l][node] = []
+            self.entry_point = node
+            return
+
+        query = self.vectors[node]
+        top_level = int(self.levels[self.entry_point])
+        entry = [self.entry_point]
+        for l in range(top_level, level, -1):
+            entry = [self._search_layer(query, entry, 1, l)[0][1]]
+        for l in range(min(level, top_level), -1, -1):
+            neighbours = self._search_layer(query, entry, self.ef_construction, l)
+            self._connect(node, neighbours, l)
+            entry = [n for _, n in neighbours]
+        for l in range(top_level + 1, level + 1):
+            self._graph[l][node] = []
+        if level > top_level:
+            self.entry_point = node
+
+    def add(self, vectors):
+        start = self._append_vectors(vectors)
+        self.levels = np.concatenate([self.levels, np.zeros(len(self.vectors) - start, dtype=np.int32)])
+        for node in range(start, len(self.vectors)):
+            self._insert(node)
+
+    def search(self, queries, k: int = 1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        if self.entry_point < 0:
+            return out_scores, out_rows
+        top_level = int(self.levels[self.entry_point])
+        for i, q in enumerate(queries):
+            entry = [self.entry_point]
+            for l in range(top_level, 0, -1):
+                entry = [self._search_layer(q, entry, 1, l)[0][1]]
+            hits = self._search_layer(q, entry, max(self.ef_search, k), 0)[:k]
+            out_scores[i, :len(hits)] = [s for s, _ in hits]
+            out_rows[i, :len(hits)] = [n for _, n in hits]
+        return out_scores, out_rows
+
+    def _state(self):
+        state = {
+            "params": np.array([self.m, self.ef_construction, self.ef_search, self.entry_point]),
+            "levels": self.levels,
+        }
+        # Each layer is stored CSR-style: nodes, offsets into a flat neighbour array
+        for l, graph in enumerate(self._graph):
+            nodes = np.array(sorted(graph), dtype=np.int64)
+            links = [graph[n] for n in nodes]
+            state[f"nodes_{l}"] = nodes
+            state[f"offsets_{l}"] = np.cumsum([0] + [len(x) for x in links])
+            state[f"links_{l}"] = np.array([n for x in links for n in x], dtype=np.int64)
+        return state
+
+    def _restore(self, state):
+        self.m, self.ef_construction, self.ef_search, self.entry_point = (int(v) for v in state["params"])
+        self._level_mult = 1 / math.log(self.m)
+        self.levels = state["levels"].astype(np.int32)
+        self._graph = []
+        l = 0
+        while f"nodes_{l}" in state:
+            nodes, offsets, links = state[f"nodes_{l}"], state[f"offsets_{l}"], state[f"links_{l}"]
+            self._graph.append({
+                int(n): links[offsets[i]:offsets[i + 1]].tolist() for i, n in enumerate(nodes)
+            })
+            l += 1
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex, HNSWIndex)}
+
+
+def create_index(dim: int, kind: str = None) -> SearchIndex:
+    """Build an empty index of ``kind`` (defaults to EDUSNAP_SEARCH_INDEX or 'exact')."""
+    kind = (kind or os.getenv("EDUSNAP_SEARCH_INDEX", "exact")).lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown search index '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](dim)
@@ -0,0 +1,24 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Records how long each named stage of a pipeline takes.
+    ``on_stage`` (optional) is called with the stage name as each one starts,
+    e.g. to report job progress.
+    """
+
+    def __init__(self, on_stage=None):
+        self.timings = {}
+        self._on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name: str):
+        if self._on_stage:
+            self._on_stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - start, 4)
@@ -1,22 +1,21 @@
 # backend/app/core/test_recognition.py
 
 import os
-import pickle
 import numpy as np
 import cv2
-import insightface
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
-from app.core.models import Student
+from app.core.embedding_gallery import get_gallery
+from app.core.face_matching import match_faces
 from tkinter import Tk, filedialog
 from app.core.face_recognition_engine import recognize_faces_from_image
+from app.core.model_registry import get_face_app
 # Hide Tkinter main window
 Tk().withdraw()
 
 # Load InsightFace model
 print("🚀 Loading model...")
-app = insightface.app.FaceAnalysis(providers=['CPUExecutionProvider'])
-app.prepare(ctx_id=0, det_size=(640, 640))
+app = get_face_app()
 print("✅ Model loaded successfully!\n")
 
 # Select test image (e.g., classroom photo or individual photo)
@@ -36,38 +35,28 @@ if img is None:
 
 # Get all students with embeddings from DB
 db: Session = SessionLocal()
-students = db.query(Student).filter(Student.embedding.isnot(None)).all()
+gallery = get_gallery(db)
+db.close()
 
-if not students:
+if not len(gallery):
     print("⚠️ No students with embeddings found in DB.")
-    db.close()
     exit()
 
-known_embeddings = []
-known_names = []
-for s in students:
-    emb = pickle.loads(s.embedding)  # Pickle loading
-    known_embeddings.append(emb)
-    known_names.append(s.name)
-
-known_embeddings = np.array(known_embeddings)
+known_names = gallery.names
 print(f"📚 Loaded {len(known_names)} registered student embeddings.\n")
 
 # Detect faces in the image
 faces = app.get(img)
 print(f"🧠 Detected {len(faces)} face(s) in the image.\n")
 
-threshold = 0.45  # adjust if needed
-for i, face in enumerate(faces):
-    emb = face.embedding / np.linalg.norm(face.embedding)  # Normalize query embedding
-    # Fixed: Proper cosine similarity (0-1 range)
-    similarities = np.dot(known_embeddings, emb) / (np.linalg.norm(known_embeddings, axis=1) * np.linalg.norm(emb))
-    idx = np.argmax(similarities)
-    max_sim = similarities[idx]
-    
-    if max_sim > threshold:
-        name = known_names[idx]
-        print(f"✅ Face #{i+1} recognized as: {name} (Similarity: {max_sim:.2f})")
+# All faces are scored in one batch and assigned one-to-one (see face_matching.py)
+matches = match_faces(gallery, [face.embedding for face in faces])
+for i, (face, match) in enumerate(zip(faces, matches)):
+    max_sim = match["score"]
+
+    if match["row"] is not None:
+        name = known_names[match["row"]]
+        print(f"✅ Face #{i+1} recognized as: {name} (Similarity: {max_sim:.2f}, margin: {match['margin']:.2f})")
         color = (0, 255, 0)
         label = name.split()[0]
     else:
@@ -0,0 +1,120 @@
+"""
+Tiled, multi-scale face detection for high-resolution classroom photos.
+
+The detector runs at a fixed input size (640x640), so a 4000x3000 phone photo
+is shrunk ~6x and back-row faces drop below the detector's minimum size.
+Large photos are therefore also cut into overlapping tiles that are each
+detected near native resolution (in parallel), the boxes are merged with
+NMS, and recognition then runs once, batched, on the surviving faces.
+Photos whose long side is at most EDUSNAP_TILE_TRIGGER keep the single pass.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+TILE_TRIGGER = int(os.getenv("EDUSNAP_TILE_TRIGGER", "1600"))  # Long side (px) that enables tiling
+TILE_OVERLAP = 0.2  # Fraction of a tile shared with its neighbour
+NMS_IOU = 0.4
+TILE_THREADS = int(os.getenv("EDUSNAP_TILE_THREADS", "4"))
+
+
+def choose_tile_size(height: int, width: int, det_size: int = 640):
+    """Tile side for an image, or None when a single detector pass is enough."""
+    long_side = max(height, width)
+    if long_side <= TILE_TRIGGER:
+        return None
+    # Each tile is downscaled at most 2x to the detector input
+    return int(min(2 * det_size, max(det_size, long_side // 2)))
+
+
+def tile_origins(length: int, tile: int, overlap: float = TILE_OVERLAP):
+    """Start offsets covering [0, length) with overlapping tiles of size ``tile``."""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def nms(boxes, scores, iou_threshold: float = NMS_IOU):
+    """Indices of boxes kept by greedy non-maximum suppression."""
+    if not len(boxes):
+        return np.empty(0, dtype=np.int64)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores)
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def _detect_tile(det_model, img, x, y, tile):
+    crop = img[y:y + tile, x:x + tile]
+    bboxes, kpss = det_model.detect(crop, max_num=0, metric="default")
+    if len(bboxes):
+        bboxes = bboxes.copy()
+        bboxes[:, [0, 2]] += x
+        bboxes[:, [1, 3]] += y
+        if kpss is not None:
+            kpss = kpss + np.array([x, y], dtype=kpss.dtype)
+    return bboxes, kpss
+
+
+def detect_boxes(face_app, img):
+    """
+    Face boxes (N x 5: x1, y1, x2, y2, score) and 5-point landmarks (N x 5 x 2)
+    for the whole image, merging a full-image pass with overlapping tiles.
+    """
+    det_model = face_app.det_model
+    height, width = img.shape[:2]
+    tile = choose_tile_size(height, width, max(det_model.input_size))
+
+    jobs = [(0, 0, max(height, width))]  # Full-image pass keeps large, close-up faces intact
+    if tile:
+        jobs += [(x, y, tile) for y in tile_origins(height, tile) for x in tile_origins(width, tile)]
+
+    with ThreadPoolExecutor(max_workers=TILE_THREADS) as pool:
+        parts = list(pool.map(lambda job: _detect_tile(det_model, img, *job), jobs))
+
+    parts = [(b, k) for b, k in parts if len(b)]
+    if not parts:
+        return np.empty((0, 5), dtype=np.float32), np.empty((0, 5, 2), dtype=np.float32)
+    bboxes = np.vstack([b for b, _ in parts])
+    kpss = np.vstack([k for _, k in parts])
+    keep = nms(bboxes[:, :4], bboxes[:, 4])
+    return bboxes[keep], kpss[keep]
+
+
+def embed_faces(face_app, img, bboxes, kpss):
+    """Build InsightFace Face objects and compute all embeddings in one batch."""
+    from insightface.app.common import Face
+    from insightface.utils import face_align
+
+    faces = [Face(bbox=b[:4], kps=k, det_score=b[4]) for b, k in zip(bboxes, kpss)]
+    if not faces:
+        return faces
+    rec_model = face_app.models["recognition"]
+    crops = [face_align.norm_crop(img, landmark=f.kps, image_size=rec_model.input_size[0]) for f in faces]
+    embeddings = rec_model.get_feat(crops)
+    for face, embedding in zip(faces, embeddings):
+        face.embedding = embedding.flatten()
+    return faces
+
+
+def detect_faces(face_app, img):
+    """Detected faces with embeddings; small photos take InsightFace's single pass."""
+    height, width = img.shape[:2]
+    if choose_tile_size(height, width, max(face_app.det_model.input_size)) is None:
+        return face_app.get(img)
+    bboxes, kpss = detect_boxes(face_app, img)
+    return embed_faces(face_app, img, bboxes, kpss)
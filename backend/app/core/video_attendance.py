@@ -0,0 +1,298 @@
+"""
+Attendance from a short video clip (a phone panned across the classroom).
+
+Only a few frames per second are sampled; the rate adapts to how fast the
+camera moves and near-identical frames are skipped. Faces are detected
+on each sampled frame and followed between frames by an IoU tracker with a
+constant-velocity (alpha-beta) filter. Recognition then runs once per track,
+plus a few retries while the track's best match is still low-confidence.
+Each track's averaged embedding is matched against the gallery once at the end,
+on its own; a student seen in several tracks keeps the best-scoring one.
+
+    EDUSNAP_VIDEO_SAMPLE_FPS    starting sample rate (adapts between MIN/MAX_SAMPLE_FPS)
+    EDUSNAP_MAX_VIDEO_SECONDS   frames past this point are ignored
+    EDUSNAP_MAX_VIDEO_MB        largest accepted clip
+"""
+
+import os
+import tempfile
+import cv2
+import numpy as np
+from app.core.database import SessionLocal
+from app.core.embedding_gallery import get_gallery
+from app.core.face_matching import match_faces
+from app.core.face_recognition_engine import encoder
+from app.core.stage_timer import StageTimer
+
+VIDEO_SAMPLE_FPS = float(os.getenv("EDUSNAP_VIDEO_SAMPLE_FPS", "4"))
+MIN_SAMPLE_FPS = 2.0  # Slow pans or a still camera
+MAX_SAMPLE_FPS = 10.0  # Fast pans
+MAX_VIDEO_SECONDS = float(os.getenv("EDUSNAP_MAX_VIDEO_SECONDS", "60"))
+MAX_VIDEO_BYTES = int(float(os.getenv("EDUSNAP_MAX_VIDEO_MB", "80")) * 1024 * 1024)
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.3gp')
+
+DETECT_LONG_SIDE = 1280  # Frames are downscaled to this before detection
+MOTION_HIGH = 12.0  # Mean abs. difference of grey thumbnails that speeds sampling up
+MOTION_LOW = 4.0  # ... and below which sampling slows down
+MOTION_STILL = 1.0  # Frames this similar to the last processed one are skipped
+
+TRACK_IOU = 0.3  # Minimum IoU between a predicted track box and a detection
+MAX_MISSES = 3  # Sampled frames a track may go undetected before it ends
+MIN_HITS = 2  # Detections needed before a track counts (unless confidently recognized)
+CONFIDENT_SCORE = 0.6  # Tracks at or above this similarity are not recognized again
+MAX_EMBEDS_PER_TRACK = 4
+MIN_FACE_SIDE = 20  # Faces smaller than this (px) are tracked but not yet recognized
+
+
+def _box_to_state(box):
+    x1, y1, x2, y2 = box[:4]
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
+
+
+def _state_to_box(state):
+    cx, cy, w, h = state
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float64)
+
+
+def _iou_matrix(a, b):
+    """Pairwise IoU between boxes ``a`` (N x 4) and ``b`` (M x 4)."""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    """
+    One face followed across sampled frames. Position follows a
+    constant-velocity alpha-beta filter (a steady-state Kalman filter), which
+    keeps the predicted box on the face while the camera pans.
+    """
+
+    ALPHA = 0.6  # Weight of the measured position
+    BETA = 0.3  # Weight of the measured velocity
+
+    def __init__(self, track_id: int, box, t: float):
+        self.id = track_id
+        self.state = _box_to_state(box)
+        self.velocity = np.zeros(2)
+        self.t = t
+        self.hits = 1
+        self.misses = 0
+        self.embeddings = 0
+        self.best_score = 0.0
+        self._embedding_sum = None
+
+    def predict(self, t: float):
+        state = self.state.copy()
+        state[:2] += self.velocity * (t - self.t)
+        return _state_to_box(state)
+
+    def update(self, box, t: float):
+        dt = max(t - self.t, 1e-3)
+        predicted = self.state.copy()
+        predicted[:2] += self.velocity * dt
+        residual = _box_to_state(box) - predicted
+        self.state = predicted + self.ALPHA * residual
+        self.velocity += self.BETA * residual[:2] / dt
+        self.t = t
+        self.hits += 1
+        self.misses = 0
+
+    def needs_recognition(self) -> bool:
+        if self.embeddings == 0:
+            return True
+        return self.best_score < CONFIDENT_SCORE and self.embeddings < MAX_EMBEDS_PER_TRACK
+
+    def add_embedding(self, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        self._embedding_sum = embedding if self._embedding_sum is None else self._embedding_sum + embedding
+        self.embeddings += 1
+
+    @property
+    def embedding(self):
+        """Mean of the track's normalized embeddings."""
+        return self._embedding_sum / (np.linalg.norm(self._embedding_sum) or 1.0)
+
+
+class FaceTracker:
+    """Associates each sampled frame's detections with live tracks by predicted-box IoU."""
+
+    def __init__(self):
+        self.active = []
+        self.finished = []
+        self._next_id = 1
+
+    def step(self, boxes, t: float):
+        """Advance to time ``t``; returns (track, detection index) for every detection."""
+        from scipy.optimize import linear_sum_assignment
+
+        assignments = []
+        unmatched = set(range(len(boxes)))
+        if self.active and len(boxes):
+            predicted = np.array([track.predict(t) for track in self.active])
+            iou = _iou_matrix(predicted, boxes[:, :4])
+            for ti, di in zip(*linear_sum_assignment(iou, maximize=True)):
+                if iou[ti, di] >= TRACK_IOU:
+                    self.active[ti].update(boxes[di], t)
+                    assignments.append((self.active[ti], di))
+                    unmatched.discard(di)
+
+        seen = {id(track) for track, _ in assignments}
+        still_active = []
+        for track in self.active:
+            if id(track) not in seen:
+                track.misses += 1
+                if track.misses > MAX_MISSES:
+                    self.finished.append(track)
+                    continue
+            still_active.append(track)
+        self.active = still_active
+
+        for di in sorted(unmatched):
+            track = Track(self._next_id, boxes[di], t)
+            self._next_id += 1
+            self.active.append(track)
+            assignments.append((track, di))
+        return assignments
+
+    def tracks(self):
+        return self.finished + self.active
+
+
+def _downscale(frame):
+    long_side = max(frame.shape[:2])
+    if long_side <= DETECT_LONG_SIDE:
+        return frame
+    scale = DETECT_LONG_SIDE / long_side
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def _thumbnail(frame):
+    return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, 36), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _recognize_pending(gallery, frame, boxes, kpss, assignments):
+    """Embed (in one batch) the detections whose track still needs recognition."""
+    pending = [
+        (track, di) for track, di in assignments
+        if track.needs_recognition() and min(boxes[di, 2] - boxes[di, 0], boxes[di, 3] - boxes[di, 1]) >= MIN_FACE_SIDE
+    ]
+    if not pending:
+        return 0
+    indices = [di for _, di in pending]
+    embeddings = encoder.embed(frame, boxes[indices], kpss[indices])
+    for (track, _), embedding in zip(pending, embeddings):
+        track.add_embedding(embedding)
+    scores, _ = gallery.search(np.stack([track.embedding for track, _ in pending]), k=1)
+    for (track, _), score in zip(pending, scores[:, 0]):
+        track.best_score = float(score)
+    return len(pending)
+
+
+def recognize_video(video_bytes: bytes, suffix: str = ".mp4", on_stage=None):
+    """
+    Recognize the students seen in a video clip. Returns the recognized
+    students (with similarity, margin and track id) plus sampling statistics,
+    or {"error": ...}. Module-level so it can run in the inference pool.
+    """
+    timer = StageTimer(on_stage)
+
+    db = SessionLocal()
+    try:
+        gallery = get_gallery(db)
+    finally:
+        db.close()
+    if not len(gallery):
+        return {"error": "No registered faces found"}
+
+    # OpenCV demuxes from a path only, so the clip lives in a temp file while it is read
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(video_bytes)
+    capture = cv2.VideoCapture(tmp.name)
+
+    tracker = FaceTracker()
+    stats = {"frames_total": 0, "frames_sampled": 0, "frames_detected": 0, "faces_embedded": 0}
+    try:
+        if not capture.isOpened():
+            return {"error": "Invalid video"}
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        min_step = max(1, round(fps / MAX_SAMPLE_FPS))
+        max_step = max(min_step, round(fps / MIN_SAMPLE_FPS))
+        step = min(max_step, max(min_step, round(fps / VIDEO_SAMPLE_FPS)))
+        max_frames = int(MAX_VIDEO_SECONDS * fps)
+
+        frame_idx, last_thumb = 0, None
+        while frame_idx < max_frames:
+            with timer.stage("decode"):
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frame = _downscale(frame)
+                thumb = _thumbnail(frame)
+            stats["frames_sampled"] += 1
+
+            motion = float(np.abs(thumb - last_thumb).mean()) if last_thumb is not None else MOTION_HIGH
+            if motion > MOTION_HIGH:
+                step = max(min_step, step // 2)
+            elif motion < MOTION_LOW:
+                step = min(max_step, step + 1)
+
+            if motion >= MOTION_STILL:
+                last_thumb = thumb
+                t = frame_idx / fps
+                with timer.stage("detect"):
+                    boxes, kpss = encoder.detect_boxes(frame)
+                with timer.stage("track"):
+                    assignments = tracker.step(boxes, t)
+                with timer.stage("embed"):
+                    stats["faces_embedded"] += _recognize_pending(gallery, frame, boxes, kpss, assignments)
+                stats["frames_detected"] += 1
+
+            with timer.stage("decode"):
+                skipped = 0
+                while skipped < step - 1 and capture.grab():  # grab() skips the colour conversion
+                    skipped += 1
+            frame_idx += 1 + skipped
+            if skipped < step - 1:
+                break
+        stats["frames_total"] = frame_idx
+    finally:
+        capture.release()
+        os.remove(tmp.name)
+
+    with timer.stage("match"):
+        tracks = [
+            track for track in tracker.tracks()
+            if track.embeddings and (track.hits >= MIN_HITS or track.best_score >= CONFIDENT_SCORE)
+        ]
+        # Each track on its own: one student often leaves and re-enters the frame as
+        # several tracks, and one-to-one assignment would drop or mislabel all but one
+        matches = [match_faces(gallery, [track.embedding])[0] for track in tracks]
+
+    best = {}  # Student id -> best-scoring track, as merge_recognitions does across photos
+    for track, match in zip(tracks, matches):
+        if match["row"] is None:
+            continue
+        student = gallery.student(match["row"])
+        student.update(similarity=match["score"], margin=match["margin"], track_id=track.id, frames=track.hits)
+        current = best.get(student["id"])
+        if current is None or student["similarity"] > current["similarity"]:
+            best[student["id"]] = student
+    present_students = sorted(best.values(), key=lambda s: -s["similarity"])
+
+    return {
+        "faces_detected": len(tracks),
+        "tracks": len(tracker.tracks()),
+        "gallery_size": len(gallery),
+        **stats,
+        "present_students": present_students,
+        "timings": timer.timings,
+    }
@@ -1,16 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import students
-from app.core.database import engine
-from app.core import models
 from app.api.routes import auth, admin, faculty, attendance, reports
-from app.core.attendance_cleanup import delete_old_attendance
+from app.core.attendance_cleanup import delete_old_attendance, delete_old_artifacts
 from app.core.seed import seed_admin
+from app.core.model_registry import warm_up_enabled
+from app.core.inference_pool import start_pool, shutdown_pool
+from app.core.attendance_report import shutdown_report_pool
+from app.core.attendance_jobs import start_embedded_worker
+from app.core.image_upload import limit_request_size
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
 
-models.Base.metadata.create_all(bind=engine)
-
+# The schema is managed by Alembic and migrated as a deploy step (python -m app.core.init_db)
 app = FastAPI(title="EduSnap AI - Backend")
 
 origins = [
@@ -18,6 +21,9 @@ origins = [
     "http://127.0.0.1:3000",
 ]
 
+# Registered before CORS so 413 responses still carry CORS headers
+app.middleware("http")(limit_request_size)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Explicit origins
@@ -26,6 +32,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="backend/app/templates")
 
@@ -44,7 +53,22 @@ def home():
 def health_check():
     return {"status": "Backend is connected successfully 🚀"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: route latency, pipeline stage timings, face counts."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 @app.on_event("startup")
 def startup_tasks():
     delete_old_attendance(days=10)
+    delete_old_artifacts()
     seed_admin()
+    if warm_up_enabled():
+        # Models load where inference runs: in each pool worker, or here if the pool is disabled
+        start_pool()
+    start_embedded_worker()
+
+@app.on_event("shutdown")
+def shutdown_tasks():
+    shutdown_pool()
+    shutdown_report_pool()
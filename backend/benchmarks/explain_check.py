@@ -0,0 +1,169 @@
+"""
+Check with EXPLAIN that the hot queries use their indexes.
+
+Usage (from backend/):
+    python -m benchmarks.explain_check
+    python -m benchmarks.explain_check --database-url postgresql://user:pw@localhost/edusnap
+
+Each query below is built the way the app builds it, then explained with
+EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (FORMAT JSON) (PostgreSQL, with
+sequential scans disabled so the verdict does not depend on table size).
+A check passes when the plan reads its table through the expected index
+(any index when none is named). Exits non-zero if any check fails.
+
+The default database is a temporary SQLite file migrated to the latest
+revision; any other --database-url (or BENCHMARK_DATABASE_URL) is only
+read, so migrate it first.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "edusnap_explain.db")
+
+
+def hot_queries():
+    """(name, table, expected index or None, statement) for each hot query."""
+    from sqlalchemy import select
+    from app.core.models import Artifact, Attendance, Student, User
+
+    day = date.today()
+    return [
+        ("login / get_current_user", "users", None,
+         select(User).where(User.email == "someone@example.com")),
+        ("already_marked", "attendance", "uq_attendance_student_subject_date",
+         select(Attendance.student_id).where(
+             Attendance.student_id.in_([1, 2, 3]), Attendance.subject == "Math", Attendance.date == day)),
+        ("delete_old_attendance", "attendance", "ix_attendance_date_id",
+         select(Attendance.id).where(Attendance.date < day - timedelta(days=10))),
+        ("faculty latest session", "attendance", "ix_attendance_marked_by_date",
+         select(Attendance.subject, Attendance.date).where(Attendance.marked_by == 1)
+         .order_by(Attendance.date.desc(), Attendance.id.desc()).limit(1)),
+        ("faculty records page", "attendance", "ix_attendance_marked_by_date",
+         select(Attendance.id, Attendance.date, Student.roll_no)
+         .join(Student, Student.id == Attendance.student_id)
+         .where(Attendance.marked_by == 1, Attendance.date <= day)
+         .order_by(Attendance.date.desc(), Attendance.id.desc()).limit(100)),
+        ("admin records page", "attendance", "ix_attendance_date_id",
+         select(Attendance.id, Attendance.date)
+         .where(Attendance.date < day)
+         .order_by(Attendance.date.desc(), Attendance.id.desc()).limit(100)),
+        ("session report rows", "attendance", "ix_attendance_subject_date",
+         select(Attendance.status, Student.roll_no)
+         .join(Student, Student.id == Attendance.student_id)
+         .where(Attendance.subject == "Math", Attendance.date == day)),
+        ("latest image for me", "artifacts", "ix_artifacts_owner_kind_created",
+         select(Artifact).where(Artifact.kind == "image", Artifact.owner_id == 1)
+         .order_by(Artifact.created_at.desc(), Artifact.id.desc()).limit(1)),
+        ("session artifacts", "artifacts", "ix_artifacts_session",
+         select(Artifact.path).where(
+             Artifact.kind == "csv", Artifact.subject == "Math", Artifact.session_date == day)),
+    ]
+
+
+def _driver_sql(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def _sqlite_index_name(conn, table, name):
+    """Name of the UNIQUE constraint behind one of SQLite's sqlite_autoindex_* indexes."""
+    from sqlalchemy import inspect
+
+    if not name.startswith("sqlite_autoindex_"):
+        return name
+    columns = [row[2] for row in conn.exec_driver_sql(f'PRAGMA index_info("{name}")')]
+    for constraint in inspect(conn).get_unique_constraints(table):
+        if constraint["column_names"] == columns and constraint["name"]:
+            return constraint["name"]
+    return name
+
+
+def sqlite_plan(conn, stmt, table):
+    sql, params = _driver_sql(conn, stmt)
+    details = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)]
+    indexes = []
+    for detail in details:
+        # e.g. "SEARCH attendance USING INDEX ix_attendance_date_id (date<?)"
+        match = re.match(rf"(?:SEARCH|SCAN) {table}\b(?: USING (?:COVERING )?INDEX (\S+))?", detail)
+        if match:
+            if match.group(1):
+                indexes.append(_sqlite_index_name(conn, table, match.group(1)))
+            else:
+                indexes.append("PRIMARY KEY" if "PRIMARY KEY" in detail else None)
+    return details, indexes
+
+
+def postgres_plan(conn, stmt, table):
+    sql, params = _driver_sql(conn, stmt)
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+
+    nodes, indexes = [], []
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        children = node.get("Plans", [])
+        nodes.append(f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip())
+        if node.get("Relation Name") == table:
+            if node["Node Type"] == "Bitmap Heap Scan":  # The index is read by its Bitmap Index Scan children
+                indexes.extend(child.get("Index Name") for child in children)
+            else:
+                indexes.append(node.get("Index Name"))  # None for a Seq Scan
+        stack.extend(children)
+    return nodes, indexes
+
+
+def run_checks(engine):
+    from sqlalchemy.exc import DBAPIError
+
+    explain = postgres_plan if engine.dialect.name == "postgresql" else sqlite_plan
+    failures = 0
+    for name, table, expected, stmt in hot_queries():
+        try:
+            with engine.connect() as conn, conn.begin():
+                plan, indexes = explain(conn, stmt, table)
+        except DBAPIError as e:  # Missing table or column: the database is not migrated
+            plan, indexes = [str(e.orig).strip()], []
+        used = [i for i in indexes if i]
+        ok = bool(indexes) and len(used) == len(indexes) and (expected is None or expected in used)
+        failures += not ok
+        print(f"  {'✅' if ok else '❌'} {name:<26} {', '.join(used) or 'no index (full scan)'}")
+        if not ok:
+            print(f"      expected {expected or 'an index'} on {table}; plan: {' | '.join(plan)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL", DEFAULT_DATABASE_URL))
+    args = parser.parse_args()
+
+    # The app reads DATABASE_URL at import time, so set it before importing anything from app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    from app.core.database import engine
+
+    if args.database_url == DEFAULT_DATABASE_URL:
+        from app.core.init_db import init_db
+
+        init_db()
+
+    print(f"🔎 EXPLAIN checks on {engine.url.render_as_string(hide_password=True)} ({engine.dialect.name})")
+    failures = run_checks(engine)
+    if failures:
+        print(f"❌ {failures} hot queries do not use their index")
+        sys.exit(1)
+    print("✅ All hot queries use their indexes")
+
+
+if __name__ == "__main__":
+    main()
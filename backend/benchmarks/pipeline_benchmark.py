@@ -0,0 +1,360 @@
+"""
+End-to-end benchmark of the photo attendance pipeline.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline_benchmark --sizes 1000 10000 100000 --faces 10 40
+    python -m benchmarks.pipeline_benchmark --database-url postgresql://user:pw@localhost/edusnap_bench
+    python -m benchmarks.pipeline_benchmark --output run.json --compare previous.json
+
+For each gallery size the students table is filled with synthetic students
+(random unit embeddings) and each synthetic classroom photo is pushed
+through the pipeline stage by stage:
+
+    decode    JPEG bytes -> image (reduced decode for very large photos)
+    detect    face detection (tiled for large photos)
+    embed     batched ArcFace embeddings
+    match     gallery search + one-to-one assignment
+    write     bulk attendance insert + commit
+    annotate  keeping the photo + boxes for deferred annotation
+    render    preview + thumbnail render (first view)
+    report    on-demand CSV + PDF build (first download)
+
+Photos are composed from app/static/student_images, scaled and placed on a
+canvas, and those source faces are enrolled too, so matches and writes are
+real. Without the InsightFace model (--synthetic-faces, or when it cannot
+load) detect/embed are skipped and each placed face is a noisy view of its
+own enrolled identity instead.
+
+Only rows the benchmark creates (roll numbers and subjects starting with
+"bench-") are written or deleted. Results are medians over --repeat runs in
+milliseconds, saved as JSON with the git commit; --compare flags stages
+slower than a previous run by more than --tolerance and exits non-zero.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+import cv2
+import numpy as np
+
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "edusnap_benchmark.db")
+SOURCE_DIR = os.path.join("app", "static", "student_images")
+STAGES = ("decode", "detect", "embed", "match", "write", "annotate", "render", "report")
+BENCH_PREFIX = "bench-"
+SEED_BATCH = 5000
+NOISE_FLOOR_MS = 1.0  # Differences below this are never reported as regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_sources(directory: str = SOURCE_DIR, limit: int = 50):
+    paths = sorted(glob.glob(os.path.join(directory, "*.jpg")) + glob.glob(os.path.join(directory, "*.png")))
+    images = [cv2.imread(p) for p in paths[:limit]]
+    return [img for img in images if img is not None]
+
+
+def _unit(rng, count, dim):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _noisy(rng, vector, similarity=0.7):
+    noise = _unit(rng, 1, len(vector))[0]
+    return similarity * vector + np.sqrt(1 - similarity ** 2) * noise
+
+
+def compose_photo(sources, faces: int, size=(4000, 3000), seed: int = 0):
+    """
+    Synthetic classroom photo: ``faces`` source images scaled into a grid.
+    Returns (jpeg bytes, N x 4 boxes, source index per face).
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    canvas = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    cols = int(np.ceil(np.sqrt(faces * width / height)))
+    rows = int(np.ceil(faces / cols))
+    cell_w, cell_h = width // cols, height // rows
+
+    boxes, source_ids = [], []
+    for i in range(faces):
+        r, c = divmod(i, cols)
+        side = int(min(cell_w, cell_h) * rng.uniform(0.5, 0.9))  # Back rows are smaller in real photos too
+        x = c * cell_w + int(rng.integers(0, cell_w - side + 1))
+        y = r * cell_h + int(rng.integers(0, cell_h - side + 1))
+        source = i % len(sources) if sources else -1
+        if sources:
+            canvas[y:y + side, x:x + side] = cv2.resize(sources[source], (side, side), interpolation=cv2.INTER_AREA)
+        else:
+            cv2.ellipse(canvas, (x + side // 2, y + side // 2), (side // 3, side // 2 - 2), 0, 0, 360,
+                        (150, 180, 220), -1)
+        boxes.append((x, y, x + side, y + side))
+        source_ids.append(source)
+
+    ok, jpeg = cv2.imencode(".jpg", canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return jpeg.tobytes(), np.array(boxes, dtype=np.float32), source_ids
+
+
+def clear_bench_rows(db):
+    from app.core.models import Attendance, AttendanceRollup, Student
+
+    bench_ids = db.query(Student.id).filter(Student.roll_no.like(f"{BENCH_PREFIX}%"))
+    db.query(Attendance).filter(
+        (Attendance.subject.like(f"{BENCH_PREFIX}%")) | (Attendance.student_id.in_(bench_ids))
+    ).delete(synchronize_session=False)
+    db.query(AttendanceRollup).filter(
+        (AttendanceRollup.subject.like(f"{BENCH_PREFIX}%")) | (AttendanceRollup.student_id.in_(bench_ids))
+    ).delete(synchronize_session=False)
+    db.query(Student).filter(Student.roll_no.like(f"{BENCH_PREFIX}%")).delete(synchronize_session=False)
+    db.commit()
+
+
+def seed_students(db, size: int, identities, seed: int = 0):
+    """Insert ``size`` synthetic students plus the identities placed in the photos."""
+    from sqlalchemy import insert
+    from app.core.embedding_codec import EMBEDDING_DIM, embedding_columns
+    from app.core.models import Student
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, SEED_BATCH):
+        vectors = _unit(rng, min(SEED_BATCH, size - start), EMBEDDING_DIM)
+        db.execute(insert(Student), [
+            {
+                "name": f"Synthetic Student{start + i}",
+                "roll_no": f"{BENCH_PREFIX}{start + i}",
+                "department": "BENCH",
+                "semester": "1",
+                **embedding_columns(vector),
+            }
+            for i, vector in enumerate(vectors)
+        ])
+    db.execute(insert(Student), [
+        {
+            "name": f"Source Face{j}",
+            "roll_no": f"{BENCH_PREFIX}face-{j}",
+            "department": "BENCH",
+            "semester": "1",
+            **embedding_columns(vector),
+        }
+        for j, vector in enumerate(identities)
+    ])
+    db.commit()
+
+
+def load_face_app(synthetic: bool):
+    if synthetic:
+        return None
+    try:
+        from app.core.model_registry import warm_up
+
+        return warm_up()
+    except Exception as e:
+        print(f"⚠️ Face model unavailable ({e}); detect/embed are skipped")
+        return None
+
+
+def identity_embeddings(face_app, sources, count: int, seed: int = 0):
+    """
+    Embeddings enrolled for the faces placed in photos: the model's embedding
+    of each source image, or ``count`` random identities without a model.
+    """
+    from app.core.embedding_codec import EMBEDDING_DIM
+
+    rng = np.random.default_rng(seed + 1)
+    if face_app is None:
+        return _unit(rng, count, EMBEDDING_DIM)
+    embeddings = []
+    for img in sources:
+        faces = face_app.get(img)
+        embeddings.append(faces[0].embedding if faces else _unit(rng, 1, EMBEDDING_DIM)[0])
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def run_photo(photo, gallery, face_app, db, repeat: int, label: str):
+    """Median per-stage milliseconds for one photo over ``repeat`` runs."""
+    from app.core.annotations import render, rendered_paths, save_source
+    from app.core.attendance_report import session_report
+    from app.core.attendance_writer import mark_present
+    from app.core.face_matching import match_faces
+    from app.core.image_upload import decode_image
+    from app.core.stage_timer import StageTimer
+    from app.core.tiled_detection import detect_boxes, embed_faces
+
+    jpeg, width, placed_boxes, placed_embeddings = photo
+    runs, faces_detected, matched = [], 0, 0
+    for r in range(repeat):
+        timer = StageTimer()
+        subject = f"{BENCH_PREFIX}{label}-{r}"
+        with timer.stage("decode"):
+            img = decode_image(jpeg)
+        if face_app is not None:
+            with timer.stage("detect"):
+                boxes, kpss = detect_boxes(face_app, img)
+            with timer.stage("embed"):
+                embeddings = [face.embedding for face in embed_faces(face_app, img, boxes, kpss)]
+        else:
+            boxes, embeddings = placed_boxes * (img.shape[1] / width), placed_embeddings
+        with timer.stage("match"):
+            matches = match_faces(gallery, embeddings)
+        present = [gallery.student(m["row"]) for m in matches if m["row"] is not None]
+        with timer.stage("write"):
+            mark_present(db, [s["id"] for s in present], subject, date.today(), marked_by=None)
+            db.commit()
+        with timer.stage("annotate"):
+            source = save_source(subject, img, [(b, gallery.names[m["row"]] if m["row"] is not None else None)
+                                                for b, m in zip(boxes, matches)])
+        if source:
+            with timer.stage("render"):  # What the first view of the image costs
+                render(source)
+            for path in (source, *rendered_paths(source)):
+                os.remove(path)
+        with timer.stage("report"):  # What the first download of each report costs
+            reports = [session_report(db, subject, date.today(), fmt) for fmt in ("csv", "pdf")]
+        for path in reports:
+            if path and os.path.exists(path):
+                os.remove(path)
+        runs.append(timer.timings)
+        faces_detected, matched = len(embeddings), len(present)
+
+    stages = {
+        stage: round(1000 * float(np.median([run[stage] for run in runs])), 3)
+        for stage in STAGES if stage in runs[0]
+    }
+    return {
+        "stages_ms": stages,
+        "total_ms": round(sum(stages.values()), 3),
+        "faces": faces_detected,
+        "matched": matched,
+    }
+
+
+def benchmark(sizes, face_counts, repeat: int, image_size, synthetic: bool):
+    from app.core.database import SessionLocal
+    from app.core.embedding_gallery import EmbeddingGallery
+    from app.core.init_db import init_db
+
+    init_db()
+    face_app = load_face_app(synthetic)
+    sources = load_sources()
+    identities = identity_embeddings(face_app, sources, max(face_counts))
+    rng = np.random.default_rng(2)
+
+    photos = {}
+    for faces in face_counts:
+        jpeg, boxes, _ = compose_photo(sources, faces, image_size, seed=faces)
+        # Without a model, placed face i is a noisy view of identity i
+        noisy = np.array([_noisy(rng, identities[i % len(identities)]) for i in range(faces)], dtype=np.float32)
+        photos[faces] = (jpeg, image_size[0], boxes, noisy)
+
+    results = {}
+    db = SessionLocal()
+    try:
+        for size in sizes:
+            print(f"📚 Gallery of {size} synthetic students")
+            clear_bench_rows(db)
+            start = time.perf_counter()
+            seed_students(db, size, identities)
+            seed_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            gallery = EmbeddingGallery().refresh(db)
+            load_ms = 1000 * (time.perf_counter() - start)
+
+            entry = {"seed_s": round(seed_s, 3), "gallery_load_ms": round(load_ms, 3),
+                     "gallery_size": len(gallery), "photos": {}}
+            for faces, photo in photos.items():
+                result = run_photo(photo, gallery, face_app, db, repeat, f"{size}-{faces}")
+                entry["photos"][f"{faces}_faces"] = result
+                stages = "  ".join(f"{k} {v:.1f}" for k, v in result["stages_ms"].items())
+                print(f"  {faces:>3} faces ({result['matched']} matched): {stages}  = {result['total_ms']:.1f} ms")
+            results[str(size)] = entry
+        clear_bench_rows(db)
+    finally:
+        db.close()
+    return results, face_app is not None
+
+
+def compare(current: dict, previous: dict, tolerance: float):
+    """Stages slower than ``previous`` by more than ``tolerance`` (fraction)."""
+    regressions = []
+    for size, entry in current["results"].items():
+        old_entry = previous.get("results", {}).get(size)
+        if not old_entry:
+            continue
+        for photo, result in entry["photos"].items():
+            old = old_entry["photos"].get(photo, {}).get("stages_ms", {})
+            for stage, ms in result["stages_ms"].items():
+                if stage not in old:
+                    continue
+                ratio = ms / old[stage] if old[stage] else float("inf")
+                flag = ms > old[stage] * (1 + tolerance) and ms - old[stage] > NOISE_FLOOR_MS
+                print(f"  {size:>7} {photo:<9} {stage:<9} {old[stage]:9.2f} -> {ms:9.2f} ms "
+                      f"({ratio:5.2f}x){'  ⚠️ regression' if flag else ''}")
+                if flag:
+                    regressions.append({"size": size, "photo": photo, "stage": stage,
+                                        "before_ms": old[stage], "after_ms": ms})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--faces", type=int, nargs="+", default=[10, 40], help="Faces per synthetic photo")
+    parser.add_argument("--image-size", default="4000x3000", help="Synthetic photo WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synthetic-faces", action="store_true", help="Skip the model; use synthetic embeddings")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # The app reads DATABASE_URL at import time, so set it before importing anything from app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    image_size = tuple(int(v) for v in args.image_size.lower().split("x"))
+
+    results, with_model = benchmark(args.sizes, args.faces, args.repeat, image_size, args.synthetic_faces)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "database": args.database_url.split(":", 1)[0],
+            "python": platform.python_version(),
+            "model": with_model,
+            "image_size": list(image_size),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"🔍 Against {args.compare} (commit {previous.get('meta', {}).get('commit')})")
+        regressions = compare(report, previous, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Compare the INT8 model pack against FP32 on a local image set.
+
+Usage (from backend/):
+    python -m benchmarks.quantization_report --images app/static/student_images --repeat 5
+
+Faces are detected once with the FP32 detector so both recognizers embed
+the same aligned crops. Reports, per face:
+  cosine drift     1 - cos(fp32 embedding, int8 embedding): mean / p95 / max
+  match agreement  share of faces whose gallery match (student or unknown)
+                   is the same under both models
+  speedup          FP32 vs INT8 latency of batched recognition and of detection
+The gallery is the registered students in the database when there are any,
+otherwise the FP32 embeddings of the image set itself.
+"""
+
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from app.core.embedding_codec import EMBEDDING_DIM
+from app.core.face_matching import match_faces
+from app.core.model_registry import get_face_app
+from app.core.quantize_models import list_images
+from app.core.search_index import ExactIndex
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _timed(fn, repeat):
+    """Median wall time of ``fn()`` over ``repeat`` runs, after one warm-up run."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def load_gallery(fallback):
+    """Registered students if the database has any, else an index over ``fallback``."""
+    try:
+        from app.core.embedding_gallery import get_gallery
+
+        gallery = get_gallery()
+        if len(gallery):
+            return gallery, "database"
+    except Exception as e:
+        print(f"⚠️ Database gallery unavailable ({e}); using the image set itself")
+    index = ExactIndex(EMBEDDING_DIM)
+    index.add(fallback)
+    return index, "image set"
+
+
+def compare(image_paths, repeat: int = 5):
+    from insightface.utils import face_align
+
+    fp32 = get_face_app(profile="attendance", precision="fp32")
+    int8 = get_face_app(profile="attendance", precision="int8")
+    rec32, rec8 = fp32.models["recognition"], int8.models["recognition"]
+
+    images, crops = [], []
+    for path in image_paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        images.append(img)
+        for face in fp32.get(img):
+            crops.append(face_align.norm_crop(img, landmark=face.kps, image_size=rec32.input_size[0]))
+    if not crops:
+        raise SystemExit("❌ No faces found in the image set")
+
+    emb32 = _normalize(rec32.get_feat(crops))
+    emb8 = _normalize(rec8.get_feat(crops))
+    drift = 1.0 - np.sum(emb32 * emb8, axis=1)
+
+    gallery, gallery_source = load_gallery(emb32)
+    rows32 = [m["row"] for m in match_faces(gallery, emb32)]
+    rows8 = [m["row"] for m in match_faces(gallery, emb8)]
+    agreement = float(np.mean([a == b for a, b in zip(rows32, rows8)]))
+
+    rec_fp32 = _timed(lambda: rec32.get_feat(crops), repeat)
+    rec_int8 = _timed(lambda: rec8.get_feat(crops), repeat)
+    det_fp32 = _timed(lambda: [fp32.det_model.detect(img, max_num=0) for img in images], repeat)
+    det_int8 = _timed(lambda: [int8.det_model.detect(img, max_num=0) for img in images], repeat)
+
+    return {
+        "images": len(images),
+        "faces": len(crops),
+        "gallery": gallery_source,
+        "cosine_drift": {
+            "mean": round(float(drift.mean()), 6),
+            "p95": round(float(np.percentile(drift, 95)), 6),
+            "max": round(float(drift.max()), 6),
+        },
+        "match_agreement": round(agreement, 4),
+        "recognition_ms_per_face": {
+            "fp32": round(1000 * rec_fp32 / len(crops), 3),
+            "int8": round(1000 * rec_int8 / len(crops), 3),
+            "speedup": round(rec_fp32 / rec_int8, 2),
+        },
+        "detection_ms_per_image": {
+            "fp32": round(1000 * det_fp32 / len(images), 3),
+            "int8": round(1000 * det_int8 / len(images), 3),
+            "speedup": round(det_fp32 / det_int8, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="app/static/student_images", help="Folder of face photos")
+    parser.add_argument("--limit", type=int, default=200, help="Max images to read")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per measurement")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    paths = list_images(args.images, args.limit)
+    print(f"📷 {len(paths)} images from {args.images}")
+    report = compare(paths, args.repeat)
+
+    drift = report["cosine_drift"]
+    rec, det = report["recognition_ms_per_face"], report["detection_ms_per_image"]
+    print(f"  faces {report['faces']}  gallery: {report['gallery']}")
+    print(f"  cosine drift   mean {drift['mean']:.5f}  p95 {drift['p95']:.5f}  max {drift['max']:.5f}")
+    print(f"  match agreement {report['match_agreement']:.2%}")
+    print(f"  recognition    {rec['fp32']:.2f} -> {rec['int8']:.2f} ms/face  ({rec['speedup']}x)")
+    print(f"  detection      {det['fp32']:.2f} -> {det['int8']:.2f} ms/image ({det['speedup']}x)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare the approximate search indexes against exact search.
+
+Usage (from backend/):
+    python -m benchmarks.search_index_benchmark --sizes 1000 10000 100000 --queries 500
+
+Synthetic "students" are random unit vectors; queries are noisy views of
+enrolled students (cosine ~0.7 to their source, like a classroom photo vs.
+an enrollment photo). Reports build time, recall@1 against exact search and
+per-query latency for each index type.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from app.core.embedding_codec import EMBEDDING_DIM
+from app.core.search_index import INDEX_TYPES, create_index
+
+
+def synthetic_gallery(size, dim=EMBEDDING_DIM, seed=0):
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((size, dim)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    return gallery
+
+
+def noisy_queries(gallery, count, similarity=0.7, seed=1):
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(len(gallery), size=count, replace=len(gallery) < count)
+    noise = rng.standard_normal((count, gallery.shape[1])).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = similarity * gallery[sources] + np.sqrt(1 - similarity ** 2) * noise
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype(np.float32)
+
+
+def benchmark(size, query_count, kinds):
+    gallery = synthetic_gallery(size)
+    queries = noisy_queries(gallery, query_count)
+    results = {}
+    truth = None
+
+    for kind in ["exact"] + [k for k in kinds if k != "exact"]:
+        index = create_index(EMBEDDING_DIM, kind)
+        start = time.perf_counter()
+        index.add(gallery)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, rows = index.search(queries, k=1)
+        query_s = time.perf_counter() - start
+
+        if truth is None:
+            truth = rows[:, 0]
+        results[kind] = {
+            "build_s": round(build_s, 4),
+            "query_ms": round(1000 * query_s / query_count, 4),
+            "recall_at_1": round(float(np.mean(rows[:, 0] == truth)), 4),
+        }
+        print(f"  {kind:<6} build {build_s:8.2f}s  query {results[kind]['query_ms']:8.3f} ms  "
+              f"recall@1 {results[kind]['recall_at_1']:.3f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--index", nargs="+", default=sorted(INDEX_TYPES), choices=sorted(INDEX_TYPES))
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        print(f"📚 Gallery of {size} embeddings, {args.queries} queries")
+        report[str(size)] = benchmark(size, args.queries, args.index)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Initial schema (as previously created by create_all at app import)
+
+Tables that already exist are left alone, so databases created by the old
+create_all call upgrade in place without a manual ``alembic stamp``. The
+only columns added since those tables could have been created, the
+students embedding format/model pair, are added when missing (converting
+legacy pickled embeddings is still python -m app.core.migrate_embeddings).
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = _existing_tables()
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(50), nullable=False, unique=True),
+            sa.Column("email", sa.String(120), nullable=False, unique=True),
+            sa.Column("hashed_password", sa.String(255), nullable=False),
+            sa.Column("role", sa.String(20)),
+            sa.Column("name", sa.String(120)),
+            sa.Column("department", sa.String(50)),
+            sa.Column("year", sa.String(10)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if "students" not in existing:
+        op.create_table(
+            "students",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(120), nullable=False),
+            sa.Column("roll_no", sa.String(50), nullable=False, unique=True),
+            sa.Column("department", sa.String(50)),
+            sa.Column("semester", sa.String(10)),
+            sa.Column("embedding", sa.LargeBinary()),
+            sa.Column("embedding_format", sa.Integer()),
+            sa.Column("embedding_model", sa.String(50)),
+        )
+        op.create_index("ix_students_id", "students", ["id"])
+    else:
+        columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("students")}
+        if "embedding_format" not in columns:
+            op.add_column("students", sa.Column("embedding_format", sa.Integer()))
+        if "embedding_model" not in columns:
+            op.add_column("students", sa.Column("embedding_model", sa.String(50)))
+
+    if "attendance" not in existing:
+        op.create_table(
+            "attendance",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id"), nullable=False),
+            sa.Column("subject", sa.String(100), nullable=False),
+            sa.Column("course", sa.String(100), nullable=False),
+            sa.Column("department", sa.String(50), nullable=False),
+            sa.Column("year", sa.String(10), nullable=False),
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("status", sa.String(20)),
+            sa.Column("marked_by", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.UniqueConstraint("student_id", "subject", "date", name="uq_attendance_student_subject_date"),
+        )
+        op.create_index("ix_attendance_id", "attendance", ["id"])
+
+    if "attendance_jobs" not in existing:
+        op.create_table(
+            "attendance_jobs",
+            sa.Column("id", sa.String(32), primary_key=True),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("stage", sa.String(30)),
+            sa.Column("progress", sa.Integer()),
+            sa.Column("attempts", sa.Integer()),
+            sa.Column("params", sa.JSON(), nullable=False),
+            sa.Column("image", sa.LargeBinary()),
+            sa.Column("timings", sa.JSON()),
+            sa.Column("result", sa.JSON()),
+            sa.Column("error", sa.Text()),
+            sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_attendance_jobs_status", "attendance_jobs", ["status"])
+
+    if "attendance_rollup" not in existing:
+        op.create_table(
+            "attendance_rollup",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("student_id", sa.Integer(), nullable=False),
+            sa.Column("subject", sa.String(100), nullable=False),
+            sa.Column("course", sa.String(100), nullable=False),
+            sa.Column("department", sa.String(50), nullable=False),
+            sa.Column("year", sa.String(10), nullable=False),
+            sa.Column("marked_by", sa.Integer(), nullable=False),
+            sa.Column("bucket", sa.Date(), nullable=False),
+            sa.Column("present", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Integer(), nullable=False),
+            sa.UniqueConstraint(
+                "student_id", "subject", "course", "department", "year", "marked_by", "bucket",
+                name="uq_attendance_rollup_key",
+            ),
+        )
+        op.create_index("ix_attendance_rollup_id", "attendance_rollup", ["id"])
+        op.create_index("ix_attendance_rollup_marked_by", "attendance_rollup", ["marked_by"])
+        op.create_index("ix_attendance_rollup_bucket", "attendance_rollup", ["bucket"])
+
+
+def downgrade():
+    for table in ("attendance_rollup", "attendance_jobs", "attendance", "students", "users"):
+        op.drop_table(table)
@@ -0,0 +1,52 @@
+"""Indexes for the hot attendance queries
+
+  uq_attendance_student_subject_date  (student_id, subject, date)  duplicate checks, upserts
+  ix_attendance_date_id               (date, id)                   retention cleanup, keyset pages
+  ix_attendance_marked_by_date        (marked_by, date, id)        faculty results / latest session
+  ix_attendance_subject_date          (subject, date)              session reports
+
+users.email is already covered by its unique constraint. Databases created
+before the uniqueness rule get their duplicate marks removed first (the
+oldest row is kept), as app.core.migrate_attendance did.
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_hot_path_indexes"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+UNIQUE_NAME = "uq_attendance_student_subject_date"
+INDEXES = {
+    "ix_attendance_date_id": ["date", "id"],
+    "ix_attendance_marked_by_date": ["marked_by", "date", "id"],
+    "ix_attendance_subject_date": ["subject", "date"],
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {i["name"] for i in inspector.get_indexes("attendance")}
+    existing |= {c["name"] for c in inspector.get_unique_constraints("attendance")}
+
+    if UNIQUE_NAME not in existing:
+        op.execute(
+            "DELETE FROM attendance WHERE id NOT IN ("
+            " SELECT MIN(id) FROM attendance GROUP BY student_id, subject, date)"
+        )
+        op.create_index(UNIQUE_NAME, "attendance", ["student_id", "subject", "date"], unique=True)
+
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "attendance", columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="attendance")
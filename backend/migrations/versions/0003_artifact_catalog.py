@@ -0,0 +1,36 @@
+"""Artifact catalog for generated reports and annotated images
+
+Revision ID: 0003_artifact_catalog
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_artifact_catalog"
+down_revision = "0002_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "artifacts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(10), nullable=False),
+        sa.Column("path", sa.String(500), nullable=False, unique=True),
+        sa.Column("owner_id", sa.Integer()),
+        sa.Column("subject", sa.String(100)),
+        sa.Column("session_date", sa.Date()),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_artifacts_owner_kind_created", "artifacts", ["owner_id", "kind", "created_at"])
+    op.create_index("ix_artifacts_kind_created", "artifacts", ["kind", "created_at"])
+    op.create_index("ix_artifacts_session", "artifacts", ["kind", "subject", "session_date"])
+    op.create_index("ix_artifacts_created_at", "artifacts", ["created_at"])
+
+
+def downgrade():
+    op.drop_table("artifacts")
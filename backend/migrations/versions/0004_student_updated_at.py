@@ -0,0 +1,33 @@
+"""students.updated_at for gallery change detection
+
+The embedding gallery compares (count, max(updated_at)) of the matchable
+students with what it has loaded, so edited, converted or re-enrolled
+embeddings are picked up without a restart. Existing rows stay NULL
+until they next change.
+
+Revision ID: 0004_student_updated_at
+Revises: 0003_artifact_catalog
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_student_updated_at"
+down_revision = "0003_artifact_catalog"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "updated_at" not in {c["name"] for c in inspector.get_columns("students")}:
+        op.add_column("students", sa.Column("updated_at", sa.DateTime()))
+    if "ix_students_updated_at" not in {i["name"] for i in inspector.get_indexes("students")}:
+        op.create_index("ix_students_updated_at", "students", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_students_updated_at", table_name="students")
+    with op.batch_alter_table("students") as batch:  # SQLite cannot drop columns in place
+        batch.drop_column("updated_at")
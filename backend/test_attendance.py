@@ -1,11 +1,12 @@
 import os
 import cv2
-import pickle
 import numpy as np
 from datetime import date
 from app.core.database import SessionLocal
 from app.core.models import Student, Attendance
 from app.core.face_recognition_engine import FaceEncoder
+from app.core.embedding_gallery import get_gallery
+from app.core.face_matching import match_faces
 
 # Initialize face encoder
 encoder = FaceEncoder()
@@ -23,20 +24,12 @@ if img is None:
     exit()
 
 # 🧠 Step 2: Load all known student embeddings from DB
-students = db.query(Student).filter(Student.embedding.isnot(None)).all()
-if not students:
+gallery = get_gallery(db)
+if not len(gallery):
     print("⚠️ No registered students with face data found.")
     exit()
 
-known_embeddings, known_names, known_rolls = [], [], []
-for s in students:
-    emb = pickle.loads(s.embedding)
-    known_embeddings.append(emb)
-    known_names.append(s.name)
-    known_rolls.append(s.roll_no)
-
-known_embeddings = np.array(known_embeddings)
-threshold = 0.45  # similarity threshold
+known_names, known_rolls = gallery.names, gallery.rolls
 
 # 🔍 Step 3: Detect faces in classroom photo
 faces = encoder.app.get(img)
@@ -47,13 +40,12 @@ if not faces:
 recognized_today = []
 today = date.today()
 
-for face in faces:
-    emb = encoder.l2_normalize(face.embedding)
-    cosine_sim = np.dot(known_embeddings, emb)
-    idx = np.argmax(cosine_sim)
-    max_sim = cosine_sim[idx]
+matches = match_faces(gallery, [face.embedding for face in faces])
+
+for face, match in zip(faces, matches):
+    idx = match["row"]
 
-    if max_sim > threshold:
+    if idx is not None:
         roll = known_rolls[idx]
         name = known_names[idx]
         status = "Present"
@@ -61,13 +53,13 @@ for face in faces:
         # 💾 Step 4: Save attendance to DB (avoid duplicates)
         already_marked = (
             db.query(Attendance)
-            .filter(Attendance.student_id == students[idx].id, Attendance.date == today)
+            .filter(Attendance.student_id == int(gallery.ids[idx]), Attendance.date == today)
             .first()
         )
 
         if not already_marked:
             record = Attendance(
-                student_id=students[idx].id,
+                student_id=int(gallery.ids[idx]),
                 subject="AI Class",  # change later dynamically
                 date=today,
                 status=status
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+import pytest
+from app.core.attendance_query import (
+    attendance_page, attendance_records, decode_cursor, encode_cursor, iter_records, stream_export,
+)
+from app.core.models import Attendance, Student
+
+START = date(2026, 10, 1)
+
+
+@pytest.fixture
+def records_db(db):
+    """30 students x 4 days of Math; days share dates across many rows, so pages split within a date."""
+    db.add_all(Student(id=sid, name=f"Student {sid}", roll_no=str(sid), department="CS") for sid in range(1, 31))
+    db.add_all(
+        Attendance(student_id=sid, subject="Math", course="BTech", department="CS", year="1",
+                   date=START + timedelta(days=d), status="Present", marked_by=1 if sid % 2 else 2)
+        for d in range(4) for sid in range(1, 31)
+    )
+    db.commit()
+    return db
+
+
+def _expected_order(db, marked_by=None):
+    query = db.query(Attendance)
+    if marked_by is not None:
+        query = query.filter(Attendance.marked_by == marked_by)
+    return [a.id for a in query.order_by(Attendance.date.desc(), Attendance.id.desc())]
+
+
+def _walk(db, limit, between_pages=None, **scope):
+    ids, cursor = [], None
+    while True:
+        page = attendance_page(attendance_records(db, **scope), cursor, limit)
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+        if between_pages:
+            between_pages()
+
+
+@pytest.mark.parametrize("limit", [1, 7, 30, 120, 500])
+def test_pages_cover_every_row_once_newest_first(records_db, limit):
+    assert _walk(records_db, limit) == _expected_order(records_db)
+
+
+def test_rows_written_while_paging_do_not_shift_later_pages(records_db):
+    expected = _expected_order(records_db)
+    added = []
+
+    def write_rows():
+        # New sessions land before the cursor (today) and after it (an old, back-filled date)
+        for day in (START + timedelta(days=10), START - timedelta(days=10)):
+            row = Attendance(student_id=1, subject=f"Extra {len(added)}", course="BTech", department="CS",
+                             year="1", date=day, status="Present", marked_by=1)
+            records_db.add(row)
+            records_db.commit()
+            added.append(row)
+
+    seen = _walk(records_db, 25, between_pages=write_rows)
+
+    assert len(seen) == len(set(seen))
+    assert [i for i in seen if i in set(expected)] == expected
+    backfilled = {row.id for row in added if row.date < START}
+    assert backfilled <= set(seen)  # Rows older than the cursor are still reached
+
+
+def test_deleting_the_cursor_row_does_not_break_the_walk(records_db):
+    expected = _expected_order(records_db)
+    first = attendance_page(attendance_records(records_db), None, 10)
+    records_db.query(Attendance).filter(Attendance.id == first["items"][-1]["id"]).delete()
+    records_db.commit()
+
+    rest = attendance_page(attendance_records(records_db), first["next_cursor"], 1000)
+
+    assert [i["id"] for i in first["items"] + rest["items"]] == expected
+
+
+def test_pages_respect_the_caller_scope_and_filters(records_db):
+    assert _walk(records_db, 13, marked_by=2) == _expected_order(records_db, marked_by=2)
+
+    page = attendance_page(attendance_records(records_db, {"date_from": START + timedelta(days=3)}), None, 1000)
+    assert {item["date"] for item in page["items"]} == {str(START + timedelta(days=3))}
+
+
+def test_cursor_round_trip_and_rejection():
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+    for bad in ("", "not-a-cursor", encode_cursor("2026-13-01", 1)):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_export_streams_every_row_in_keyset_batches(records_db):
+    rows = list(iter_records(attendance_records(records_db), batch_size=7))
+    assert [r.id for r in rows] == _expected_order(records_db)
+
+    lines = "".join(stream_export(attendance_records(records_db), "csv")).splitlines()
+    assert lines[0].startswith("id,date,subject") and len(lines) == 1 + len(rows)
@@ -0,0 +1,70 @@
+from datetime import date
+import pytest
+from app.core import attendance_writer
+from app.core.attendance_rollup import attendance_percentages
+from app.core.attendance_writer import insert_attendance, mark_absent_rest, mark_present
+from app.core.models import Attendance, AttendanceRollup, Student
+
+DAY = date(2026, 10, 18)
+NEXT_DAY = date(2026, 10, 19)
+
+
+def _row(student_id, status):
+    return {
+        "student_id": student_id, "subject": "Math", "course": "BTech", "department": "CS", "year": "1",
+        "date": DAY, "status": status, "marked_by": None,
+    }
+
+
+@pytest.fixture(params=["on_conflict", "fallback"])
+def writer_db(request, db, monkeypatch):
+    """Run each test on the ON CONFLICT path and on the path for other databases."""
+    if request.param == "fallback":
+        monkeypatch.setattr(attendance_writer, "_insert_ignoring_duplicates", lambda db, rows: None)
+    db.add(Student(id=101, name="Asha Rao", roll_no="101", department="CS"))
+    db.commit()
+    return db
+
+
+def test_key_repeated_in_one_batch_is_counted_once(writer_db):
+    inserted = insert_attendance(writer_db, [_row(101, "Present"), _row(101, "Absent")])
+    writer_db.commit()
+
+    assert inserted == {101}
+    assert [a.status for a in writer_db.query(Attendance).all()] == ["Present"]
+    rollup = writer_db.query(AttendanceRollup).one()
+    assert (rollup.present, rollup.total) == (1, 1)
+
+
+def test_already_marked_rows_are_not_counted_again(writer_db):
+    insert_attendance(writer_db, [_row(101, "Present")])
+    writer_db.commit()
+    assert insert_attendance(writer_db, [_row(101, "Absent")]) == set()
+    writer_db.commit()
+
+    rollup = writer_db.query(AttendanceRollup).one()
+    assert (rollup.present, rollup.total) == (1, 1)
+
+
+def _mark_session(db, present_ids, day):
+    """What record_attendance writes for one session of CS Math."""
+    mark_present(db, present_ids, "Math", day, course="BTech", department="CS", year="1")
+    mark_absent_rest(db, present_ids, "Math", day, course="BTech", department="CS", year="1")
+    db.commit()
+
+
+def test_missed_session_halves_the_percentage(writer_db):
+    _mark_session(writer_db, [101], DAY)
+    _mark_session(writer_db, [], NEXT_DAY)
+
+    [report] = attendance_percentages(writer_db, by="subject")
+    assert (report["present"], report["total"], report["attendance"]) == (1, 2, "50.0%")
+
+
+def test_absent_student_found_later_in_the_session_turns_present(writer_db):
+    _mark_session(writer_db, [], DAY)
+    _mark_session(writer_db, [101], DAY)  # e.g. a second photo of the same class
+
+    assert [a.status for a in writer_db.query(Attendance).all()] == ["Present"]
+    rollup = writer_db.query(AttendanceRollup).one()
+    assert (rollup.present, rollup.total) == (1, 1)
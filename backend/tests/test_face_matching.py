@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from app.core.face_matching import match_faces
+
+
+class FixedGallery:
+    """A gallery whose search returns preset (scores, rows) per face, best first."""
+
+    def __init__(self, size, scores, rows):
+        self.size = size
+        self.scores = np.array(scores, dtype=np.float32)
+        self.rows = np.array(rows, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    def search(self, queries, k=1):
+        assert len(queries) == len(self.scores)
+        return self.scores[:, :k], self.rows[:, :k]
+
+
+# Face 0 is a little closer to student 0 than to student 1; face 1 only resembles student 0
+CONTESTED = FixedGallery(2, scores=[[0.90, 0.80], [0.85, 0.30]], rows=[[0, 1], [0, 1]])
+
+
+def _faces(n):
+    return np.eye(n, 8, dtype=np.float32)
+
+
+def test_greedy_gives_the_contested_student_to_the_best_pair():
+    matches = match_faces(CONTESTED, _faces(2), method="greedy")
+
+    assert [m["row"] for m in matches] == [0, None]
+    assert matches[0]["score"] == pytest.approx(0.90)
+    assert matches[1]["score"] == pytest.approx(0.85)  # Unknown faces report their best candidate
+
+
+def test_hungarian_maximizes_total_similarity():
+    matches = match_faces(CONTESTED, _faces(2), method="hungarian")
+
+    assert [m["row"] for m in matches] == [1, 0]
+    assert [m["score"] for m in matches] == pytest.approx([0.80, 0.85])
+
+
+@pytest.mark.parametrize("method", ["greedy", "hungarian"])
+def test_no_student_is_assigned_twice(method):
+    gallery = FixedGallery(3, scores=[[0.9, 0.5], [0.8, 0.4], [0.7, 0.6]], rows=[[0, 1], [0, 2], [0, 2]])
+    rows = [m["row"] for m in match_faces(gallery, _faces(3), method=method)]
+
+    assigned = [r for r in rows if r is not None]
+    assert len(assigned) == len(set(assigned))
+
+
+@pytest.mark.parametrize("method", ["greedy", "hungarian"])
+def test_threshold_is_exclusive(method):
+    gallery = FixedGallery(2, scores=[[0.50, 0.10]], rows=[[0, 1]])
+
+    assert match_faces(gallery, _faces(1), threshold=0.50, method=method)[0]["row"] is None
+    assert match_faces(gallery, _faces(1), threshold=0.49, method=method)[0]["row"] == 0
+
+
+def test_margin_is_best_minus_runner_up():
+    gallery = FixedGallery(2, scores=[[0.90, 0.80], [0.70, 0.20]], rows=[[0, 1], [1, 0]])
+    matches = match_faces(gallery, _faces(2))
+
+    assert [m["margin"] for m in matches] == pytest.approx([0.10, 0.50])
+
+
+def test_margin_without_runner_up_is_the_best_score():
+    gallery = FixedGallery(1, scores=[[0.60, -np.inf]], rows=[[0, -1]])
+
+    assert match_faces(gallery, _faces(1))[0]["margin"] == pytest.approx(0.60)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        match_faces(CONTESTED, _faces(2), method="random")
+
+
+def test_empty_inputs_match_nothing():
+    assert match_faces(CONTESTED, []) == []
+    assert match_faces(FixedGallery(0, [[]], [[]]), _faces(1)) == [{"row": None, "score": 0.0, "margin": 0.0}]
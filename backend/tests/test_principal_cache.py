@@ -0,0 +1,138 @@
+import pytest
+from fastapi import HTTPException
+from app.core import auth_roles, deps, principal_cache as cache_module, security
+from app.core.models import User
+from app.core.principal_cache import Principal, PrincipalCache
+
+
+class FakeClock:
+    """Stands in for the time module: monotonic() and time() advance only when told to."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def _principal(n):
+    return Principal(n, f"user{n}@example.com", f"user{n}", f"User {n}", "faculty", "CS", "1")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PrincipalCache(ttl=60, max_size=10)
+    cache.put("a", 1, _principal(1))
+
+    clock.advance(59)
+    assert cache.get("a", 1) == _principal(1)
+    clock.advance(2)
+    assert cache.get("a", 1) is None
+    assert len(cache) == 0  # The expired entry is dropped, not kept around
+
+
+def test_tokens_are_cached_separately():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    cache.put("a", 1, _principal(1))
+
+    assert cache.get("a", 2) is None  # Same user, another token
+    assert cache.get("b", 1) is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PrincipalCache(ttl=60, max_size=2)
+    cache.put("a", 1, _principal(1))
+    cache.put("b", 1, _principal(2))
+    assert cache.get("a", 1) is not None  # "a" is now the most recently used
+
+    cache.put("c", 1, _principal(3))
+
+    assert len(cache) == 2
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == _principal(1)
+    assert cache.get("c", 1) == _principal(3)
+
+
+def test_invalidate_drops_entries_and_revokes_earlier_tokens(clock):
+    cache = PrincipalCache(ttl=60, max_size=10)
+    cache.put("a", clock.now - 10, _principal(1))
+    cache.put("a", clock.now - 5, _principal(1))
+    cache.put("b", clock.now - 5, _principal(2))
+
+    cache.invalidate("a")
+
+    assert len(cache) == 1 and cache.get("b", clock.now - 5) == _principal(2)
+    assert cache.is_revoked("a", clock.now - 5)
+    assert cache.is_revoked("a", None)
+    assert not cache.is_revoked("b", clock.now - 5)
+    clock.advance(1)
+    assert not cache.is_revoked("a", clock.now)  # Tokens issued after the deletion (e.g. re-created user)
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = PrincipalCache(ttl=0, max_size=10)
+    cache.put("a", 1, _principal(1))
+
+    assert cache.get("a", 1) is None
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def auth(db, monkeypatch):
+    """
+    get_current_user and get_token_claims on the test database with one fresh
+    cache; returns (db, cache, sessions opened by get_current_user).
+    """
+    db.add(User(id=7, username="asha", email="asha@example.com", hashed_password="x", role="faculty", name="Asha"))
+    db.commit()
+    cache = PrincipalCache(ttl=60, max_size=10)
+    opened = []
+
+    def session():
+        opened.append(db)
+        return db
+
+    monkeypatch.setattr(deps, "SessionLocal", session)
+    monkeypatch.setattr(deps, "principal_cache", cache)
+    monkeypatch.setattr(auth_roles, "principal_cache", cache)
+    return db, cache, opened
+
+
+def test_known_token_skips_the_database(auth):
+    _, _, opened = auth
+    token = security.create_access_token({"sub": "asha@example.com", "role": "faculty"})
+
+    first = deps.get_current_user(token)
+    second = deps.get_current_user(token)
+
+    assert first == second and first.id == 7 and first.role == "faculty"
+    assert len(opened) == 1
+
+
+def test_deleted_user_is_rejected_once_invalidated(auth):
+    db, cache, _ = auth
+    token = security.create_access_token({"sub": "asha@example.com", "role": "faculty"})
+    deps.get_current_user(token)
+
+    db.query(User).filter(User.id == 7).delete()
+    db.commit()
+    cache.invalidate("asha@example.com")
+
+    with pytest.raises(HTTPException) as error:
+        deps.get_current_user(token)
+    assert error.value.status_code == 401
+    with pytest.raises(HTTPException) as error:
+        auth_roles.get_token_claims(token)  # Claims-only role checks honour the revocation too
+    assert error.value.status_code == 401
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from app.core.search_index import SearchIndex, create_index
+
+DIM = 64
+K = 5
+
+
+def _normalize(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def data():
+    """A clustered gallery (like several photos per look-alike group) and noisy queries of its rows."""
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((40, DIM))
+    gallery = _normalize(centers[rng.integers(0, len(centers), 2000)] + 0.4 * rng.standard_normal((2000, DIM)))
+    picked = rng.choice(len(gallery), 200, replace=False)
+    queries = _normalize(gallery[picked] + 0.1 * rng.standard_normal((200, DIM)))
+    return gallery, queries
+
+
+def _recall(index, gallery, queries):
+    exact = create_index(DIM, "exact")
+    exact.add(gallery)
+    _, truth = exact.search(queries, K)
+    _, found = index.search(queries, K)
+    return np.mean([len(set(t) & set(f)) / K for t, f in zip(truth, found)])
+
+
+@pytest.mark.parametrize("kind", ["ivf", "hnsw"])
+def test_approximate_recall_against_exact(data, kind):
+    gallery, queries = data
+    index = create_index(DIM, kind)
+    index.add(gallery[:1000])
+    index.add(gallery[1000:])  # Rows keep counting across batches
+
+    assert _recall(index, gallery, queries) >= 0.9
+    scores, rows = index.search(queries, 1)
+    np.testing.assert_allclose(scores[:, 0], np.sum(gallery[rows[:, 0]] * queries, axis=1), rtol=1e-5)
+
+
+@pytest.mark.parametrize("kind", ["exact", "ivf", "hnsw"])
+def test_saved_index_answers_the_same(data, kind, tmp_path):
+    gallery, queries = data
+    index = create_index(DIM, kind)
+    index.add(gallery)
+    path = str(tmp_path / "index.npz")
+    index.save(path, ids=np.arange(len(gallery)))
+
+    restored, extra = SearchIndex.load(path)
+    assert restored.kind == kind
+    np.testing.assert_array_equal(extra["ids"], np.arange(len(gallery)))
+    np.testing.assert_array_equal(restored.search(queries, K)[1], index.search(queries, K)[1])
+
+
+def test_small_index_pads_missing_hits():
+    index = create_index(DIM, "exact")
+    index.add(_normalize(np.eye(DIM)[:2]))
+
+    scores, rows = index.search(_normalize(np.eye(DIM)[:1]), 4)
+    assert rows[0].tolist() == [0, 1, -1, -1]
+    assert np.isneginf(scores[0, 2:]).all()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from app.core.tiled_detection import choose_tile_size, detect_boxes, nms, tile_origins
+
+MIN_DETECTABLE = 10  # Face side (px, at detector input size) below which the fake detector misses it
+
+
+class FakeDetector:
+    """
+    Finds the squares painted by _photo (pixel value = face number). A face cut
+    by the crop edge is still found (clipped box, lower score) when at least
+    half of it is visible, like a real detector on a tile seam; faces too small
+    after scaling the crop to the 640 input are missed, like back rows in one pass.
+    """
+
+    input_size = (640, 640)
+
+    def __init__(self, faces):
+        self.sides = {number: side for number, (_, _, side) in enumerate(faces, start=1)}
+
+    def detect(self, crop, max_num=0, metric="default"):
+        scale = 640 / max(crop.shape[:2])
+        boxes, kpss = [], []
+        for number, side in self.sides.items():
+            ys, xs = np.nonzero(crop[:, :, 0] == number)
+            if len(xs) < side ** 2 / 2 or side * scale < MIN_DETECTABLE:
+                continue
+            x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+            boxes.append([x1, y1, x2, y2, 0.9 * len(xs) / side ** 2])
+            kpss.append([[(x1 + x2) / 2, (y1 + y2) / 2]] * 5)
+        return (np.array(boxes, dtype=np.float32).reshape(-1, 5),
+                np.array(kpss, dtype=np.float32).reshape(-1, 5, 2))
+
+
+class FakeFaceApp:
+    def __init__(self, faces):
+        self.det_model = FakeDetector(faces)
+
+
+def _photo(height, width, faces):
+    """A blank photo with each (x1, y1, side) face painted as a square of its number."""
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    for number, (x, y, side) in enumerate(faces, start=1):
+        img[y:y + side, x:x + side] = number
+    return img
+
+
+def test_small_photos_are_not_tiled():
+    assert choose_tile_size(1200, 1600) is None
+    assert choose_tile_size(3000, 4000) == 1280
+
+
+@pytest.mark.parametrize("length,tile", [(3000, 1280), (1281, 1280), (1280, 1280), (500, 1280)])
+def test_tiles_cover_the_image_with_overlap(length, tile):
+    origins = tile_origins(length, tile)
+
+    assert origins[0] == 0
+    assert origins[-1] + min(tile, length) == length
+    for a, b in zip(origins, origins[1:]):
+        assert 0 < b - a <= tile * 0.8 + 1  # Neighbours share at least the overlap
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [20, 20, 30, 30], [0, 0, 5, 10]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.8], dtype=np.float32)
+
+    # Box 0 overlaps the better box 1 at IoU 0.82; box 3 overlaps it at only 0.36
+    assert sorted(nms(boxes, scores).tolist()) == [1, 2, 3]
+    assert nms(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)).tolist() == []
+
+
+def test_faces_on_tile_seams_are_found_once_with_their_full_box():
+    faces = [
+        (100, 100, 300),   # Close-up: found by the full-image pass and by a tile
+        (1260, 400, 30),   # Back row, across the seam of the first two tile columns
+        (1000, 1270, 30),  # Back row, across the seam of the two tile rows
+        (2500, 1600, 40),  # Back row, inside one tile
+    ]
+    img = _photo(2000, 3000, faces)
+    assert choose_tile_size(*img.shape[:2]) == 1280
+
+    boxes, kpss = detect_boxes(FakeFaceApp(faces), img)
+
+    found = sorted(tuple(int(v) for v in box[:4]) for box in boxes)
+    assert found == sorted((x, y, x + side, y + side) for x, y, side in faces)
+    for box, kps in zip(boxes, kpss):  # Landmarks are shifted back to image coordinates too
+        np.testing.assert_allclose(kps[0], [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2])